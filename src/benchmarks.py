@@ -0,0 +1,204 @@
+# benchmarks.py - Timing harness for the schematic pipeline
+# Run from src/:  python benchmarks.py
+
+import os
+import re
+import tempfile
+import time
+
+import numpy as np
+
+from worldedit_tab.command_block_generator.compaction import compact_blocks
+from worldedit_tab.command_block_generator.converter import (
+    emit_commands,
+    generate_block_list,
+    convert_to_command_blocks,
+    convert_to_command_block_wall
+)
+from worldedit_tab.schem_viewer.mesher import block_cubes, build_mesh, cube_occlusion, face_shades
+from worldedit_tab.varint import decode_varints, encode_varints
+from block_store import BlockStore
+from command_import import import_command_file, import_commands
+from scene_export import export_schematic, scene_commands, scene_schematic
+
+
+def _timed(label, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<48} {elapsed * 1000:10.1f} ms")
+    return result
+
+
+def bench_varint(sizes=(1_000_000, 10_000_000, 50_000_000)):
+    rng = np.random.default_rng(0)
+    for size in sizes:
+        for palette_size in (100, 4000):
+            values = rng.integers(0, palette_size, size, dtype=np.uint32)
+            encoded = _timed(f"varint encode {size:>11,} voxels, palette {palette_size}", encode_varints, values)
+            decoded = _timed(f"varint decode {size:>11,} voxels, palette {palette_size}", decode_varints, encoded)
+            assert np.array_equal(decoded, values)
+
+
+def synthetic_schematic(width, height, length, palette_size=64, air_fraction=0.5, seed=0):
+    """A decoded schematic dict (as schem_cache returns it) filled with random blocks."""
+    rng = np.random.default_rng(seed)
+    palette = {"minecraft:air": 0}
+    palette.update({f"minecraft:block_{i}": i for i in range(1, palette_size)})
+    block_indices = rng.integers(1, palette_size, (height, length, width)).astype(np.uint16)
+    block_indices[rng.random((height, length, width)) < air_fraction] = 0
+    return {
+        "Version": 2, "DataVersion": 4550,
+        "Width": width, "Height": height, "Length": length,
+        "Offset": [0, 0, 0], "Palette": palette, "BlockIndices": block_indices,
+    }
+
+
+def bench_converter():
+    data = synthetic_schematic(100, 100, 100, air_fraction=0.0)
+    commands = _timed("block list, 1M voxels", generate_block_list, data, (0, 64, 0))
+    assert len(commands) == 1_000_000
+    _timed("original shape layout, 1M voxels", convert_to_command_blocks, data, (0, 64, 0))
+    _timed("wall layout, 1M voxels", convert_to_command_block_wall, data, (0, 64, 0), 64, "north")
+
+
+def bench_compaction():
+    # 10M voxels of layered terrain: large uniform slabs with scattered ore
+    rng = np.random.default_rng(0)
+    block_ids = np.full((100, 320, 320), -1, dtype=np.int32)
+    block_ids[:40] = 1
+    block_ids[40:60] = 2
+    block_ids[:40][rng.random((40, 320, 320)) < 0.01] = 3
+    boxes = _timed("fill compaction, 10M voxel terrain", compact_blocks, block_ids)
+    print(f"{'':<48} {np.count_nonzero(block_ids != -1):,} blocks -> {len(boxes):,} boxes")
+
+    data = synthetic_schematic(32, 32, 32, palette_size=2, air_fraction=0.0)
+    _, _, _, _, stats = _timed("compacted commands, solid 32^3 cube", emit_commands, data, (0, 64, 0), True)
+    print(f"{'':<48} {stats['blocks']:,} blocks -> {stats['commands']:,} commands")
+
+
+def bench_meshing():
+    rng = np.random.default_rng(0)
+    names = ["minecraft:air", "minecraft:stone", "minecraft:dirt", "minecraft:grass_block"]
+
+    # Rolling terrain: stone, a few layers of dirt, grass on top
+    size = 256
+    xs = np.arange(size)
+    heights = (40 + 12 * np.sin(xs / 23.0)[None, :] + 8 * np.cos(xs / 17.0)[:, None]).astype(int)
+    y = np.arange(96)[:, None, None]
+    terrain = np.zeros((96, size, size), dtype=np.uint16)
+    terrain[y < heights - 3] = 1
+    terrain[(y >= heights - 3) & (y < heights)] = 2
+    terrain[y == heights] = 3
+
+    hollow = np.full((128, 128, 128), 1, dtype=np.uint16)
+    hollow[1:-1, 1:-1, 1:-1] = 0
+
+    noise = rng.integers(0, 4, (128, 128, 128)).astype(np.uint16)
+
+    for label, grid in (("terrain 256x96x256", terrain), ("hollow box 128^3", hollow), ("noise 128^3", noise)):
+        culled = _timed(f"culled mesh, {label}", build_mesh, grid, names)
+        greedy = _timed(f"greedy mesh, {label}", build_mesh, grid, names, (0, 0, 0), True)
+        print(f"{'':<48} {culled['stats']['quads']:,} -> {greedy['stats']['quads']:,} quads "
+              f"({greedy['stats']['reduction']:.1f}x)")
+
+
+def bench_command_import(lines=200_000, runs=5):
+    # Converter output (setblock plus /fill boxes) with some block displays mixed in
+    data = synthetic_schematic(64, 64, 64, palette_size=8, air_fraction=0.3)
+    _, _, _, commands, _ = emit_commands(data, (0, 64, 0), True)
+    displays = [
+        f'summon minecraft:block_display {i % 97}.5 {i % 31} {i % 89}.25 '
+        f'{{block_state:{{Name:"minecraft:glass"}},Tags:["b{i}"]}}'
+        for i in range(lines // 10)
+    ]
+    script = (list(commands) + displays) * (lines // (len(commands) + len(displays)) + 1)
+    text = "\n".join(script[:lines]) + "\n"
+
+    def per_line_setblock(text):
+        # What Block3DViewer.parse_commands used to do: one re.match per line, setblock only
+        blocks = []
+        for cmd in text.split("\n"):
+            match = re.match(r'setblock\s+(-?\d+)\s+(-?\d+)\s+(-?\d+)\s+(.+)', cmd.strip())
+            if match:
+                x, y, z, block = match.groups()
+                blocks.append((int(x), int(y), int(z), block))
+        return blocks
+
+    def best_of(func, source):
+        # The gap is a few tens of ms, so take the fastest of several runs
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = func(source)
+            times.append(time.perf_counter() - start)
+        return result, min(times)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "import.mcfunction")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        for label, func, source in (
+            ("per-line re.match, setblock only", per_line_setblock, text),
+            ("chunked import, string", import_commands, text),
+            ("chunked import, file", import_command_file, path),
+        ):
+            result, elapsed = best_of(func, source)
+            print(f"{label + f', {lines:,} lines':<48} {elapsed * 1000:10.1f} ms  {lines / elapsed:12,.0f} lines/s")
+    stats = result["stats"]
+    print(f"{'':<48} {stats['setblock']:,} setblock, {stats['fill']:,} fill, "
+          f"{stats['block_display']:,} block_display")
+
+
+def bench_scene_export(blocks=200_000):
+    # A hand-built scene: scattered blocks in a 96^3 box, a few colours
+    rng = np.random.default_rng(3)
+    cells = np.unique(rng.integers(-48, 48, (blocks, 3)), axis=0)
+    ids = rng.integers(0, 4, len(cells))
+    names = ["minecraft:stone", "minecraft:redstone_block", "minecraft:blue_ice", "minecraft:lime_concrete"]
+    boxes = np.array([[-48, -48, -48, 47, -40, 47], [0, 0, 0, 15, 15, 15]])
+    box_ids = np.array([0, 2])
+
+    def setblock_lines():
+        # What Block3DViewer.get_commands does for single blocks: one f-string per block
+        return "\n".join(f"setblock {x} {y} {z} {names[i]}" for (x, y, z), i in zip(cells.tolist(), ids.tolist()))
+
+    _timed(f"setblock text, {len(cells):,} blocks", setblock_lines)
+    schematic = _timed(f"scene grid + varints, {len(cells):,} blocks", scene_schematic, names, cells, ids, boxes, box_ids)
+    with tempfile.TemporaryDirectory() as tmp:
+        _timed(f"export .schem, {len(cells):,} blocks", export_schematic,
+               os.path.join(tmp, "scene.schem"), names, cells, ids, boxes, box_ids)
+    commands = _timed("fill-compacted commands", scene_commands, schematic)
+    print(f"{'':<48} {len(cells):,} blocks + {len(boxes)} boxes -> {len(commands):,} commands")
+
+
+def bench_block_lighting(blocks=200_000):
+    # Block3DViewer cubes: a solid 64-wide slab, lit the way its buffers are baked
+    side = int(np.sqrt(blocks / 8))
+    x, y, z = np.meshgrid(np.arange(side), np.arange(8), np.arange(side), indexing="ij")
+    positions = np.stack([x.ravel(), y.ravel(), z.ravel()], axis=1)
+    store = BlockStore()
+    store.load_array(positions, np.zeros(len(positions), dtype=np.int64), ["stone"])
+    light_dir = np.array([0.0, 0.0, 1.0], dtype=np.float32)
+    _, normals = block_cubes(positions)
+
+    def per_vertex_dot():
+        # One dot product per vertex, as draw_block used to do
+        return 0.3 + 0.7 * np.maximum(0, normals @ light_dir)
+
+    def baked_shades():
+        return np.tile(np.repeat(face_shades(light_dir, 0.3), 4), len(positions))
+
+    _timed(f"per-vertex lighting, {len(positions):,} cubes", per_vertex_dot)
+    _timed(f"six face shades tiled, {len(positions):,} cubes", baked_shades)
+    _timed(f"ambient occlusion, {len(positions):,} cubes", cube_occlusion, positions, store.occupancy)
+
+
+if __name__ == "__main__":
+    bench_varint()
+    bench_converter()
+    bench_compaction()
+    bench_meshing()
+    bench_command_import()
+    bench_scene_export()
+    bench_block_lighting()
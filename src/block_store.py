@@ -0,0 +1,256 @@
+# block_store.py - Editable block storage for Block3DViewer
+#
+# Blocks live in slots of growable NumPy arrays (integer position and palette
+# id); freed slots go on a free list and are reused. The cell -> slot dict
+# inherited from SpatialHash makes insert, remove and lookup O(1) and doubles
+# as the picking index. Every edit marks its 16^3 section dirty so only that
+# section is re-meshed (with its neighbours when the cell is on a section
+# border, as their corner shading can change), and is logged as a
+# (cell, before, after) delta for a bounded undo / redo history.
+
+from collections import deque
+from contextlib import contextmanager
+from itertools import product
+
+import numpy as np
+
+from picking import SpatialHash, cell_of
+from worldedit_tab.schem_viewer.mesher import SECTION_SIZE
+
+# Undo steps kept; older ones are dropped
+UNDO_LIMIT = 256
+
+
+def section_of(cell):
+    return tuple(v // SECTION_SIZE for v in cell)
+
+
+def sections_near(cell):
+    """Sections of a cell and of its 26 neighbours; just its own unless it is on a section border."""
+    return product(*(range((v - 1) // SECTION_SIZE, (v + 1) // SECTION_SIZE + 1) for v in cell))
+
+
+def _unique_rows(rows):
+    """np.unique(rows, axis=0, return_index, return_inverse), sorting one int64 key per row when they fit."""
+    low = rows.min(axis=0)
+    extent = rows.max(axis=0) - low + 1
+    if np.prod(extent.astype(np.float64)) >= 2 ** 62:
+        unique, index, inverse = np.unique(rows, axis=0, return_index=True, return_inverse=True)
+        return unique, index, inverse.ravel()
+    keys = np.ravel_multi_index(tuple((rows - low).T), tuple(extent.tolist()))
+    _, index, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return rows[index], index, inverse.ravel()
+
+
+class BlockStore(SpatialHash):
+    def __init__(self, capacity=1024, undo_limit=UNDO_LIMIT):
+        super().__init__()
+        capacity = max(1, capacity)
+        self.positions = np.zeros((capacity, 3), dtype=np.int32)
+        self.values = np.zeros(capacity, dtype=np.uint16)
+        # Distinct block values (colours, names, ...); values holds their ids
+        self.palette = []
+        self.palette_ids = {}
+        self.free = list(range(capacity - 1, -1, -1))
+        self.sections = {}
+        self.dirty = set()
+        self.undo_log = deque(maxlen=undo_limit)
+        self.redo_log = deque(maxlen=undo_limit)
+        self._batch = None
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __contains__(self, position):
+        return cell_of(position) in self.cells
+
+    def get(self, position):
+        """Value of the block at position, or None for air."""
+        slot = self.cells.get(cell_of(position))
+        return None if slot is None else self.palette[self.values[slot]]
+
+    def items(self):
+        """(cell, value) of every block, in the order the cells were first filled."""
+        for cell, slot in self.cells.items():
+            yield cell, self.palette[self.values[slot]]
+
+    def arrays(self):
+        """(cells (N, 3) int32, palette ids (N,)) of every block, in the same order as items()."""
+        slots = np.fromiter(self.cells.values(), dtype=np.int64, count=len(self.cells))
+        return self.positions[slots], self.values[slots]
+
+    def occupancy(self, low, high):
+        """Boolean (x, y, z) grid of the cells from low to high, inclusive, that hold a block."""
+        low, high = np.asarray(low, dtype=np.int64), np.asarray(high, dtype=np.int64)
+        grid = np.zeros(tuple((high - low + 1).tolist()), dtype=bool)
+        first, last = low // SECTION_SIZE, high // SECTION_SIZE
+        if np.prod((last - first + 1).astype(np.float64)) <= len(self.sections):
+            sections = product(*(range(a, b + 1) for a, b in zip(first.tolist(), last.tolist())))
+        else:
+            sections = (section for section in self.sections
+                        if all(a <= v <= b for v, a, b in zip(section, first.tolist(), last.tolist())))
+        slots = [slot for section in sections for slot in self.sections.get(section, ())]
+        if slots:
+            cells = self.positions[np.array(slots, dtype=np.int64)] - low
+            cells = cells[np.all((cells >= 0) & (cells < grid.shape), axis=1)]
+            grid[tuple(cells.T)] = True
+        return grid
+
+    def cell(self, slot):
+        return tuple(int(v) for v in self.positions[slot])
+
+    def set(self, position, value):
+        """Place (or replace) the block at position; the position is rounded to its cell."""
+        self._edit(cell_of(position), value)
+
+    def remove(self, position):
+        """Remove the block at position. Returns False when there was none."""
+        cell = cell_of(position)
+        if cell not in self.cells:
+            return False
+        self._edit(cell, None)
+        return True
+
+    def load(self, blocks):
+        """Fill from (x, y, z, value) tuples without recording history."""
+        for x, y, z, value in blocks:
+            self._put(cell_of((x, y, z)), value)
+
+    def load_array(self, cells, ids, values):
+        """
+        Fill from an (N, 3) integer array of cells whose ids index values,
+        without recording history. A later row wins over an earlier one in
+        the same cell.
+        """
+        cells = np.asarray(cells, dtype=np.int64).reshape(-1, 3)
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(cells):
+            return
+        # Last row of every cell, in row order
+        _, last, _ = _unique_rows(cells[::-1])
+        keep = np.sort(len(cells) - 1 - last)
+        cells, ids = cells[keep], ids[keep]
+        palette_ids = np.array([self._palette_id(value) for value in values], dtype=np.uint16)
+
+        keys = list(map(tuple, cells.tolist()))
+        new = np.array([key not in self.cells for key in keys], dtype=bool)
+        for i in np.flatnonzero(~new).tolist():
+            self._put(keys[i], values[ids[i]])
+        cells, ids = cells[new], ids[new]
+        if not len(cells):
+            return
+
+        while len(self.free) < len(cells):
+            self._grow()
+        slots = np.array(self.free[-len(cells):][::-1], dtype=np.int64)
+        del self.free[-len(cells):]
+        self.positions[slots] = cells
+        self.values[slots] = palette_ids[ids]
+        self.cells.update(zip((key for key, n in zip(keys, new) if n), slots.tolist()))
+
+        low, high = cells.min(axis=0).tolist(), cells.max(axis=0).tolist()
+        if self.low is not None:
+            low = [min(a, b) for a, b in zip(self.low, low)]
+            high = [max(a, b) for a, b in zip(self.high, high)]
+        self.low, self.high = low, high
+
+        sections, _, inverse = _unique_rows(cells // SECTION_SIZE)
+        order = np.argsort(inverse, kind="stable")
+        groups = np.split(slots[order], np.cumsum(np.bincount(inverse))[:-1])
+        for section, group in zip(map(tuple, sections.tolist()), groups):
+            self.sections.setdefault(section, set()).update(group.tolist())
+            self.dirty.update(product(*(range(v - 1, v + 2) for v in section)))
+
+    @contextmanager
+    def batch(self):
+        """Group the edits made inside the with block into one undo step."""
+        if self._batch is not None:
+            yield
+            return
+        self._batch = []
+        try:
+            yield
+        finally:
+            edits, self._batch = self._batch, None
+            if edits:
+                self.undo_log.append(edits)
+                self.redo_log.clear()
+
+    def undo(self):
+        """Revert the last edit step. Returns False when there is nothing to undo."""
+        if not self.undo_log:
+            return False
+        edits = self.undo_log.pop()
+        for cell, before, _ in reversed(edits):
+            self._put(cell, before)
+        self.redo_log.append(edits)
+        return True
+
+    def redo(self):
+        """Apply the last undone edit step again. Returns False when there is nothing to redo."""
+        if not self.redo_log:
+            return False
+        edits = self.redo_log.pop()
+        for cell, _, after in edits:
+            self._put(cell, after)
+        self.undo_log.append(edits)
+        return True
+
+    def take_dirty(self):
+        """Sections edited since the last call."""
+        dirty, self.dirty = self.dirty, set()
+        return dirty
+
+    def section_slots(self, section):
+        """Slots of the blocks in a section, in ascending order."""
+        return sorted(self.sections.get(section, ()))
+
+    def _edit(self, cell, value):
+        slot = self.cells.get(cell)
+        before = None if slot is None else self.palette[self.values[slot]]
+        if before == value:
+            return
+        with self.batch():
+            self._batch.append((cell, before, value))
+            self._put(cell, value)
+
+    def _put(self, cell, value):
+        section = section_of(cell)
+        slot = self.cells.get(cell)
+        if value is None:
+            if slot is not None:
+                # The picking bounds only grow; a stale edge costs a few empty steps
+                del self.cells[cell]
+                self.sections[section].discard(slot)
+                if not self.sections[section]:
+                    del self.sections[section]
+                self.free.append(slot)
+                self.dirty.update(sections_near(cell))
+            return
+
+        if slot is None:
+            slot = self._allocate()
+            self.positions[slot] = cell
+            self.add(slot, cell)
+            self.sections.setdefault(section, set()).add(slot)
+            self.dirty.update(sections_near(cell))
+        self.values[slot] = self._palette_id(value)
+        self.dirty.add(section)
+
+    def _palette_id(self, value):
+        if value not in self.palette_ids:
+            self.palette_ids[value] = len(self.palette)
+            self.palette.append(value)
+        return self.palette_ids[value]
+
+    def _grow(self):
+        # Double the arrays; the new slots go on the free list
+        capacity = len(self.positions)
+        self.positions = np.concatenate([self.positions, np.zeros_like(self.positions)])
+        self.values = np.concatenate([self.values, np.zeros_like(self.values)])
+        self.free = list(range(2 * capacity - 1, capacity - 1, -1)) + self.free
+
+    def _allocate(self):
+        if not self.free:
+            self._grow()
+        return self.free.pop()
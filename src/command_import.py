@@ -0,0 +1,216 @@
+# command_import.py - Stream block commands into NumPy arrays
+#
+# Reads an .mcfunction file or pasted text a chunk at a time, each chunk cut
+# at a line end. Line starts are normalised first: indentation, "execute ...
+# run" prefixes and a leading / are cut off (skipped when no line starts
+# with any of them). Every command kind then sits right after a "\n", so each is found by
+# a regex starting with a literal "\n<keyword>" that the regex engine can
+# jump between without trying every line. There is no Python work per line:
+# the matched coordinates are joined and parsed by np.fromstring, block names
+# are interned through a dict. Recognised commands:
+#   setblock x y z block                    one block
+#   fill x1 y1 z1 x2 y2 z2 block [mode]     one box, not expanded into voxels
+#   summon block_display x y z {...block_state:{Name:"block"}...}
+# The minecraft: prefix is optional. Comments, quoted text, relative (~ ^)
+# coordinates and every other command are counted as skipped. The fill mode
+# (hollow, outline, ...) is ignored; boxes are solid. Commands are collected,
+# not replayed, so a later command does not clear an earlier one.
+
+import gc
+import re
+from contextlib import contextmanager
+
+import numpy as np
+
+# Characters read per chunk
+CHUNK_SIZE = 1 << 22
+
+_S = r"[ \t]+"
+_INT = r"-?\d+"
+_NUM = r"-?(?:\d+(?:\.\d*)?|\.\d+)"
+_BLOCK = r"[^\s\[{\"]+"
+# Line start normalisation. An execute prefix ends at its first "run", so
+# the command after it is fixed; nested prefixes are cut together
+_NEEDS_NORMALIZING = re.compile(r"\n(?:[ \t/]|execute)")
+_INDENT = re.compile(r"\n[ \t]+")
+_EXECUTE = re.compile(r"\n(?:/?execute\b(?:(?!\brun\b)[^\n])*\brun[ \t]+(?=\S))+")
+# One group "coordinates name" (findall then returns plain strings, not
+# tuples), or two groups when other text sits between the coordinates and name
+SETBLOCK_PATTERN = re.compile(rf"\nsetblock{_S}({_INT}{_S}{_INT}{_S}{_INT}{_S}{_BLOCK})")
+FILL_PATTERN = re.compile(rf"\nfill{_S}({_INT}{_S}{_INT}{_S}{_INT}{_S}{_INT}{_S}{_INT}{_S}{_INT}{_S}{_BLOCK})")
+DISPLAY_PATTERN = re.compile(
+    rf"\nsummon{_S}(?:minecraft:)?block_display{_S}({_NUM}{_S}{_NUM}{_S}{_NUM})[^\n]*?block_state:\{{Name:\"?([\w:]+)"
+)
+# Blank and # comment lines, once indentation is gone
+EMPTY_LINE_PATTERN = re.compile(r"\n(?=[#\n])")
+
+
+def normalize_lines(text):
+    """Prepend a "\n" and cut indentation, execute ... run prefixes and leading slashes off every line."""
+    text = "\n" + text
+    # Converter output needs none of it; one scan tells
+    if _NEEDS_NORMALIZING.search(text):
+        text = _INDENT.sub("\n", text)
+        text = _EXECUTE.sub("\n", text)
+        text = text.replace("\n/", "\n")
+    return text
+
+
+@contextmanager
+def _gc_paused():
+    # findall builds a tuple per match; letting the cyclic collector run over
+    # them while they pile up costs more than the matching itself
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def iter_text_chunks(source, chunk_size=CHUNK_SIZE):
+    """Yield pieces of about chunk_size characters made of whole lines from an open text file or a string."""
+    if isinstance(source, str):
+        # Slice a string in place rather than copying it through a StringIO
+        start = 0
+        while start < len(source):
+            end = source.find("\n", start + chunk_size - 1) + 1 or len(source)
+            yield source[start:end] if source[end - 1] == "\n" else source[start:end] + "\n"
+            start = end
+        return
+
+    rest = ""
+    while True:
+        data = source.read(chunk_size)
+        if not data:
+            break
+        cut = data.rfind("\n") + 1
+        if cut == 0:
+            rest += data
+            continue
+        yield rest + data[:cut]
+        rest = data[cut:]
+    if rest:
+        yield rest + "\n"
+
+
+class CommandImport:
+    """Growing result of an import: block names plus one array set per command kind."""
+
+    def __init__(self):
+        self.names = []
+        self.name_ids = {}
+        # Names as written (with or without the minecraft: prefix) -> id
+        self.raw_ids = {}
+        # (N, 3) int32 cells, (M, 6) int32 inclusive min / max corners, (K, 3) float32 positions
+        self.blocks = [np.zeros((0, 3), dtype=np.int32)]
+        self.block_ids = [np.zeros(0, dtype=np.int32)]
+        self.boxes = [np.zeros((0, 6), dtype=np.int32)]
+        self.box_ids = [np.zeros(0, dtype=np.int32)]
+        self.displays = [np.zeros((0, 3), dtype=np.float32)]
+        self.display_ids = [np.zeros(0, dtype=np.int32)]
+        self.stats = {"lines": 0, "setblock": 0, "fill": 0, "block_display": 0, "skipped": 0}
+
+    def _ids(self, names):
+        """Global name ids for a sequence of block names, interning each distinct name once."""
+        raw_ids = self.raw_ids
+        for name in set(names).difference(raw_ids):
+            full = name if ":" in name else "minecraft:" + name
+            if full not in self.name_ids:
+                self.name_ids[full] = len(self.names)
+                self.names.append(full)
+            raw_ids[name] = self.name_ids[full]
+        return np.fromiter(map(raw_ids.__getitem__, names), dtype=np.int32, count=len(names))
+
+    def _scan(self, pattern, text, columns, dtype):
+        """(values (N, columns), name ids) of every match of pattern in text, or None."""
+        with _gc_paused():
+            matches = pattern.findall(text)
+            if not matches:
+                return None
+            if pattern.groups == 1:
+                # Names hold no whitespace, so every (columns + 1)th field is one
+                coords = " ".join(matches).split()
+                names = coords[columns::columns + 1]
+                del coords[columns::columns + 1]
+            else:
+                coords, names = zip(*matches)
+            del matches
+        values = np.fromstring(" ".join(coords), dtype=dtype, sep=" ").reshape(-1, columns)
+        return values, self._ids(names)
+
+    def add_chunk(self, text):
+        """Parse a piece of text made of whole lines; returns the number of commands in it."""
+        text = normalize_lines(text)
+        found = 0
+
+        scanned = self._scan(SETBLOCK_PATTERN, text, 3, np.int64)
+        if scanned is not None:
+            self.blocks.append(scanned[0].astype(np.int32))
+            self.block_ids.append(scanned[1])
+            self.stats["setblock"] += len(scanned[1])
+            found += len(scanned[1])
+
+        scanned = self._scan(FILL_PATTERN, text, 6, np.int64)
+        if scanned is not None:
+            corners = scanned[0]
+            low = np.minimum(corners[:, :3], corners[:, 3:])
+            high = np.maximum(corners[:, :3], corners[:, 3:])
+            self.boxes.append(np.hstack([low, high]).astype(np.int32))
+            self.box_ids.append(scanned[1])
+            self.stats["fill"] += len(scanned[1])
+            found += len(scanned[1])
+
+        scanned = self._scan(DISPLAY_PATTERN, text, 3, np.float64)
+        if scanned is not None:
+            self.displays.append(scanned[0].astype(np.float32))
+            self.display_ids.append(scanned[1])
+            self.stats["block_display"] += len(scanned[1])
+            found += len(scanned[1])
+
+        lines = text.count("\n") - 1
+        empty = len(EMPTY_LINE_PATTERN.findall(text))
+        self.stats["lines"] += lines
+        self.stats["skipped"] += lines - empty - found
+        return found
+
+    def arrays(self):
+        """
+        The import as a dict of NumPy arrays: blocks / block_ids, boxes /
+        box_ids and displays / display_ids, ids indexing names.
+        """
+        for key in ("blocks", "block_ids", "boxes", "box_ids", "displays", "display_ids"):
+            parts = getattr(self, key)
+            if len(parts) > 1:
+                setattr(self, key, [np.concatenate(parts)])
+        return {
+            "names": list(self.names),
+            "blocks": self.blocks[0],
+            "block_ids": self.block_ids[0],
+            "boxes": self.boxes[0],
+            "box_ids": self.box_ids[0],
+            "displays": self.displays[0],
+            "display_ids": self.display_ids[0],
+            "stats": dict(self.stats),
+        }
+
+
+def import_commands(source, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Parse every setblock, fill and block_display command of an open text file
+    or a string (e.g. the clipboard). progress, if given, is called as
+    progress(lines_read) after every chunk. Returns CommandImport.arrays().
+    """
+    result = CommandImport()
+    for text in iter_text_chunks(source, chunk_size):
+        result.add_chunk(text)
+        if progress is not None:
+            progress(result.stats["lines"])
+    return result.arrays()
+
+
+def import_command_file(path, chunk_size=CHUNK_SIZE, progress=None):
+    """import_commands for an .mcfunction (or any text) file, streamed from disk."""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return import_commands(f, chunk_size, progress)
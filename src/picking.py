@@ -0,0 +1,123 @@
+# picking.py - Mouse picking for Block3DViewer
+#
+# A click is unprojected through the current projection and modelview into a
+# ray, which is walked cell by cell (Amanatides & Woo) through a hash map of
+# occupied cells. Blocks are unit cubes centred on integer coordinates, so the
+# cost of a pick is the number of cells the ray crosses inside the occupied
+# bounding box, however many blocks there are.
+
+import math
+
+import numpy as np
+
+
+def unproject_ray(win_x, win_y, modelview, projection, viewport):
+    """
+    Ray through a window pixel as (origin on the near plane, unit direction).
+
+    win_y counts up from the bottom like OpenGL. modelview and projection are
+    4x4 matrices as glGetDoublev returns them (column-major), viewport is
+    (x, y, width, height).
+    """
+    x, y, width, height = viewport
+    ndc_x = 2.0 * (win_x - x) / width - 1.0
+    ndc_y = 2.0 * (win_y - y) / height - 1.0
+
+    # Row-major clip transform, inverted once for both planes
+    inverse = np.linalg.inv(np.asarray(projection, dtype=np.float64).T @ np.asarray(modelview, dtype=np.float64).T)
+    points = (inverse @ np.array([[ndc_x, ndc_x], [ndc_y, ndc_y], [-1.0, 1.0], [1.0, 1.0]])).T
+    near, far = points[:, :3] / points[:, 3:]
+    direction = far - near
+    return near, direction / np.linalg.norm(direction)
+
+
+def cell_of(position):
+    """Integer cell of the unit cube centred nearest to position."""
+    return tuple(math.floor(float(v) + 0.5) for v in position)
+
+
+class SpatialHash:
+    """Occupied cells -> block index, with the bounding box of all cells."""
+
+    def __init__(self, positions=()):
+        self.cells = {}
+        self.low = None
+        self.high = None
+        for index, position in enumerate(positions):
+            self.add(index, position)
+
+    def add(self, index, position):
+        """Register a block; a later block in the same cell replaces the earlier one."""
+        cell = cell_of(position)
+        self.cells[cell] = index
+        if self.low is None:
+            self.low, self.high = list(cell), list(cell)
+        else:
+            self.low = [min(a, b) for a, b in zip(self.low, cell)]
+            self.high = [max(a, b) for a, b in zip(self.high, cell)]
+
+    def _clip(self, origin, direction):
+        """
+        (t0, t1, axis) where the ray is inside the occupied bounds, or None.
+        axis is the one whose face the ray enters through, None if it starts inside.
+        """
+        t0, t1, entry = 0.0, math.inf, None
+        for axis, (o, d, low, high) in enumerate(zip(origin, direction, self.low, self.high)):
+            low, high = low - 0.5, high + 0.5
+            if d == 0:
+                if not low <= o <= high:
+                    return None
+                continue
+            a, b = sorted(((low - o) / d, (high - o) / d))
+            if a > t0:
+                t0, entry = a, axis
+            t1 = min(t1, b)
+        return (t0, t1, entry) if t0 <= t1 else None
+
+    def raycast(self, origin, direction, max_distance=math.inf):
+        """
+        First block the ray hits within max_distance.
+
+        Returns (index, cell, normal, distance), where normal is the (x, y, z)
+        axis step of the face the ray entered through (None when the ray
+        starts inside the block), or None on a miss.
+        """
+        if not self.cells:
+            return None
+        origin = [float(v) for v in origin]
+        direction = [float(v) for v in direction]
+        span = self._clip(origin, direction)
+        if span is None or span[0] > max_distance:
+            return None
+        start, end, entry = span[0], min(span[1], max_distance), span[2]
+
+        t = start
+        point = [o + d * t for o, d in zip(origin, direction)]
+        # On the box face, round into the box
+        cell = [min(max(math.floor(p + 0.5), low), high) for p, low, high in zip(point, self.low, self.high)]
+        steps, t_max, t_delta = [], [], []
+        for p, c, d in zip(point, cell, direction):
+            if d > 0:
+                steps.append(1)
+                t_max.append(t + (c + 0.5 - p) / d)
+                t_delta.append(1.0 / d)
+            elif d < 0:
+                steps.append(-1)
+                t_max.append(t + (c - 0.5 - p) / d)
+                t_delta.append(-1.0 / d)
+            else:
+                steps.append(0)
+                t_max.append(math.inf)
+                t_delta.append(math.inf)
+
+        normal = None if entry is None else tuple(-steps[entry] if i == entry else 0 for i in range(3))
+        while t <= end:
+            key = tuple(cell)
+            if key in self.cells:
+                return self.cells[key], key, normal, t
+            axis = t_max.index(min(t_max))
+            t = t_max[axis]
+            cell[axis] += steps[axis]
+            t_max[axis] += t_delta[axis]
+            normal = tuple(-steps[axis] if i == axis else 0 for i in range(3))
+        return None
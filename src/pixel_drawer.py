@@ -1,33 +1,38 @@
 import pygame
 import sys
 
+from worldedit_tab.schem_viewer.redraw import RedrawScheduler
+
 class PixelDrawer:
     def __init__(self):
         pygame.init()
         self.width, self.height = 800, 600
         self.screen = pygame.display.set_mode((self.width, self.height))
         pygame.display.set_caption("2D Pixel Drawer")
-        self.clock = pygame.time.Clock()
+        self.redraw = RedrawScheduler(60)
         self.pixels = set()
 
     def run(self):
         running = True
         while running:
-            self.clock.tick(60)
-            self.screen.fill((30, 30, 30))
-
-            # Draw pixels
-            for x, y in self.pixels:
-                pygame.draw.rect(self.screen, (255, 255, 255), (x * 10, y * 10, 10, 10))
-
-            for event in pygame.event.get():
+            for event in self.redraw.events():
                 if event.type == pygame.QUIT:
                     running = False
                 elif event.type == pygame.MOUSEBUTTONDOWN:
                     mx, my = pygame.mouse.get_pos()
                     self.pixels.add((mx // 10, my // 10))
 
+            if not running or not self.redraw.needs_redraw():
+                continue
+
+            self.screen.fill((30, 30, 30))
+
+            # Draw pixels
+            for x, y in self.pixels:
+                pygame.draw.rect(self.screen, (255, 255, 255), (x * 10, y * 10, 10, 10))
+
             pygame.display.flip()
+            self.redraw.drawn()
 
         pygame.quit()
         sys.exit()
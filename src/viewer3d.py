@@ -6,7 +6,15 @@ import asyncio
 import platform
 import math
 import numpy as np
-import re  # Added missing import for regular expressions
+
+from worldedit_tab.schem_viewer.buffers import VertexBuffer
+from worldedit_tab.schem_viewer.mesher import block_cubes, cube_occlusion, face_shades, ground_mesh
+from worldedit_tab.schem_viewer.redraw import RedrawScheduler
+from picking import unproject_ray
+from block_store import BlockStore
+from command_import import import_commands
+from scene_export import COMPRESS_LEVEL, scene_commands, scene_schematic
+from worldedit_tab.nbt_writer import save_schematic
 
 class Block3DViewer:
     def __init__(self, commands):
@@ -14,8 +22,13 @@ class Block3DViewer:
         self.WIDTH, self.HEIGHT = 800, 600
         self.screen = pygame.display.set_mode((self.WIDTH, self.HEIGHT), DOUBLEBUF | OPENGL)
         pygame.display.set_caption("Minecraft Block Renderer")
-        self.clock = pygame.time.Clock()
         self.FPS = 60
+        # Only redraw after input; the browser build cannot block on events
+        self.redraw = RedrawScheduler(
+            self.FPS,
+            held_keys=(pygame.K_w, pygame.K_s, pygame.K_a, pygame.K_d),
+            blocking=platform.system() != "Emscripten"
+        )
 
         # Colors
         self.WHITE = (1.0, 1.0, 1.0, 1.0)
@@ -42,17 +55,34 @@ class Block3DViewer:
         self.far = 1000.0
         self.camera_x, self.camera_y, self.camera_z = 0.0, 0.0, 0.0
 
-        # Lighting settings
-        self.light_dir = np.array([0.0, 0.0, -1.0], dtype=np.float32)
+        # Lighting settings; light_dir points towards the light
+        self.light_dir = np.array([0.0, 0.0, 1.0], dtype=np.float32)
         self.ambient = 0.3
+        self.ambient_occlusion = False
+        # Brightness of the six cube faces, recomputed only by set_lighting
+        self.face_shades = face_shades(self.light_dir, self.ambient)
 
-        # Block data
-        self.blocks = self.parse_commands(commands)
+        # Block data, keyed by integer cell; also the picking index
+        self.blocks = BlockStore()
+        # /fill boxes stay boxes: (M, 6) inclusive min / max cells and their colour ids
+        self.boxes = np.zeros((0, 6), dtype=np.int32)
+        self.box_ids = np.zeros(0, dtype=np.int32)
+        self.box_palette = []
+        self.load_commands(commands)
+        # Where 'e' saves the scene
+        self.export_path = "scene.schem"
         self.current_color = self.GRAY
         self.color_options = {"g": self.GRAY, "r": self.RED, "b": self.BLUE, "n": self.GREEN}
         self.color_names = {"g": "Gray", "r": "Red", "b": "Blue", "n": "Green"}
+        # Cell of the selected block
         self.selected_block = None
 
+        # GPU buffers: section -> (buffer, slots), rebuilt only for edited sections
+        self.block_buffers = {}
+        self.box_buffer = None
+        self.boxes_dirty = True
+        self.ground_buffer = None
+
         # Text input
         self.input_text = ""
         self.font = pygame.font.SysFont("arial", 24)
@@ -82,22 +112,36 @@ class Block3DViewer:
         glMatrixMode(GL_MODELVIEW)
         glLoadIdentity()
 
-    def parse_commands(self, commands):
-        blocks = []
-        for cmd in commands.split('\n'):
-            match = re.match(r'setblock\s+(-?\d+)\s+(-?\d+)\s+(-?\d+)\s+(.+)', cmd.strip())
-            if match:
-                x, y, z, block = match.groups()
-                # Convert block type to color (simplified mapping for demo)
-                color = self.GRAY  # Default to gray; extend this logic if needed
-                if "red" in block.lower():
-                    color = self.RED
-                elif "blue" in block.lower():
-                    color = self.BLUE
-                elif "green" in block.lower():
-                    color = self.GREEN
-                blocks.append((int(x), int(y), int(z), color))
-        return blocks
+    def block_color(self, block):
+        # Convert block type to color (simplified mapping for demo)
+        color = self.GRAY  # Default to gray; extend this logic if needed
+        if "red" in block.lower():
+            color = self.RED
+        elif "blue" in block.lower():
+            color = self.BLUE
+        elif "green" in block.lower() or "lime" in block.lower():
+            color = self.GREEN
+        return color
+
+    def load_commands(self, source):
+        """Add the setblock, fill and block_display commands of a string or an open .mcfunction file."""
+        result = import_commands(source)
+        colors = [self.block_color(name) for name in result["names"]]
+        # Block displays snap to the nearest cell
+        cells = np.vstack([result["blocks"], np.floor(result["displays"] + 0.5).astype(np.int32)])
+        ids = np.concatenate([result["block_ids"], result["display_ids"]])
+        self.blocks.load_array(cells, ids, colors)
+
+        if len(result["boxes"]):
+            palette = {color: i for i, color in enumerate(self.box_palette)}
+            box_ids = [palette.setdefault(color, len(palette)) for color in colors]
+            self.box_palette = list(palette)
+            self.boxes = np.vstack([self.boxes, result["boxes"]])
+            self.box_ids = np.concatenate([self.box_ids, np.array(box_ids, dtype=np.int32)[result["box_ids"]]])
+            self.boxes_dirty = True
+        stats = result["stats"]
+        print(f"Imported {stats['setblock']} setblock, {stats['fill']} fill and "
+              f"{stats['block_display']} block_display commands ({stats['skipped']} skipped)")
 
     def update_camera(self):
         """Update camera position and orientation."""
@@ -140,82 +184,116 @@ class Block3DViewer:
         up = up / np.linalg.norm(up)
         return right, up, forward
 
-    def draw_block(self, x, y, z, color, is_selected=False):
-        """Draw a block using OpenGL."""
-        vertices = np.array([
-            [x-0.5, y-0.5, z-0.5], [x+0.5, y-0.5, z-0.5],
-            [x+0.5, y+0.5, z-0.5], [x-0.5, y+0.5, z-0.5],
-            [x-0.5, y-0.5, z+0.5], [x+0.5, y-0.5, z+0.5],
-            [x+0.5, y+0.5, z+0.5], [x-0.5, y+0.5, z+0.5]
-        ], dtype=np.float32)
-        faces = [
-            (0, 1, 2, 3),  # Front
-            (5, 4, 7, 6),  # Back
-            (1, 5, 6, 2),  # Right
-            (4, 0, 3, 7),  # Left
-            (3, 2, 6, 7),  # Top
-            (4, 5, 1, 0)   # Bottom
-        ]
-        face_normals = [
-            [0, 0, -1], [0, 0, 1], [1, 0, 0], [-1, 0, 0], [0, 1, 0], [0, -1, 0]
-        ]
-        for face in faces:
-            glBegin(GL_QUADS)
-            for vertex_idx in face:
-                normal = face_normals[faces.index(face)]
-                dot = max(0, -np.dot(normal, self.light_dir))
-                intensity = self.ambient + (1 - self.ambient) * dot
-                face_color = [
-                    min(1.0, color[0] * intensity),
-                    min(1.0, color[1] * intensity),
-                    min(1.0, color[2] * intensity),
-                    color[3]
-                ]
-                glColor4f(*face_color)
-                glVertex3fv(vertices[vertex_idx])
-            glEnd()
-        if is_selected:
-            glColor4f(self.ORANGE[0], self.ORANGE[1], self.ORANGE[2], 1.0)
-        else:
+    def add_block(self, x, y, z, color):
+        """Place a block at the nearest cell, replacing whatever is there."""
+        self.blocks.set((x, y, z), color)
+
+    def remove_selected_block(self):
+        if self.selected_block is not None:
+            self.blocks.remove(self.selected_block)
+            self.selected_block = None
+
+    def set_lighting(self, light_dir=None, ambient=None, ambient_occlusion=None):
+        """Change the lighting and re-bake it into every buffer."""
+        if light_dir is not None:
+            self.light_dir = np.asarray(light_dir, dtype=np.float32) / np.linalg.norm(light_dir)
+        if ambient is not None:
+            self.ambient = ambient
+        if ambient_occlusion is not None:
+            self.ambient_occlusion = ambient_occlusion
+        self.face_shades = face_shades(self.light_dir, self.ambient)
+        self.blocks.dirty.update(self.blocks.sections)
+        self.boxes_dirty = True
+
+    def build_block_buffer(self, slots):
+        """Upload the blocks in these store slots as shaded cubes; lighting is baked into the colours."""
+        palette = np.array(self.blocks.palette, dtype=np.float32)
+        positions = self.blocks.positions[slots]
+        occlusion = cube_occlusion(positions, self.blocks.occupancy) if self.ambient_occlusion else None
+        return self.shaded_buffer(positions, None, palette[self.blocks.values[slots]], occlusion)
+
+    def build_box_buffer(self):
+        """Upload every /fill box as one scaled cube."""
+        if self.box_buffer is not None:
+            self.box_buffer.delete()
+            self.box_buffer = None
+        self.boxes_dirty = False
+        if len(self.boxes):
+            low, high = self.boxes[:, :3], self.boxes[:, 3:]
+            palette = np.array(self.box_palette, dtype=np.float32)
+            self.box_buffer = self.shaded_buffer((low + high) / 2.0, high - low + 1, palette[self.box_ids])
+
+    def shaded_buffer(self, positions, sizes, block_colors, occlusion=None):
+        """
+        Cubes (or boxes of the given sizes) with the lighting baked into their
+        colours; occlusion optionally darkens every vertex further.
+        """
+        colors = np.repeat(block_colors, 24, axis=0)
+        vertices, normals = block_cubes(positions, sizes)
+
+        # block_cubes emits the six faces of every cube in FACES order
+        intensity = np.tile(np.repeat(self.face_shades, 4), len(block_colors))
+        if occlusion is not None:
+            intensity *= occlusion
+        colors[:, :3] = np.minimum(1.0, colors[:, :3] * intensity[:, None])
+        return VertexBuffer(vertices, normals, colors=colors)
+
+    def update_block_buffers(self):
+        """Re-mesh only the sections edited since the last frame."""
+        for section in self.blocks.take_dirty():
+            old = self.block_buffers.pop(section, None)
+            if old is not None:
+                old[0].delete()
+            slots = self.blocks.section_slots(section)
+            if slots:
+                self.block_buffers[section] = (self.build_block_buffer(slots), slots)
+
+    def draw_blocks(self):
+        """Draw all blocks from the section buffers and the fill boxes, with black outlines."""
+        self.update_block_buffers()
+        if self.boxes_dirty:
+            self.build_box_buffer()
+        selected = self.blocks.cells.get(self.selected_block)
+
+        buffers = list(self.block_buffers.values())
+        if self.box_buffer is not None:
+            buffers.append((self.box_buffer, ()))
+        for buffer, slots in buffers:
+            buffer.bind()
+            buffer.draw()
+
+            # Outlines use a flat colour instead of the per-vertex one
+            glDisableClientState(GL_COLOR_ARRAY)
+            glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
             glColor4f(0.0, 0.0, 0.0, 1.0)
-        glBegin(GL_LINE_LOOP)
-        for vertex_idx in face:
-            glVertex3fv(vertices[vertex_idx])
-        glEnd()
+            buffer.draw()
+            if selected is not None and selected in slots:
+                glColor4f(self.ORANGE[0], self.ORANGE[1], self.ORANGE[2], 1.0)
+                buffer.draw(slots.index(selected) * 24, 24)
+            glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+            glEnableClientState(GL_COLOR_ARRAY)
+            buffer.unbind()
 
     def draw_ground(self):
         """Draw a checkerboard ground plane at y=-0.5 using OpenGL."""
-        grid_size = 20
-        tile_size = 1.0
-        glBegin(GL_QUADS)
-        for i in range(-grid_size, grid_size + 1):
-            for j in range(-grid_size, grid_size + 1):
-                x = i * tile_size
-                z = j * tile_size
-                color = self.LIGHT_GRAY if (i + j) % 2 == 0 else self.DARK_GRAY
-                glColor4f(color[0], color[1], color[2], color[3])
-                glVertex3f(x, -0.5, z)
-                glVertex3f(x + tile_size, -0.5, z)
-                glVertex3f(x + tile_size, -0.5, z + tile_size)
-                glVertex3f(x, -0.5, z + tile_size)
-        glEnd()
-
-    def select_block(self, mx, my, camera_pos):
-        """Select the closest block to the mouse click."""
-        closest = None
-        min_dist = float('inf')
-        mx -= self.RENDER_X
-        my = self.RENDER_HEIGHT - (my - self.RENDER_Y)
-        if 0 <= mx < self.RENDER_WIDTH and 0 <= my < self.RENDER_HEIGHT:
-            for i, (x, y, z, _) in enumerate(self.blocks):
-                dx = x - camera_pos[0]
-                dy = y - camera_pos[1]
-                dz = z - camera_pos[2]
-                dist = math.sqrt(dx*dx + dy*dy + dz*dz)
-                if dist < min_dist and dist < 50:
-                    min_dist = dist
-                    closest = i
-        self.selected_block = closest
+        if self.ground_buffer is None:
+            vertices, normals, colors = ground_mesh(20, -0.5, self.LIGHT_GRAY, self.DARK_GRAY)
+            self.ground_buffer = VertexBuffer(vertices, normals, colors=colors)
+        self.ground_buffer.bind()
+        self.ground_buffer.draw()
+        self.ground_buffer.unbind()
+
+    def select_block(self, mx, my):
+        """Select the first block under the mouse, using the current camera matrices."""
+        # Pixel centre, with y flipped to OpenGL's bottom-up window coordinates
+        origin, direction = unproject_ray(
+            mx + 0.5, self.HEIGHT - my - 0.5,
+            glGetDoublev(GL_MODELVIEW_MATRIX),
+            glGetDoublev(GL_PROJECTION_MATRIX),
+            glGetIntegerv(GL_VIEWPORT)
+        )
+        hit = self.blocks.raycast(origin, direction, self.far)
+        self.selected_block = hit[1] if hit else None
 
     def setup(self):
         """Initialize the game."""
@@ -223,14 +301,16 @@ class Block3DViewer:
 
     async def update_loop(self):
         """Main update loop."""
-        keys = pygame.key.get_pressed()
-        shift = keys[pygame.K_LSHIFT] or keys[pygame.K_RSHIFT]
-        move_speed = 0.1 if shift else 0.05
         running = True
         while running:
-            camera_pos = self.update_camera()
+            events = self.redraw.events()
+            keys = pygame.key.get_pressed()
+            shift = keys[pygame.K_LSHIFT] or keys[pygame.K_RSHIFT]
+            move_speed = 0.1 if shift else 0.05
+            # Sets the modelview matrix that picking unprojects through
+            self.update_camera()
 
-            for event in pygame.event.get():
+            for event in events:
                 if event.type == pygame.QUIT:
                     running = False
                 elif event.type == pygame.KEYDOWN:
@@ -240,7 +320,7 @@ class Block3DViewer:
                         if event.key == pygame.K_RETURN:
                             try:
                                 x, y, z = map(float, self.input_text.split())
-                                self.blocks.append((x, y, z, self.current_color))
+                                self.add_block(x, y, z, self.current_color)
                                 self.input_text = ""
                             except ValueError:
                                 self.input_text = "Invalid"
@@ -248,11 +328,22 @@ class Block3DViewer:
                             self.input_text = self.input_text[:-1]
                         else:
                             self.input_text += event.unicode
+                    elif event.key in (pygame.K_z, pygame.K_y) and event.mod & pygame.KMOD_CTRL:
+                        if event.key == pygame.K_z:
+                            self.blocks.undo()
+                        else:
+                            self.blocks.redo()
+                    elif event.key == pygame.K_DELETE:
+                        self.remove_selected_block()
                     elif event.key in (pygame.K_g, pygame.K_r, pygame.K_b, pygame.K_n):
                         self.current_color = self.color_options[chr(event.key).lower()]
+                    elif event.key == pygame.K_o:
+                        self.set_lighting(ambient_occlusion=not self.ambient_occlusion)
+                    elif event.key == pygame.K_e:
+                        self.export_schematic(self.export_path)
                     elif event.key == pygame.K_p:
                         print("Block coordinates in order of placement:")
-                        for i, (x, y, z, _) in enumerate(self.blocks):
+                        for i, ((x, y, z), _) in enumerate(self.blocks.items()):
                             print(f"{i+1}: ({x}, {y}, {z})")
                         running = False
                 elif event.type == pygame.MOUSEBUTTONDOWN:
@@ -260,7 +351,7 @@ class Block3DViewer:
                         if event.button == 1:
                             self.dragging_left = True
                             self.last_mouse_pos = event.pos
-                            self.select_block(*event.pos, camera_pos)
+                            self.select_block(*event.pos)
                         elif event.button == 2:
                             self.dragging_middle = True
                             self.last_mouse_pos = event.pos
@@ -272,7 +363,7 @@ class Block3DViewer:
                         if self.input_text:
                             try:
                                 x, y, z = map(float, self.input_text.split())
-                                self.blocks.append((x, y, z, self.current_color))
+                                self.add_block(x, y, z, self.current_color)
                                 self.input_text = ""
                             except ValueError:
                                 self.input_text = "Invalid"
@@ -312,11 +403,15 @@ class Block3DViewer:
                 if keys[pygame.K_d]:
                     self.camera_x += move_speed
 
+            if not running or not self.redraw.needs_redraw():
+                await asyncio.sleep(0)
+                continue
+
             # Draw
+            self.update_camera()
             glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
             self.draw_ground()
-            for i, (x, y, z, color) in enumerate(self.blocks):
-                self.draw_block(x, y, z, color, is_selected=(i == self.selected_block))
+            self.draw_blocks()
 
             # Draw UI outside render region
             self.screen.fill((0.1, 0.1, 0.1))
@@ -325,7 +420,9 @@ class Block3DViewer:
                 f"Current color: {self.color_names[[k for k, v in self.color_options.items() if v == self.current_color][0]]}",
                 "Press 'g' (gray), 'r' (red), 'b' (blue), 'n' (green) to change color",
                 "Left click to pan camera, middle click to orbit, scroll to zoom",
-                "Hold Shift + WASD to move camera, left click to select (orange outline), 'p' to print and exit"
+                "Hold Shift + WASD to move camera, left click to select (orange outline), 'p' to print and exit",
+                "Delete removes the selected block, Ctrl+Z / Ctrl+Y to undo / redo",
+                f"Press 'e' to export the scene to {self.export_path}, 'o' to toggle ambient occlusion"
             ]
             for i, text in enumerate(instructions):
                 surface = self.font.render(text, True, self.WHITE)
@@ -346,30 +443,69 @@ class Block3DViewer:
                 if self.input_text:
                     try:
                         x, y, z = map(float, self.input_text.split())
-                        self.blocks.append((x, y, z, self.current_color))
+                        self.add_block(x, y, z, self.current_color)
                         self.input_text = ""
                     except ValueError:
                         self.input_text = "Invalid"
 
             pygame.display.flip()
-            await asyncio.sleep(1.0 / self.FPS)
+            self.redraw.drawn()
+            # Frame pacing happens in self.redraw.events()
+            await asyncio.sleep(0)
 
     async def main(self):
         self.setup()
         await self.update_loop()
+        for buffer, _ in self.block_buffers.values():
+            buffer.delete()
+        for buffer in (self.box_buffer, self.ground_buffer):
+            if buffer is not None:
+                buffer.delete()
+
+    def block_type(self, color):
+        # Simplify color to block type for command (extend as needed)
+        block_type = "minecraft:stone"  # Default
+        if color == self.RED:
+            block_type = "minecraft:redstone_block"
+        elif color == self.BLUE:
+            block_type = "minecraft:blue_ice"
+        elif color == self.GREEN:
+            block_type = "minecraft:lime_concrete"
+        return block_type
+
+    def scene_schematic(self):
+        """The blocks and fill boxes as a schematic dict covering their bounding box, or None when empty."""
+        cells, block_ids = self.blocks.arrays()
+        names = [self.block_type(color) for color in self.blocks.palette + self.box_palette]
+        return scene_schematic(names, cells, block_ids, self.boxes, self.box_ids + len(self.blocks.palette))
+
+    def export_schematic(self, path):
+        """Save the scene as a .schem."""
+        try:
+            schematic = self.scene_schematic()
+            if schematic is None:
+                print("Nothing to export")
+                return False
+            save_schematic(path, schematic, COMPRESS_LEVEL)
+            print(f"Exported {schematic['Width']}x{schematic['Height']}x{schematic['Length']} scene to {path}")
+            return True
+        except Exception as e:
+            print(f"Export to {path} failed: {e}")
+            return False
 
-    def get_commands(self):
+    def get_commands(self, compact=False):
+        """
+        Commands that rebuild the scene. Fill boxes come first so the single
+        blocks placed over them win, as in the viewer. With compact, the scene
+        is merged into as few /fill boxes as possible instead.
+        """
+        if compact:
+            return "\n".join(scene_commands(self.scene_schematic()))
         commands = []
-        for x, y, z, color in self.blocks:
-            # Simplify color to block type for command (extend as needed)
-            block_type = "minecraft:stone"  # Default
-            if color == self.RED:
-                block_type = "minecraft:redstone_block"
-            elif color == self.BLUE:
-                block_type = "minecraft:blue_ice"
-            elif color == self.GREEN:
-                block_type = "minecraft:lime_concrete"
-            commands.append(f"setblock {x} {y} {z} {block_type}")
+        for (x0, y0, z0, x1, y1, z1), box_id in zip(self.boxes.tolist(), self.box_ids.tolist()):
+            commands.append(f"fill {x0} {y0} {z0} {x1} {y1} {z1} {self.block_type(self.box_palette[box_id])}")
+        for (x, y, z), color in self.blocks.items():
+            commands.append(f"setblock {x} {y} {z} {self.block_type(color)}")
         return "\n".join(commands)
 
     def run(self):
@@ -0,0 +1,46 @@
+# boxes.py - Vectorized run merging shared by /fill compaction and meshing
+#
+# Both the command block compaction and the greedy mesher grow boxes one axis
+# at a time: entries that agree on every other column and sit on consecutive
+# coordinates along one axis become a single run. Runs are found with a sort
+# and a few array comparisons, never a Python loop per entry.
+
+import numpy as np
+
+
+def split_groups(breaks, limits):
+    """
+    Add breaks so no group is longer than its limit.
+
+    breaks marks the first element of every group; limits is the per-element
+    maximum group length (constant within a group).
+    """
+    group_start = np.maximum.accumulate(np.where(breaks, np.arange(len(breaks)), 0))
+    position = np.arange(len(breaks)) - group_start
+    return breaks | (position % limits == 0)
+
+
+def merge_runs(columns, along, limits):
+    """
+    Merge consecutive entries that agree on every column except `along`.
+
+    columns is a list of equal-length int arrays, `along` the index of the
+    axis being merged. Returns (columns of the merged groups, run length).
+    """
+    key = columns[:along] + columns[along + 1:]
+    order = np.lexsort([columns[along]] + key[::-1])
+    sorted_cols = [c[order] for c in columns]
+    limits = limits[order]
+
+    breaks = np.ones(len(order), dtype=bool)
+    if len(order) > 1:
+        same_key = np.ones(len(order) - 1, dtype=bool)
+        for c in sorted_cols[:along] + sorted_cols[along + 1:]:
+            same_key &= c[1:] == c[:-1]
+        adjacent = sorted_cols[along][1:] == sorted_cols[along][:-1] + 1
+        breaks[1:] = ~(same_key & adjacent)
+    breaks = split_groups(breaks, limits)
+
+    starts = np.flatnonzero(breaks)
+    counts = np.diff(np.append(starts, len(order)))
+    return [c[starts] for c in sorted_cols], counts
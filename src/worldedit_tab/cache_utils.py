@@ -0,0 +1,79 @@
+# cache_utils.py - Helpers shared by the on-disk caches
+#
+# The schematic and texture atlas caches store every entry as <key>.npy plus a
+# <key>.json sidecar holding at least "nbytes" (the size of the .npy) and
+# "last_used". Files are written to a temporary file of their own and then
+# replaced atomically, so processes sharing a cache (e.g. the thumbnail pool)
+# never read half a file or move each other's temporary files. Entries age
+# out through LRU eviction once a cache grows past its byte budget.
+
+import json
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+def read_json(path, default):
+    """Parsed contents of a JSON file, or default when it is missing or unreadable."""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return default
+
+
+@contextmanager
+def atomic_write(path, mode="w"):
+    """Open a unique temporary file next to path for writing; it replaces path once the block completes."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_json(path, value):
+    """Write value as JSON through a temporary file, so readers never see half a file."""
+    with atomic_write(path) as f:
+        json.dump(value, f)
+
+
+def entry_paths(cache_dir, key):
+    """(.npy, .json) paths of a cache entry."""
+    return os.path.join(cache_dir, key + ".npy"), os.path.join(cache_dir, key + ".json")
+
+
+def evict(cache_dir, max_bytes, keep=(), ignore=()):
+    """
+    Delete least recently used entries (except those in keep) until the cache
+    fits in max_bytes. ignore names .json files in cache_dir that are not
+    entry sidecars.
+    """
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(".json") and name not in ignore:
+            key = name[:-5]
+            sidecar = read_json(os.path.join(cache_dir, name), None)
+            if sidecar is not None and key not in keep:
+                entries.append((sidecar.get("last_used", 0), key, sidecar.get("nbytes", 0)))
+
+    total = sum(nbytes for _, _, nbytes in entries)
+    for key in keep:
+        total += (read_json(entry_paths(cache_dir, key)[1], None) or {}).get("nbytes", 0)
+    for _, key, nbytes in sorted(entries):
+        if total <= max_bytes:
+            break
+        for path in entry_paths(cache_dir, key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        total -= nbytes
+        logging.debug(f"Evicted cache entry {key} from {cache_dir}")
@@ -0,0 +1,57 @@
+# compaction.py - Merge runs of identical blocks into /fill boxes
+#
+# Greedy, axis by axis: identical neighbours along x become runs, runs that
+# line up on consecutive z rows become rectangles, rectangles that line up on
+# consecutive y layers become boxes. Every step is a sort plus a few
+# vectorized comparisons, so it scales to tens of millions of voxels.
+
+import numpy as np
+
+from ..boxes import merge_runs, split_groups
+
+# /fill refuses to touch more than this many blocks in one command
+MAX_FILL_VOLUME = 32768
+
+
+def compact_blocks(block_ids, air_id=-1, max_volume=MAX_FILL_VOLUME):
+    """
+    Greedily merge same-state voxels into axis-aligned boxes.
+
+    block_ids is a (height, length, width) grid of state ids with air_id for
+    air. Returns an (N, 7) int32 array of x0, y0, z0, x1, y1, z1, state_id in
+    grid coordinates; no box holds more than max_volume blocks.
+    """
+    height, length, width = block_ids.shape
+    flat = np.ascontiguousarray(block_ids).reshape(-1, width)
+
+    # Runs along x within every (y, z) row
+    starts = np.ones(flat.shape, dtype=bool)
+    starts[:, 1:] = flat[:, 1:] != flat[:, :-1]
+    starts = split_groups(starts.ravel(), max_volume).reshape(flat.shape)
+    run_rows, run_x = np.nonzero(starts)
+    run_ids = flat[run_rows, run_x]
+
+    next_start = np.append(run_x[1:], width)
+    next_start[np.append(run_rows[1:] != run_rows[:-1], True)] = width
+    x_len = next_start - run_x
+
+    keep = run_ids != air_id
+    run_rows, run_x, run_ids, x_len = run_rows[keep], run_x[keep], run_ids[keep], x_len[keep]
+    y = (run_rows // length).astype(np.int64)
+    z = (run_rows % length).astype(np.int64)
+    x0 = run_x.astype(np.int64)
+    x1 = x0 + x_len - 1
+    ids = run_ids.astype(np.int64)
+
+    # Rectangles: stack identical runs along z
+    (y, z, x0, x1, ids), z_len = merge_runs([y, z, x0, x1, ids], 1, max_volume // x_len)
+
+    # Boxes: stack identical rectangles along y
+    z1 = z + z_len - 1
+    (y, z, z1, x0, x1, ids), y_len = merge_runs(
+        [y, z, z1, x0, x1, ids], 0, max_volume // ((x1 - x0 + 1) * (z1 - z + 1))
+    )
+
+    boxes = np.stack([x0, y, z, x1, y + y_len - 1, z1, ids], axis=1).astype(np.int32)
+    # Deterministic output order: bottom layer first, then z, then x
+    return boxes[np.lexsort((boxes[:, 0], boxes[:, 2], boxes[:, 1]))]
@@ -1,5 +1,11 @@
+import logging
 import math
-from nbtlib.tag import Compound, List, Byte, Int, Long, Short, ByteArray, String, IntArray
+import numpy as np
+from nbtlib.tag import Compound
+
+from .compaction import compact_blocks
+from ..nbt_writer import to_compound
+from ..varint import decode_block_data, encode_varints
 
 AIR_BLOCK = "minecraft:air"
 
@@ -8,35 +14,272 @@ def command_block_state(facing: str):
     return f"minecraft:command_block[conditional=false,facing={facing}]"
 
 
-def convert_to_command_block_wall_absolute_fixed(
+def palette_states(palette) -> np.ndarray:
+    """Object array mapping palette id -> block state, with one trailing air slot for unknown ids."""
+    size = max((int(v) for v in palette.values()), default=-1) + 1
+    states = np.full(size + 1, AIR_BLOCK, dtype=object)
+    for state, idx in palette.items():
+        states[int(idx)] = str(state)
+    return states
+
+
+# Largest lookup table _setblock_commands builds before falling back to per-command formatting
+MAX_TABLE_SIZE = 1 << 21
+
+
+def _setblock_commands(abs_x, abs_y, abs_z, state_id, states) -> list[str]:
+    """
+    Format "setblock x y z state" for every block.
+
+    Coordinates span a small range, so instead of formatting a million
+    f-strings the "setblock x y " heads and "z state" tails are formatted once
+    each into tables, and every command is a gather plus one concatenation.
+    """
+    if len(abs_x) == 0:
+        return []
+
+    x0, y0, z0 = int(abs_x.min()), int(abs_y.min()), int(abs_z.min())
+    nx = int(abs_x.max()) - x0 + 1
+    ny = int(abs_y.max()) - y0 + 1
+    nz = int(abs_z.max()) - z0 + 1
+    ns = len(states)
+
+    if nx * ny > MAX_TABLE_SIZE or nz * ns > MAX_TABLE_SIZE:
+        return [
+            f"setblock {bx} {by} {bz} {block}"
+            for bx, by, bz, block in zip(abs_x.tolist(), abs_y.tolist(), abs_z.tolist(), states[state_id].tolist())
+        ]
+
+    heads = np.array(
+        [f"setblock {bx} {by} " for bx in range(x0, x0 + nx) for by in range(y0, y0 + ny)],
+        dtype=object
+    )
+    tails = np.array([f"{bz} {block}" for bz in range(z0, z0 + nz) for block in states], dtype=object)
+
+    head_idx = (abs_x - x0).astype(np.int64) * ny + (abs_y - y0)
+    tail_idx = (abs_z - z0).astype(np.int64) * ns + state_id
+    return (heads[head_idx] + tails[tail_idx]).tolist()
+
+
+def _fill_commands(boxes, states) -> list[str]:
+    """Format boxes (absolute x0 y0 z0 x1 y1 z1 id) as setblock for single blocks and fill otherwise."""
+    commands = np.empty(len(boxes), dtype=object)
+    single = (boxes[:, 0] == boxes[:, 3]) & (boxes[:, 1] == boxes[:, 4]) & (boxes[:, 2] == boxes[:, 5])
+
+    unit = boxes[single]
+    commands[single] = _setblock_commands(unit[:, 0], unit[:, 1], unit[:, 2], unit[:, 6], states)
+    commands[~single] = [
+        f"fill {x0} {y0} {z0} {x1} {y1} {z1} {states[state_id]}"
+        for x0, y0, z0, x1, y1, z1, state_id in boxes[~single].tolist()
+    ]
+    return commands.tolist()
+
+
+def _grid_commands(block_indices, states, shift, compact: bool):
+    """
+    Emit the commands for one (height, length, width) index grid.
+
+    shift is added to grid coordinates to get absolute positions. Returns
+    (x, y, z, commands, block_count) with x/y/z in grid coordinates.
+    """
+    block_indices = np.minimum(block_indices, len(states) - 1)
+    solid = states != AIR_BLOCK
+
+    if compact:
+        block_ids = np.where(solid[block_indices], block_indices.astype(np.int32), -1)
+        boxes = compact_blocks(block_ids)
+        block_count = int(np.count_nonzero(block_ids != -1))
+
+        # Absolute coordinates
+        absolute = boxes.copy()
+        absolute[:, 0:3] += shift
+        absolute[:, 3:6] += shift
+        return boxes[:, 0], boxes[:, 1], boxes[:, 2], _fill_commands(absolute, states), block_count
+
+    # BlockData order: y, then z, then x
+    y, z, x = np.nonzero(solid[block_indices])
+    state_id = block_indices[y, z, x]
+    x, y, z = x.astype(np.int32), y.astype(np.int32), z.astype(np.int32)
+
+    # Absolute coordinates
+    commands = _setblock_commands(x + shift[0], y + shift[1], z + shift[2], state_id, states)
+    return x, y, z, commands, len(commands)
+
+
+def _command_shift(data, player_pos):
+    offset = data.get('Offset', (0, 0, 0))
+    px, py, pz = map(int, player_pos)
+    return np.array([px + int(offset[0]), py + int(offset[1]), pz + int(offset[2])], dtype=np.int32)
+
+
+# Layers per slab when converting slab by slab
+SLAB_HEIGHT = 16
+
+
+def _iter_slabs(block_indices, states, shift, compact: bool, slab_height: int = SLAB_HEIGHT):
+    """Yield (x, y, z, commands, block_count, voxels) per horizontal slab, y in grid coordinates."""
+    for y0 in range(0, block_indices.shape[0], slab_height):
+        slab = np.asarray(block_indices[y0:y0 + slab_height])
+        slab_shift = shift + np.array([0, y0, 0], dtype=np.int32)
+        x, y, z, commands, block_count = _grid_commands(slab, states, slab_shift, compact)
+        yield x, y + y0, z, commands, block_count, slab.size
+
+
+def _merge_slabs(results):
+    """Concatenate per-slab results in order into (x, y, z, commands, block_count)."""
+    empty = np.zeros(0, dtype=np.int32)
+    x = np.concatenate([r[0] for r in results] or [empty])
+    y = np.concatenate([r[1] for r in results] or [empty])
+    z = np.concatenate([r[2] for r in results] or [empty])
+    commands = [command for r in results for command in r[3]]
+    return x, y, z, commands, sum(r[4] for r in results)
+
+
+def emit_commands(
     data,
     player_pos: tuple[float, float, float],
-    wall_width: int,
-    facing: str
-) -> Compound:
+    compact: bool = False,
+    progress=None
+):
+    """
+    Build the command for every non-air block in one batch.
+
+    With compact, runs of identical blocks are merged into /fill boxes first.
+    Returns (x, y, z, commands, stats) where x/y/z are the schematic-local
+    positions (box minimum corners when compacting) the layouts below place
+    command blocks from, and stats counts blocks and commands.
+
+    progress, if given, is called as progress(voxels_scanned, commands_emitted)
+    as the work advances and may raise to abort.
+    """
+    states = palette_states(data['Palette'])
+    block_indices = decode_block_data(data)
+    shift = _command_shift(data, player_pos)
+
+    if progress is not None:
+        # Split so progress (and cancelling) can happen in between. Without
+        # compact this is the same output as one batch; with it /fill boxes
+        # stop at slab boundaries
+        results = []
+        scanned = 0
+        emitted = 0
+        for result in _iter_slabs(block_indices, states, shift, compact):
+            results.append(result)
+            scanned += result[5]
+            emitted += len(result[3])
+            progress(scanned, emitted)
+        x, y, z, commands, block_count = _merge_slabs(results)
+    else:
+        x, y, z, commands, block_count = _grid_commands(block_indices, states, shift, compact)
+    if compact:
+        logging.info(f"Fill compaction: {block_count} blocks -> {len(commands)} commands")
 
+    stats = {"blocks": block_count, "commands": len(commands)}
+    return x, y, z, commands, stats
+
+
+def iter_commands(
+    data,
+    player_pos: tuple[float, float, float],
+    compact: bool = False,
+    slab_height: int = SLAB_HEIGHT
+):
+    """
+    Yield the same commands as emit_commands, one horizontal slab at a time.
+
+    Only one slab is decoded into commands at once, so memory stays flat for
+    arbitrarily large (e.g. memory-mapped) schematics. /fill boxes do not
+    cross slab boundaries.
+    """
+    states = palette_states(data['Palette'])
+    for result in _iter_slabs(decode_block_data(data), states, _command_shift(data, player_pos),
+                              compact, slab_height):
+        yield from result[3]
+
+
+def generate_block_list(data, player_pos: tuple[float, float, float], compact: bool = False) -> list[str]:
+    """Return the setblock (or, with compact, fill) commands for every non-air block."""
+    return emit_commands(data, player_pos, compact)[3]
+
+
+def _wall_positions(count: int, wall_width: int, facing: str):
+    index = np.arange(count, dtype=np.int32)
+    col = index % wall_width
+    row = index // wall_width
+    zeros = np.zeros(count, dtype=np.int32)
+    if facing in ("north", "south"):
+        return zeros, row, col
+    return col, row, zeros
+
+
+def _wall_offset(facing: str, new_width: int, new_length: int):
+    # 1-block gap offset for wall placement
+    if facing == "east":
+        return 1, 0
+    if facing == "west":
+        return -new_width, 0
+    if facing == "south":
+        return 0, 1
+    if facing == "north":
+        return 0, -new_length
+    return 0, 0
+
+
+def convert_to_command_blocks(
+    data,
+    player_pos: tuple[float, float, float],
+    compact: bool = False,
+    progress=None
+) -> dict:
+    """
+    Replace every non-air block with a command block in its original position.
+
+    With compact, each /fill box gets one command block at its minimum corner.
+    Returns a schematic dict for nbt_writer; air stays air.
+    """
     width = int(data['Width'])
     height = int(data['Height'])
     length = int(data['Length'])
-    palette = data['Palette']
-    block_data = data['BlockData']
-    offset = data.get('Offset', IntArray([0, 0, 0]))
+    offset = [int(v) for v in data.get('Offset', (0, 0, 0))]
 
-    px, py, pz = map(int, player_pos)
-    inv_palette = {int(v): k for k, v in palette.items()}
-
-    # Collect all non-air blocks
-    blocks = []
-    for hy in range(height):
-        for hz in range(length):
-            for hx in range(width):
-                idx = hy * (length * width) + hz * width + hx
-                state_id = int(block_data[idx])
-                block = inv_palette.get(state_id)
-                if block and block != AIR_BLOCK:
-                    blocks.append((hx, hy, hz, block))
-
-    total = len(blocks)
+    x, y, z, commands, _ = emit_commands(data, player_pos, compact, progress)
+
+    # Palette id 0 is the command block, 1 is air
+    block_ids = np.ones((height, length, width), dtype=np.uint8)
+    block_ids[y, z, x] = 0
+
+    return {
+        "Version": int(data["Version"]),
+        "DataVersion": int(data["DataVersion"]),
+        "Width": width,
+        "Height": height,
+        "Length": length,
+        "PaletteMax": 2,
+        "Palette": {command_block_state("up"): 0, AIR_BLOCK: 1},
+        "BlockData": encode_varints(block_ids),
+        "BlockEntities": zip(x.tolist(), y.tolist(), z.tolist(), commands),
+        "BlockEntityCount": len(commands),
+        "Offset": tuple(offset),
+        "Metadata": {
+            "WEOffsetX": offset[0],
+            "WEOffsetY": offset[1],
+            "WEOffsetZ": offset[2]
+        },
+    }
+
+
+def convert_to_command_block_wall(
+    data,
+    player_pos: tuple[float, float, float],
+    wall_width: int,
+    facing: str,
+    compact: bool = False,
+    progress=None
+) -> dict:
+    """Lay the schematic's blocks out as a command block wall, as a schematic dict for nbt_writer."""
+    _, _, _, commands, _ = emit_commands(data, player_pos, compact, progress)
+
+    total = len(commands)
     wall_height = math.ceil(total / wall_width)
 
     # Wall dimensions
@@ -48,101 +291,36 @@ def convert_to_command_block_wall_absolute_fixed(
         new_length = 1
     new_height = wall_height
 
-    new_palette = Compound({command_block_state(facing): Int(0)})
+    # Unused wall slots past the last command block stay in the palette's single
+    # state; they carry no block entity, so they paste as inert command blocks
     total_size = new_width * new_height * new_length
-    new_block_data = ByteArray([0] * total_size)
-    new_block_entities = List[Compound]()
-
-    # Generate command blocks for real blocks
-    for i, (hx, hy, hz, block) in enumerate(blocks):
-        col = i % wall_width
-        row = i // wall_width
-
-        if facing in ("north", "south"):
-            wx = 0
-            wy = row
-            wz = col
-        else:
-            wx = col
-            wy = row
-            wz = 0
+    wx, wy, wz = _wall_positions(total, wall_width, facing)
+    offset_x, offset_z = _wall_offset(facing, new_width, new_length)
 
-        # Absolute coordinates
-        abs_x = px + int(offset[0]) + hx
-        abs_y = py + int(offset[1]) + hy
-        abs_z = pz + int(offset[2]) + hz
-
-        cmd = f"setblock {abs_x} {abs_y} {abs_z} {block}"
-
-        be = Compound({
-            "id": String("minecraft:command_block"),
-            "Pos": IntArray([wx, wy, wz]),
-            "Command": String(cmd),
-            "auto": Byte(0),
-            "conditionMet": Byte(0),
-            "powered": Byte(0),
-            "TrackOutput": Byte(1),
-            "SuccessCount": Int(0),
-            "UpdateLastExecution": Byte(1),
-            "LastExecution": Long(0),
-            "LastOutput": String("")
-        })
-
-        new_block_entities.append(be)
-
-    # Fill remaining wall spaces with **stone blocks in the schematic**, not command blocks
-    remaining = wall_width * wall_height - len(blocks)
-    for i in range(len(blocks), len(blocks) + remaining):
-        col = i % wall_width
-        row = i // wall_width
-
-        if facing in ("north", "south"):
-            wx = 0
-            wy = row
-            wz = col
-        else:
-            wx = col
-            wy = row
-            wz = 0
-
-        # Set the ByteArray to 1 (or some value) for stone? Or just leave as air; the schematic will be filled with stone in game
-        # We'll add a block entity just for the position in the schematic so wall is complete
-        # But no command block is needed; the actual stone will appear when pasted
-        # If you want, you can skip adding to BlockEntities entirely
+    return {
+        "Version": int(data["Version"]),
+        "DataVersion": int(data["DataVersion"]),
+        "Width": new_width,
+        "Height": new_height,
+        "Length": new_length,
+        "PaletteMax": 1,
+        "Palette": {command_block_state(facing): 0},
+        "BlockData": encode_varints(np.zeros(total_size, dtype=np.uint8)),
+        "BlockEntities": zip(wx.tolist(), wy.tolist(), wz.tolist(), commands),
+        "BlockEntityCount": total,
+        "Offset": (offset_x, 0, offset_z),
+        "Metadata": {
+            "WEOffsetX": offset_x,
+            "WEOffsetY": 0,
+            "WEOffsetZ": offset_z
+        },
+    }
 
-    # 1-block gap offset for wall placement
-    if facing == "east":
-        offset_x = 1
-        offset_z = 0
-    elif facing == "west":
-        offset_x = -new_width
-        offset_z = 0
-    elif facing == "south":
-        offset_x = 0
-        offset_z = 1
-    elif facing == "north":
-        offset_x = 0
-        offset_z = -new_length
-    else:
-        offset_x = 0
-        offset_z = 0
-
-    new_data = Compound({
-        "Version": data["Version"],
-        "DataVersion": data["DataVersion"],
-        "Width": Short(new_width),
-        "Height": Short(new_height),
-        "Length": Short(new_length),
-        "PaletteMax": Int(1),
-        "Palette": new_palette,
-        "BlockData": new_block_data,
-        "BlockEntities": new_block_entities,
-        "Offset": IntArray([offset_x, 0, offset_z]),
-        "Metadata": Compound({
-            "WEOffsetX": Int(offset_x),
-            "WEOffsetY": Int(0),
-            "WEOffsetZ": Int(offset_z)
-        }),
-    })
-
-    return new_data
\ No newline at end of file
+
+def convert_to_command_block_wall_absolute_fixed(
+    data,
+    player_pos: tuple[float, float, float],
+    wall_width: int,
+    facing: str
+) -> Compound:
+    return to_compound(convert_to_command_block_wall(data, player_pos, wall_width, facing))
@@ -0,0 +1,122 @@
+# datapack.py - Export converter commands as a datapack
+#
+# Layout written under out_dir/<pack name>/:
+#   pack.mcmeta
+#   data/<namespace>/function/<name>.mcfunction            root function
+#   data/<namespace>/function/<name>/part_0000.mcfunction  shards
+# Commands are streamed into the shards line by line. Each shard stays under
+# maxCommandChainLength, and the root function schedules the shards on
+# consecutive ticks so every shard runs as its own command chain. The pack is
+# built in a temporary directory beside its destination and swapped in once
+# complete, so a failed or cancelled export leaves any previous pack intact.
+
+import json
+import logging
+import os
+import re
+import shutil
+
+# Minecraft's default gamerule value
+MAX_COMMAND_CHAIN_LENGTH = 65536
+# 1.21 data packs use the singular "function" directory
+PACK_FORMAT = 48
+# Commands between progress calls (and so between chances to cancel)
+PROGRESS_EVERY = 4096
+
+
+def function_name(text: str) -> str:
+    """Turn arbitrary text (e.g. a file name) into a valid function/namespace name."""
+    name = re.sub(r"[^a-z0-9_.-]+", "_", text.lower()).strip("_")
+    return name or "build"
+
+
+def export_datapack(
+    out_dir: str,
+    commands,
+    namespace: str = "schematic",
+    name: str = "build",
+    max_chain_length: int = MAX_COMMAND_CHAIN_LENGTH,
+    pack_format: int = PACK_FORMAT,
+    progress=None
+) -> dict:
+    """
+    Stream commands into a datapack and return a summary dict.
+
+    commands may be any iterable of strings, e.g. converter.iter_commands.
+    progress, if given, is called with the running command count every
+    PROGRESS_EVERY commands and may raise to abort.
+    """
+    namespace = function_name(namespace)
+    name = function_name(name)
+    pack_dir = os.path.join(out_dir, f"{namespace}_{name}")
+    # Left over from an export that was killed outright
+    build_dir = pack_dir + ".part"
+    shutil.rmtree(build_dir, ignore_errors=True)
+    try:
+        summary = _write_pack(build_dir, commands, namespace, name, max_chain_length, pack_format, progress)
+        _swap_in(build_dir, pack_dir)
+    except BaseException:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+
+    logging.info(f"Exported {summary['commands']} commands in {summary['shards']} functions to {pack_dir}")
+    return dict(summary, path=pack_dir)
+
+
+def _swap_in(build_dir, pack_dir):
+    """Move a finished pack to pack_dir, replacing the pack already there."""
+    old_dir = None
+    if os.path.exists(pack_dir):
+        old_dir = build_dir + ".old"
+        os.replace(pack_dir, old_dir)
+    try:
+        os.replace(build_dir, pack_dir)
+    except OSError:
+        if old_dir is not None:
+            os.replace(old_dir, pack_dir)
+        raise
+    if old_dir is not None:
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def _write_pack(pack_dir, commands, namespace, name, max_chain_length, pack_format, progress):
+    function_dir = os.path.join(pack_dir, "data", namespace, "function")
+    shard_dir = os.path.join(function_dir, name)
+    os.makedirs(shard_dir, exist_ok=True)
+
+    with open(os.path.join(pack_dir, "pack.mcmeta"), "w") as f:
+        json.dump({"pack": {"pack_format": pack_format,
+                            "description": f"{namespace}:{name} generated from a schematic"}}, f, indent=4)
+
+    # Leave room in every chain for the function call itself
+    per_shard = max(1, max_chain_length - 1)
+    shard_count = 0
+    command_count = 0
+    shard = None
+    try:
+        for command in commands:
+            if progress and command_count % PROGRESS_EVERY == 0 and command_count:
+                progress(command_count)
+            if command_count % per_shard == 0:
+                if shard is not None:
+                    shard.close()
+                shard = open(os.path.join(shard_dir, f"part_{shard_count:04d}.mcfunction"), "w", newline="\n")
+                shard_count += 1
+            shard.write(command)
+            shard.write("\n")
+            command_count += 1
+    finally:
+        if shard is not None:
+            shard.close()
+    if progress:
+        progress(command_count)
+
+    with open(os.path.join(function_dir, f"{name}.mcfunction"), "w", newline="\n") as root:
+        for i in range(shard_count):
+            root.write(f"schedule function {namespace}:{name}/part_{i:04d} {i + 1}t append\n")
+
+    return {
+        "function": f"{namespace}:{name}",
+        "commands": command_count,
+        "shards": shard_count,
+    }
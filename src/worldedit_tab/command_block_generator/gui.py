@@ -1,16 +1,19 @@
 # src/worldedit_tab/command_block_generator/gui.py
 
+import os
 import tkinter as tk
 from tkinter import ttk, filedialog, scrolledtext
-import gzip
-import nbtlib
 
-from .loader import load_schematic
+from ..nbt_writer import save_schematic as write_schematic_file
+from ..schem_cache import load_schematic_cached
 from .converter import (
-    generate_block_list,
+    emit_commands,
+    iter_commands,
     convert_to_command_blocks,
     convert_to_command_block_wall
 )
+from .datapack import export_datapack
+from .jobs import ConversionJobRunner
 
 
 def open_converter_window(parent):
@@ -65,90 +68,181 @@ def open_converter_window(parent):
         state="readonly"
     ).pack(side="left")
 
+    compact_var = tk.BooleanVar(value=False)
+    tk.Checkbutton(wall_frame, text="Compact with /fill", variable=compact_var,
+                   bg='#f0f0f0').pack(side="left", padx=10)
+
     # Output text
     text_list = tk.Text(window, height=25, font=("Consolas", 10))
     text_list.pack(fill="both", expand=True, padx=10, pady=5)
 
+    # Job status
+    status_frame = tk.Frame(window, bg='#f0f0f0')
+    status_frame.pack(fill="x", padx=10)
+
+    status_var = tk.StringVar(value="Idle")
+    tk.Label(status_frame, textvariable=status_var, bg='#f0f0f0', anchor="w").pack(side="left", fill="x", expand=True)
+
     # Buttons
     btn_frame = tk.Frame(window, bg='#f0f0f0')
     btn_frame.pack(fill="x", padx=10, pady=8)
 
-    def generate_list():
+    def on_job_event(kind, job, payload):
+        queued = runner.queued
+        waiting = f"  ({queued - 1} more queued)" if queued > 1 else ""
+        if kind == "queued":
+            text_list.insert("end", f"Queued: {job.name}\n")
+        elif kind == "started":
+            status_var.set(f"Running: {job.name}{waiting}")
+        elif kind == "progress":
+            c = payload
+            status_var.set(
+                f"{job.name}: {c['voxels']:,} voxels scanned, {c['commands']:,} commands, "
+                f"{c['bytes']:,} bytes written{waiting}"
+            )
+        elif kind == "cancelled":
+            text_list.insert("end", f"Cancelled: {job.name}\n")
+        elif kind == "error":
+            text_list.insert("end", f"Failed: {job.name}: {payload}\n")
+        if kind in ("done", "cancelled", "error") and runner.queued == 0:
+            status_var.set("Idle")
+
+    runner = ConversionJobRunner(window, on_job_event)
+
+    def on_close():
+        runner.close()
+        window.destroy()
+
+    window.protocol("WM_DELETE_WINDOW", on_close)
+
+    def read_inputs():
         fp = file_path_var.get()
         if not fp:
             text_list.insert("end", "No file selected.\n")
-            return
-
-        data, debug = load_schematic(fp)
+            return None
+        try:
+            return {
+                "fp": fp,
+                "player_pos": (float(player_x.get()), float(player_y.get()), float(player_z.get())),
+                "wall_width": int(wall_width_var.get()),
+                "facing": facing_var.get(),
+                "compact": compact_var.get(),
+            }
+        except ValueError as e:
+            text_list.insert("end", f"Invalid input: {e}\n")
+            return None
+
+    def load(job, fp):
+        data, debug = load_schematic_cached(fp)
         if not debug["success"]:
-            text_list.insert("end", f"Load failed: {debug['error']}\n")
-            return
+            raise RuntimeError(f"Load failed: {debug['error']}")
+        job.check_cancelled()
+        return data
 
-        px = float(player_x.get())
-        py = float(player_y.get())
-        pz = float(player_z.get())
+    def convert_progress(job):
+        return lambda voxels, commands: job.report(voxels=voxels, commands=commands)
 
-        lines = generate_block_list(data, (px, py, pz))
-
-        text_list.delete("1.0", "end")
-        text_list.insert("end", f"Found {len(lines)} non-air blocks.\n\n")
-        text_list.insert("end", "\n".join(lines[:100]))
+    def generate_list():
+        inputs = read_inputs()
+        if not inputs:
+            return
 
-    def save_schematic(new_root):
-        out_path = filedialog.asksaveasfilename(
+        def run(job):
+            data = load(job, inputs["fp"])
+            _, _, _, lines, stats = emit_commands(
+                data, inputs["player_pos"], inputs["compact"], progress=convert_progress(job)
+            )
+            return lines[:100], stats
+
+        def show(result):
+            lines, stats = result
+            text_list.delete("1.0", "end")
+            text_list.insert("end", f"Found {stats['blocks']} non-air blocks.\n")
+            if inputs["compact"]:
+                text_list.insert("end", f"/fill compaction: {stats['blocks']} -> {stats['commands']} commands.\n")
+            text_list.insert("end", "\n")
+            text_list.insert("end", "\n".join(lines))
+
+        runner.submit(f"Block list: {os.path.basename(inputs['fp'])}", run, show)
+
+    def ask_save_path():
+        return filedialog.asksaveasfilename(
             defaultextension=".schem",
             filetypes=[("Schematic", "*.schem")]
         )
-        if not out_path:
-            return
 
-        new_schem = nbtlib.File(new_root)
-        with open(out_path, 'wb') as raw:
-            with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=9) as gz:
-                new_schem.write(gz)
+    def save_schematic(job, new_root, out_path):
+        write_schematic_file(out_path, new_root, progress=lambda n: job.report(bytes=n))
+        return out_path
 
+    def show_saved(out_path):
         text_list.insert("end", f"\nSaved: {out_path}\n")
 
     def generate_original():
-        fp = file_path_var.get()
-        if not fp:
+        inputs = read_inputs()
+        if not inputs:
             return
-
-        data, debug = load_schematic(fp)
-        if not debug["success"]:
+        # Dialogs must stay on the Tk thread, so ask before queueing
+        out_path = ask_save_path()
+        if not out_path:
             return
 
-        px = float(player_x.get())
-        py = float(player_y.get())
-        pz = float(player_z.get())
+        def run(job):
+            data = load(job, inputs["fp"])
+            new_root = convert_to_command_blocks(
+                data, inputs["player_pos"], inputs["compact"], progress=convert_progress(job)
+            )
+            return save_schematic(job, new_root, out_path)
 
-        new_root = convert_to_command_blocks(data, (px, py, pz))
-        save_schematic(new_root)
+        runner.submit(f"Original shape: {os.path.basename(inputs['fp'])}", run, show_saved)
 
     def generate_wall():
-        fp = file_path_var.get()
-        if not fp:
+        inputs = read_inputs()
+        if not inputs:
+            return
+        out_path = ask_save_path()
+        if not out_path:
             return
 
-        data, debug = load_schematic(fp)
-        if not debug["success"]:
+        def run(job):
+            data = load(job, inputs["fp"])
+            new_root = convert_to_command_block_wall(
+                data,
+                inputs["player_pos"],
+                inputs["wall_width"],
+                inputs["facing"],
+                inputs["compact"],
+                progress=convert_progress(job)
+            )
+            return save_schematic(job, new_root, out_path)
+
+        runner.submit(f"Wall: {os.path.basename(inputs['fp'])}", run, show_saved)
+
+    def generate_datapack():
+        inputs = read_inputs()
+        if not inputs:
             return
 
-        px = float(player_x.get())
-        py = float(player_y.get())
-        pz = float(player_z.get())
+        out_dir = filedialog.askdirectory(title="Datapacks folder")
+        if not out_dir:
+            return
 
-        wall_width = int(wall_width_var.get())
-        facing = facing_var.get()
+        def run(job):
+            data = load(job, inputs["fp"])
+            name = os.path.splitext(os.path.basename(inputs["fp"]))[0]
+            return export_datapack(
+                out_dir,
+                iter_commands(data, inputs["player_pos"], inputs["compact"]),
+                name=name,
+                progress=lambda n: job.report(commands=n)
+            )
 
-        new_root = convert_to_command_block_wall(
-            data,
-            (px, py, pz),
-            wall_width,
-            facing
-        )
+        def show(summary):
+            text_list.insert("end", f"\nDatapack: {summary['path']}\n")
+            text_list.insert("end", f"{summary['commands']} commands in {summary['shards']} functions. "
+                                    f"Run: /function {summary['function']}\n")
 
-        save_schematic(new_root)
+        runner.submit(f"Datapack: {os.path.basename(inputs['fp'])}", run, show)
 
     tk.Button(btn_frame, text="Show Block List",
               command=generate_list,
@@ -162,6 +256,18 @@ def open_converter_window(parent):
               command=generate_wall,
               bg='#673AB7', fg='white', width=28).pack(side="left", padx=6)
 
+    tk.Button(btn_frame, text="Export Datapack",
+              command=generate_datapack,
+              bg='#009688', fg='white', width=18).pack(side="left", padx=6)
+
+    tk.Button(status_frame, text="Cancel All",
+              command=runner.cancel_all,
+              bg='#9E9E9E', fg='white').pack(side="right", padx=3)
+
+    tk.Button(status_frame, text="Cancel",
+              command=runner.cancel_current,
+              bg='#f44336', fg='white').pack(side="right", padx=3)
+
 
 def _browse_file(var: tk.StringVar):
     path = filedialog.askopenfilename(
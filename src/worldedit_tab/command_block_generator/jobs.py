@@ -0,0 +1,147 @@
+# jobs.py - Background conversion jobs for the converter window
+#
+# Jobs run one after another on a single worker thread so load -> convert ->
+# save never blocks the Tk main loop. Workers never touch Tk: progress,
+# completion and errors are pushed onto a queue that the main thread drains
+# every POLL_MS via root.after.
+
+import logging
+import queue
+import threading
+
+POLL_MS = 100
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when its cancel flag is set."""
+
+
+class ConversionJob:
+    def __init__(self, name, func, events, on_done=None):
+        self.name = name
+        self.func = func
+        self.on_done = on_done
+        self.counters = {"voxels": 0, "commands": 0, "bytes": 0}
+        self._events = events
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled(self.name)
+
+    def report(self, **counters):
+        """Update counters (voxels scanned, commands emitted, bytes written) and notify the UI."""
+        self.check_cancelled()
+        self.counters.update(counters)
+        self._events.put(("progress", self, dict(self.counters)))
+
+
+class ConversionJobRunner:
+    """
+    Run conversion jobs sequentially on a worker thread.
+
+    on_event(kind, job, payload) is called on the Tk thread with kind one of
+    "queued", "started", "progress", "done", "cancelled" or "error". A job's
+    own on_done(result) also runs on the Tk thread, before on_event("done").
+    """
+
+    def __init__(self, root, on_event):
+        self.root = root
+        self.on_event = on_event
+        self.current = None
+        self._jobs = queue.Queue()
+        self._events = queue.Queue()
+        self._pending = []
+        self._closed = False
+        threading.Thread(target=self._work, daemon=True).start()
+        self.root.after(POLL_MS, self._poll)
+
+    def submit(self, name, func, on_done=None):
+        """Queue func(job) to run after the jobs already queued. Returns the job."""
+        job = ConversionJob(name, func, self._events, on_done)
+        self._pending.append(job)
+        self._jobs.put(job)
+        self.on_event("queued", job, None)
+        return job
+
+    def cancel_current(self):
+        if self.current is not None:
+            self.current.cancel()
+
+    def cancel_all(self):
+        for job in self._pending:
+            job.cancel()
+        self.cancel_current()
+
+    @property
+    def queued(self):
+        return len(self._pending)
+
+    def close(self):
+        self._closed = True
+        self.cancel_all()
+        self._jobs.put(None)
+
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            if job.cancelled:
+                self._events.put(("cancelled", job, None))
+                continue
+
+            self._events.put(("started", job, None))
+            try:
+                result = job.func(job)
+                self._events.put(("done", job, result))
+            except JobCancelled:
+                self._events.put(("cancelled", job, None))
+            except Exception as e:
+                logging.exception(f"Conversion job failed: {job.name}")
+                self._events.put(("error", job, f"{type(e).__name__}: {str(e)}"))
+
+    def _poll(self):
+        if self._closed:
+            return
+        try:
+            while True:
+                try:
+                    kind, job, payload = self._events.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == "started":
+                    self.current = job
+                elif kind in ("done", "cancelled", "error"):
+                    if job in self._pending:
+                        self._pending.remove(job)
+                    if self.current is job:
+                        self.current = None
+                self._dispatch(kind, job, payload)
+        finally:
+            try:
+                self.root.after(POLL_MS, self._poll)
+            except Exception:
+                # Window already destroyed
+                pass
+
+    def _dispatch(self, kind, job, payload):
+        # A failing callback must not stop the polling, or every later job looks hung
+        try:
+            if kind == "done" and job.on_done is not None:
+                job.on_done(payload)
+            self.on_event(kind, job, payload)
+        except Exception as e:
+            logging.exception(f"Job callback failed: {job.name}")
+            if kind != "error":
+                try:
+                    self.on_event("error", job, f"{type(e).__name__}: {str(e)}")
+                except Exception:
+                    logging.exception(f"Job error callback failed: {job.name}")
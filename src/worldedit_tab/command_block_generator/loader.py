@@ -1,11 +1,43 @@
 # loader.py
-import nbtlib
 import logging
 from nbtlib.tag import Compound
 
-def load_schematic(file_path: str):
+from ..nbt_reader import read_root
+from ..varint import check_block_data
+
+# Small top-level fields that describe a Sponge schematic
+HEADER_KEYS = (
+    "Version", "DataVersion", "Width", "Height", "Length",
+    "PaletteMax", "Palette", "Offset", "Metadata"
+)
+
+
+def _header_preview(schem, limit=1400):
+    """Build the debug preview from header fields instead of stringifying the whole tree."""
+    lines = [f"{key}: {schem[key]}" for key in HEADER_KEYS if key in schem and key != "Palette"]
+    palette = schem.get("Palette")
+    if palette is not None:
+        lines.append(f"Palette ({len(palette)} entries):")
+        lines.extend(f"  {int(idx)}: {state}" for state, idx in list(palette.items())[:40])
+    for key in ("BlockData", "BlockEntities", "Entities"):
+        if key in schem:
+            lines.append(f"{key}: {len(schem[key])} entries")
+
+    preview = "\n".join(lines)
+    return (preview[:limit] + "...") if len(preview) > limit else preview
+
+
+def load_schematic(
+    file_path: str,
+    include_block_data: bool = True,
+    include_block_entities: bool = False,
+    include_entities: bool = False
+):
     """
     Load .schem file and return both the raw loaded object and a debug dictionary.
+
+    Only the header fields are always read. BlockData, BlockEntities and Entities
+    are skipped in the byte stream unless requested.
     """
     debug = {
         "file_path": file_path,
@@ -17,11 +49,21 @@ def load_schematic(file_path: str):
         "palette_max": None,
         "offset": None,
         "sample_keys": [],
+        "block_data_ok": None,
+        "block_data_error": None,
         "str_preview": ""
     }
 
+    include = set(HEADER_KEYS)
+    if include_block_data:
+        include.add("BlockData")
+    if include_block_entities:
+        include.add("BlockEntities")
+    if include_entities:
+        include.add("Entities")
+
     try:
-        schem = nbtlib.load(file_path)
+        schem = read_root(file_path, include=include)
         debug["success"] = True
         debug["loaded_type"] = type(schem).__name__
 
@@ -33,15 +75,29 @@ def load_schematic(file_path: str):
 
         debug["sample_keys"] = list(schem.keys())[:12]
 
+        # BlockData is varint encoded; make sure it holds exactly W*H*L entries.
+        # Counted, not decoded: the caller decodes it anyway
+        if 'BlockData' in schem:
+            try:
+                check_block_data(schem)
+                debug["block_data_ok"] = True
+            except Exception as e:
+                debug["block_data_ok"] = False
+                debug["block_data_error"] = f"{type(e).__name__}: {str(e)}"
+
         try:
-            str_schem = str(schem)
-            debug["str_preview"] = (str_schem[:1400] + "...") if len(str_schem) > 1400 else str_schem
+            debug["str_preview"] = _header_preview(schem)
         except:
-            debug["str_preview"] = "[could not convert to str]"
+            debug["str_preview"] = "[could not build preview]"
 
         return schem, debug
 
     except Exception as e:
         debug["error"] = f"{type(e).__name__}: {str(e)}"
         logging.error(f"Failed to load schematic {file_path}: {debug['error']}")
-        return None, debug
\ No newline at end of file
+        return None, debug
+
+
+def load_schematic_header(file_path: str):
+    """Read only Width/Height/Length/Palette/Offset/DataVersion and friends."""
+    return load_schematic(file_path, include_block_data=False)
@@ -0,0 +1,113 @@
+# nbt_reader.py - Selective NBT reading
+#
+# nbtlib only knows how to parse a whole file into tag objects. Schematics keep
+# the interesting header fields next to BlockData / BlockEntities / Entities,
+# which can be orders of magnitude bigger, so this reader walks the root
+# compound and only hands the requested top-level tags to nbtlib. Everything
+# else is skipped in the byte stream without being materialized.
+
+import gzip
+import io
+import struct
+
+import nbtlib
+from nbtlib.tag import Base
+
+# Payload sizes of the fixed-width tag types (Byte, Short, Int, Long, Float, Double)
+_FIXED_SIZES = {1: 1, 2: 2, 3: 4, 4: 8, 5: 4, 6: 8}
+# Element sizes of the array tag types (ByteArray, IntArray, LongArray)
+_ARRAY_ITEM_SIZES = {7: 1, 11: 4, 12: 8}
+
+TAG_END = 0
+TAG_STRING = 8
+TAG_LIST = 9
+TAG_COMPOUND = 10
+
+
+def _read(fileobj, size):
+    data = fileobj.read(size)
+    if len(data) != size:
+        raise EOFError("Unexpected end of NBT data")
+    return data
+
+
+def _read_tag_id(fileobj):
+    return _read(fileobj, 1)[0]
+
+
+def _read_int(fileobj):
+    return struct.unpack(">i", _read(fileobj, 4))[0]
+
+
+def _read_name(fileobj):
+    size = struct.unpack(">H", _read(fileobj, 2))[0]
+    return _read(fileobj, size).decode("utf-8")
+
+
+def _skip(fileobj, size):
+    if size > 0:
+        # Forward seeks on a GzipFile decompress into a small scratch buffer
+        fileobj.seek(size, io.SEEK_CUR)
+
+
+def skip_payload(fileobj, tag_id):
+    """Advance fileobj past the payload of a tag without building it."""
+    if tag_id in _FIXED_SIZES:
+        _skip(fileobj, _FIXED_SIZES[tag_id])
+    elif tag_id in _ARRAY_ITEM_SIZES:
+        _skip(fileobj, _read_int(fileobj) * _ARRAY_ITEM_SIZES[tag_id])
+    elif tag_id == TAG_STRING:
+        _skip(fileobj, struct.unpack(">H", _read(fileobj, 2))[0])
+    elif tag_id == TAG_LIST:
+        item_id = _read_tag_id(fileobj)
+        count = _read_int(fileobj)
+        if item_id in _FIXED_SIZES:
+            _skip(fileobj, count * _FIXED_SIZES[item_id])
+        else:
+            for _ in range(count):
+                skip_payload(fileobj, item_id)
+    elif tag_id == TAG_COMPOUND:
+        child_id = _read_tag_id(fileobj)
+        while child_id != TAG_END:
+            _skip(fileobj, struct.unpack(">H", _read(fileobj, 2))[0])
+            skip_payload(fileobj, child_id)
+            child_id = _read_tag_id(fileobj)
+    else:
+        raise ValueError(f"Unknown NBT tag id {tag_id}")
+
+
+def open_nbt(file_path):
+    """Open an NBT file for streaming, transparently handling gzip. Returns (fileobj, gzipped)."""
+    raw = open(file_path, "rb")
+    if raw.peek(2)[:2] != b"\x1f\x8b":
+        return raw, False
+    # A GzipFile wrapping raw would leave raw open when it is closed
+    raw.close()
+    return gzip.open(file_path, "rb"), True
+
+
+def read_root(file_path, include=None, exclude=()):
+    """
+    Read the root compound of an NBT file, keeping only selected top-level tags.
+
+    include is a collection of tag names to keep (None keeps everything not in
+    exclude). Skipped tags are never turned into nbtlib objects. Returns an
+    nbtlib.File so callers can use it like the result of nbtlib.load.
+    """
+    fileobj, gzipped = open_nbt(file_path)
+    with fileobj:
+        if _read_tag_id(fileobj) != TAG_COMPOUND:
+            raise TypeError("Non-Compound root tags are not supported")
+        root_name = _read_name(fileobj)
+
+        root = nbtlib.File(gzipped=gzipped, filename=file_path, root_name=root_name)
+        tag_id = _read_tag_id(fileobj)
+        while tag_id != TAG_END:
+            name = _read_name(fileobj)
+            if name in exclude or (include is not None and name not in include):
+                skip_payload(fileobj, tag_id)
+            else:
+                root[name] = Base.get_tag(tag_id).parse(fileobj)
+            tag_id = _read_tag_id(fileobj)
+
+    return root
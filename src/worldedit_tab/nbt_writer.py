@@ -0,0 +1,231 @@
+# nbt_writer.py - Streaming Sponge v2 schematic writer
+#
+# Builds the binary NBT for a command block schematic straight from plain
+# Python values instead of an nbtlib tag tree. BlockEntities come from an
+# iterable of (x, y, z, command) tuples; everything that is the same for every
+# command block is pre-encoded once into byte templates. The output is byte
+# for byte what nbtlib.File(to_compound(schematic)).write() produces.
+#
+# A schematic is described by a dict:
+#   Version, DataVersion, Width, Height, Length   ints
+#   PaletteMax                                    int (defaults to len(Palette))
+#   Palette                                       {state: id}
+#   BlockData                                     varint encoded bytes
+#   BlockEntities                                 iterable of (x, y, z, command)
+#   BlockEntityCount                              needed when BlockEntities is a generator
+#   CustomName                                    optional name given to every command block
+#   Offset                                        (x, y, z)
+#   Metadata                                      {name: int}
+
+import gzip
+import os
+import struct
+
+import numpy as np
+from nbtlib.tag import Compound, List, Byte, Int, Long, Short, ByteArray, String, IntArray
+
+TAG_END = 0
+TAG_BYTE = 1
+TAG_SHORT = 2
+TAG_INT = 3
+TAG_LONG = 4
+TAG_BYTE_ARRAY = 7
+TAG_STRING = 8
+TAG_LIST = 9
+TAG_COMPOUND = 10
+TAG_INT_ARRAY = 11
+
+COMMAND_BLOCK_ID = "minecraft:command_block"
+
+# Entities are written in batches so the gzip stream sees few, large writes
+WRITE_BATCH = 4096
+
+
+def _string(value):
+    encoded = value.encode("utf-8")
+    return struct.pack(">H", len(encoded)) + encoded
+
+
+def _named(tag_id, name):
+    return bytes([tag_id]) + _string(name)
+
+
+def _byte(name, value):
+    return _named(TAG_BYTE, name) + struct.pack(">b", value)
+
+
+def _short(name, value):
+    return _named(TAG_SHORT, name) + struct.pack(">h", value)
+
+
+def _int(name, value):
+    return _named(TAG_INT, name) + struct.pack(">i", value)
+
+
+def _long(name, value):
+    return _named(TAG_LONG, name) + struct.pack(">q", value)
+
+
+def _str(name, value):
+    return _named(TAG_STRING, name) + _string(value)
+
+
+def _int_array(name, values):
+    return _named(TAG_INT_ARRAY, name) + struct.pack(f">i{len(values)}i", len(values), *values)
+
+
+# Constant parts of every command block entity
+_BE_PREFIX = _str("id", COMMAND_BLOCK_ID) + _named(TAG_INT_ARRAY, "Pos") + struct.pack(">i", 3)
+_BE_POS = struct.Struct(">iii")
+_BE_COMMAND = _named(TAG_STRING, "Command")
+_BE_SUFFIX = (
+    _byte("auto", 0)
+    + _byte("conditionMet", 0)
+    + _byte("powered", 0)
+    + _byte("TrackOutput", 1)
+    + _int("SuccessCount", 0)
+    + _byte("UpdateLastExecution", 1)
+    + _long("LastExecution", 0)
+    + _str("LastOutput", "")
+    + bytes([TAG_END])
+)
+
+
+def _block_entity_count(schematic):
+    entities = schematic.get("BlockEntities", ())
+    count = schematic.get("BlockEntityCount")
+    if count is None:
+        if not hasattr(entities, "__len__"):
+            entities = list(entities)
+        count = len(entities)
+    return entities, count
+
+
+def write_schematic(fileobj, schematic, progress=None):
+    """
+    Write a schematic dict as uncompressed NBT to a binary file object.
+
+    progress, if given, is called with the number of bytes written so far
+    after every batch and may raise to abort.
+    """
+    palette = schematic["Palette"]
+    block_data = bytes(schematic["BlockData"])
+    entities, count = _block_entity_count(schematic)
+
+    custom_name = schematic.get("CustomName")
+    be_middle = _str("CustomName", custom_name) + _BE_SUFFIX if custom_name is not None else _BE_SUFFIX
+
+    header = bytearray(_named(TAG_COMPOUND, ""))
+    header += _int("Version", schematic["Version"])
+    header += _int("DataVersion", schematic["DataVersion"])
+    header += _short("Width", schematic["Width"])
+    header += _short("Height", schematic["Height"])
+    header += _short("Length", schematic["Length"])
+    header += _int("PaletteMax", schematic.get("PaletteMax", len(palette)))
+    header += _named(TAG_COMPOUND, "Palette")
+    for state, idx in palette.items():
+        header += _int(state, idx)
+    header += bytes([TAG_END])
+    header += _named(TAG_BYTE_ARRAY, "BlockData") + struct.pack(">i", len(block_data))
+    fileobj.write(header)
+    fileobj.write(block_data)
+    bytes_written = len(header) + len(block_data)
+
+    list_header = _named(TAG_LIST, "BlockEntities") + struct.pack(">bi", TAG_COMPOUND, count)
+    fileobj.write(list_header)
+    bytes_written += len(list_header)
+    if progress:
+        progress(bytes_written)
+
+    written = 0
+    batch = bytearray()
+    pos_pack = _BE_POS.pack
+    for x, y, z, command in entities:
+        batch += _BE_PREFIX
+        batch += pos_pack(x, y, z)
+        batch += _BE_COMMAND
+        batch += _string(command)
+        batch += be_middle
+        written += 1
+        if written % WRITE_BATCH == 0:
+            fileobj.write(batch)
+            bytes_written += len(batch)
+            batch = bytearray()
+            if progress:
+                progress(bytes_written)
+    fileobj.write(batch)
+    bytes_written += len(batch)
+    if written != count:
+        raise ValueError(f"BlockEntityCount is {count} but {written} block entities were written")
+
+    footer = bytearray(_int_array("Offset", list(schematic.get("Offset", (0, 0, 0)))))
+    footer += _named(TAG_COMPOUND, "Metadata")
+    for name, value in schematic.get("Metadata", {}).items():
+        footer += _int(name, value)
+    footer += bytes([TAG_END])
+    footer += bytes([TAG_END])
+    fileobj.write(footer)
+    if progress:
+        progress(bytes_written + len(footer))
+
+
+def save_schematic(file_path, schematic, compresslevel=9, progress=None):
+    """
+    Stream a schematic dict into a gzipped .schem file.
+
+    The file is written next to file_path and only moved over it once
+    complete, so an error or a progress callback that aborts never leaves a
+    truncated file (or destroys the one that was there).
+    """
+    part_path = file_path + ".part"
+    try:
+        with open(part_path, 'wb') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=compresslevel) as gz:
+                write_schematic(gz, schematic, progress)
+        os.replace(part_path, file_path)
+    except BaseException:
+        try:
+            os.remove(part_path)
+        except OSError:
+            pass
+        raise
+
+
+def to_compound(schematic):
+    """Build the equivalent nbtlib Compound, for callers that still want a tag tree."""
+    custom_name = schematic.get("CustomName")
+    block_entities = List[Compound]()
+    entities, _ = _block_entity_count(schematic)
+    for x, y, z, command in entities:
+        be = Compound({
+            "id": String(COMMAND_BLOCK_ID),
+            "Pos": IntArray([x, y, z]),
+            "Command": String(command),
+        })
+        if custom_name is not None:
+            be["CustomName"] = String(custom_name)
+        be.update({
+            "auto": Byte(0),
+            "conditionMet": Byte(0),
+            "powered": Byte(0),
+            "TrackOutput": Byte(1),
+            "SuccessCount": Int(0),
+            "UpdateLastExecution": Byte(1),
+            "LastExecution": Long(0),
+            "LastOutput": String("")
+        })
+        block_entities.append(be)
+
+    return Compound({
+        "Version": Int(schematic["Version"]),
+        "DataVersion": Int(schematic["DataVersion"]),
+        "Width": Short(schematic["Width"]),
+        "Height": Short(schematic["Height"]),
+        "Length": Short(schematic["Length"]),
+        "PaletteMax": Int(schematic.get("PaletteMax", len(schematic["Palette"]))),
+        "Palette": Compound({state: Int(idx) for state, idx in schematic["Palette"].items()}),
+        "BlockData": ByteArray(np.frombuffer(bytes(schematic["BlockData"]), dtype=np.int8)),
+        "BlockEntities": block_entities,
+        "Offset": IntArray(list(schematic.get("Offset", (0, 0, 0)))),
+        "Metadata": Compound({name: Int(value) for name, value in schematic.get("Metadata", {}).items()}),
+    })
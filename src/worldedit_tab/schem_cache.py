@@ -0,0 +1,138 @@
+# schem_cache.py - On-disk cache of decoded schematics
+#
+# Every entry is keyed by the SHA-256 of the .schem file and consists of
+#   <hash>.npy   decoded BlockData as a (height, length, width) index grid
+#   <hash>.json  header fields, palette and LRU bookkeeping
+# Repeat opens memory-map the .npy instead of gunzipping and decoding again.
+# index.json remembers path -> (mtime, size, hash) so unchanged files are not
+# re-hashed; a changed mtime or size triggers a re-hash and, if the content
+# changed, a fresh entry. Old entries age out through LRU eviction.
+
+import hashlib
+import logging
+import os
+import time
+
+import numpy as np
+
+from . import cache_utils
+from .cache_utils import atomic_write, entry_paths, read_json, write_json
+from .command_block_generator.loader import load_schematic
+from .varint import decode_block_data
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), "..", "cache", "schematics")
+MAX_CACHE_BYTES = 2 * 1024 ** 3
+INDEX_FILE = "index.json"
+
+HEADER_FIELDS = ("Version", "DataVersion", "Width", "Height", "Length", "PaletteMax")
+
+
+def file_hash(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _content_key(file_path, cache_dir):
+    """Return the content hash of file_path, re-hashing only when mtime or size changed."""
+    index_path = os.path.join(cache_dir, INDEX_FILE)
+    index = read_json(index_path, {})
+    abs_path = os.path.abspath(file_path)
+    stat = os.stat(file_path)
+
+    known = index.get(abs_path)
+    if known and known["mtime"] == stat.st_mtime and known["size"] == stat.st_size:
+        return known["hash"]
+
+    key = file_hash(file_path)
+    index[abs_path] = {"mtime": stat.st_mtime, "size": stat.st_size, "hash": key}
+    try:
+        write_json(index_path, index)
+    except OSError as e:
+        # Only costs a re-hash next time
+        logging.warning(f"Could not update the schematic cache index: {e}")
+    return key
+
+
+def _as_data(sidecar, block_indices):
+    """Shape a cache entry like a loaded schematic root so converters and the parser accept it."""
+    data = dict(sidecar["header"])
+    data["Offset"] = sidecar["offset"]
+    data["Palette"] = sidecar["palette"]
+    data["BlockIndices"] = block_indices
+    return data
+
+
+def _store(cache_dir, key, schem):
+    npy_path, json_path = entry_paths(cache_dir, key)
+    block_indices = decode_block_data(schem)
+
+    with atomic_write(npy_path, "wb") as f:
+        np.save(f, block_indices)
+
+    sidecar = {
+        "header": {name: int(schem[name]) for name in HEADER_FIELDS if name in schem},
+        "offset": [int(v) for v in schem.get("Offset", [0, 0, 0])],
+        "palette": {str(state): int(idx) for state, idx in schem["Palette"].items()},
+        "nbytes": os.path.getsize(npy_path),
+        "last_used": time.time(),
+    }
+    write_json(json_path, sidecar)
+    return sidecar
+
+
+def evict(cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, keep=()):
+    """Delete least recently used entries (except those in keep) until the cache fits in max_bytes."""
+    cache_utils.evict(cache_dir, max_bytes, keep, ignore=(INDEX_FILE,))
+
+
+def load_schematic_cached(file_path, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """
+    Load a schematic through the decoded cache.
+
+    Returns (data, debug) like load_schematic. data is a dict with the header
+    fields, Offset, Palette (state -> id) and BlockIndices, a read-only
+    memory-mapped (height, length, width) index grid.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    try:
+        key = _content_key(file_path, cache_dir)
+    except OSError as e:
+        debug = {"file_path": file_path, "success": False, "cache_hit": False,
+                 "error": f"{type(e).__name__}: {str(e)}"}
+        logging.error(f"Failed to load schematic {file_path}: {debug['error']}")
+        return None, debug
+
+    npy_path, json_path = entry_paths(cache_dir, key)
+    sidecar = read_json(json_path, None)
+    if sidecar is not None and os.path.exists(npy_path):
+        try:
+            block_indices = np.load(npy_path, mmap_mode="r")
+            debug = {"file_path": file_path, "success": True, "cache_hit": True, "error": None}
+        except (OSError, ValueError) as e:
+            logging.warning(f"Discarding unreadable cache entry {key}: {e}")
+        else:
+            sidecar["last_used"] = time.time()
+            try:
+                write_json(json_path, sidecar)
+            except OSError as e:
+                logging.warning(f"Could not update cache entry {key}: {e}")
+            return _as_data(sidecar, block_indices), debug
+
+    schem, debug = load_schematic(file_path)
+    debug["cache_hit"] = False
+    if not debug["success"]:
+        return None, debug
+
+    try:
+        sidecar = _store(cache_dir, key, schem)
+    except Exception as e:
+        debug["success"] = False
+        debug["error"] = f"{type(e).__name__}: {str(e)}"
+        logging.error(f"Failed to decode schematic {file_path}: {debug['error']}")
+        return None, debug
+
+    evict(cache_dir, max_bytes, keep=(key,))
+    return _as_data(sidecar, np.load(npy_path, mmap_mode="r")), debug
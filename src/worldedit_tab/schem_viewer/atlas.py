@@ -0,0 +1,132 @@
+# atlas.py - Pack block textures into one power-of-two atlas
+#
+# Every PNG of the texture directory becomes a square tile (the first frame of
+# animated strips), scaled to a common tile size and surrounded by PADDING
+# pixels copied from its own edge so linear filtering never samples a
+# neighbouring tile. One atlas serves every schematic: blocks look up the tile
+# of their texture file, or the grey MISSING_TILE. The packed RGBA image and
+# its tile -> UV rect table are cached on disk, keyed by the directory's file
+# names, sizes and mtimes, so later launches skip decoding. Editing the
+# directory makes a new entry; the least recently used ones are evicted once
+# the cache outgrows MAX_ATLAS_CACHE_BYTES.
+
+import hashlib
+import logging
+import math
+import os
+import time
+
+import numpy as np
+
+from ..cache_utils import atomic_write, entry_paths, evict, read_json, write_json
+
+ATLAS_CACHE_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "cache", "atlas")
+MAX_ATLAS_CACHE_BYTES = 256 * 1024 ** 2
+PADDING = 2
+# Flat grey for blocks without a texture, like the untextured fallback
+MISSING_COLOR = (128, 128, 128, 255)
+# Tile name of that grey; "#" never appears in a texture file name
+MISSING_TILE = "#missing"
+
+
+def _next_pow2(n):
+    return 1 << max(0, math.ceil(math.log2(max(1, n))))
+
+
+def atlas_layout(count, tile, padding=PADDING):
+    """Return (size, columns) of the smallest square power-of-two atlas holding count tiles."""
+    cell = tile + 2 * padding
+    size = _next_pow2(cell * math.ceil(math.sqrt(max(1, count))))
+    while (size // cell) ** 2 < count:
+        size *= 2
+    return size, size // cell
+
+
+def pack_atlas(tiles, padding=PADDING):
+    """
+    Pack {name: (tile, tile, 4) uint8 array} into one square RGBA image.
+
+    Rows of the returned image run top to bottom like the source PNGs. Returns
+    (image, rects) where rects maps every name to (u0, v0, u1, v1) texture
+    coordinates of its tile, v measured from the bottom as OpenGL does once
+    the image is uploaded bottom row first.
+    """
+    names = sorted(tiles)
+    tile = next(iter(tiles.values())).shape[0] if tiles else 1
+    size, columns = atlas_layout(len(names), tile, padding)
+    cell = tile + 2 * padding
+
+    image = np.zeros((size, size, 4), dtype=np.uint8)
+    rects = {}
+    for i, name in enumerate(names):
+        row, col = divmod(i, columns)
+        top, left = row * cell, col * cell
+        image[top:top + cell, left:left + cell] = np.pad(
+            tiles[name], ((padding, padding), (padding, padding), (0, 0)), mode="edge"
+        )
+        x0, y0 = left + padding, top + padding
+        rects[name] = (x0 / size, (size - y0 - tile) / size, (x0 + tile) / size, (size - y0) / size)
+    return image, rects
+
+
+def tile_name(block_name):
+    """Atlas tile (texture file stem) of a block: minecraft:stone -> stone."""
+    return block_name.split(":")[-1]
+
+
+def texture_file(texture_path, block_name):
+    return os.path.join(texture_path, tile_name(block_name) + ".png")
+
+
+def texture_files(texture_path):
+    """Sorted PNG file names of the texture directory; empty when it does not exist."""
+    try:
+        return sorted(name for name in os.listdir(texture_path) if name.endswith(".png"))
+    except OSError:
+        return []
+
+
+def atlas_key(texture_path):
+    """Cache key of the texture directory's atlas, changing whenever a PNG is added, removed or edited."""
+    digest = hashlib.sha256()
+    digest.update(f"{os.path.abspath(texture_path)}|{PADDING}".encode("utf-8"))
+    for name in texture_files(texture_path):
+        try:
+            stat = os.stat(os.path.join(texture_path, name))
+            digest.update(f"{name}|{stat.st_size}|{stat.st_mtime_ns}".encode("utf-8"))
+        except OSError:
+            digest.update(f"{name}|missing".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def block_rects(tile_rects, block_names):
+    """UV rect of every block's tile, the MISSING_TILE one for blocks without a texture."""
+    return {name: tile_rects.get(tile_name(name), tile_rects[MISSING_TILE]) for name in block_names}
+
+
+def load_cached_atlas(key, cache_dir=ATLAS_CACHE_DIR):
+    """Return (image, tile rects) of an atlas_key from the disk cache, or None when it is missing."""
+    image_path, table_path = entry_paths(cache_dir, key)
+    table = read_json(table_path, None)
+    if table is None or not os.path.exists(image_path):
+        return None
+    try:
+        image = np.load(image_path)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Atlas cache unreadable, rebuilding: {e}")
+        return None
+    table["last_used"] = time.time()
+    try:
+        write_json(table_path, table)
+    except OSError as e:
+        logging.warning(f"Could not update atlas cache entry {key}: {e}")
+    return image, {name: tuple(rect) for name, rect in table["rects"].items()}
+
+
+def save_cached_atlas(key, image, rects, cache_dir=ATLAS_CACHE_DIR, max_bytes=MAX_ATLAS_CACHE_BYTES):
+    os.makedirs(cache_dir, exist_ok=True)
+    image_path, table_path = entry_paths(cache_dir, key)
+    with atomic_write(image_path, "wb") as f:
+        np.save(f, image)
+    write_json(table_path, {"rects": rects, "nbytes": os.path.getsize(image_path), "last_used": time.time()})
+    evict(cache_dir, max_bytes, keep=(key,))
@@ -0,0 +1,78 @@
+# buffers.py - Retained vertex buffers for the viewers
+#
+# Geometry is uploaded once into an interleaved vertex buffer object and drawn
+# with glDrawArrays through the fixed-function client array pointers. Only
+# OpenGL 1.5 buffer objects are used (no VAOs or shaders), so this runs on any
+# compatibility context, including Mesa's llvmpipe software renderer.
+
+import ctypes
+
+import numpy as np
+from OpenGL.GL import *
+
+FLOAT_BYTES = 4
+
+
+class VertexBuffer:
+    """
+    One interleaved VBO of positions, normals and optional UVs / RGBA colours.
+
+    The arrays are copied to the GPU in __init__; call delete() when the
+    geometry changes or the viewer closes.
+    """
+
+    def __init__(self, vertices, normals, uvs=None, colors=None):
+        parts = [np.asarray(vertices, dtype=np.float32), np.asarray(normals, dtype=np.float32)]
+        if uvs is not None:
+            parts.append(np.asarray(uvs, dtype=np.float32))
+        if colors is not None:
+            parts.append(np.asarray(colors, dtype=np.float32))
+        data = np.ascontiguousarray(np.hstack(parts))
+
+        self.count = len(data)
+        self.has_uvs = uvs is not None
+        self.has_colors = colors is not None
+        self.stride = data.shape[1] * FLOAT_BYTES if self.count else 0
+
+        self.vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def bind(self):
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_NORMAL_ARRAY)
+        glVertexPointer(3, GL_FLOAT, self.stride, ctypes.c_void_p(0))
+        glNormalPointer(GL_FLOAT, self.stride, ctypes.c_void_p(3 * FLOAT_BYTES))
+        offset = 6
+        if self.has_uvs:
+            glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+            glTexCoordPointer(2, GL_FLOAT, self.stride, ctypes.c_void_p(offset * FLOAT_BYTES))
+            offset += 2
+        if self.has_colors:
+            glEnableClientState(GL_COLOR_ARRAY)
+            glColorPointer(4, GL_FLOAT, self.stride, ctypes.c_void_p(offset * FLOAT_BYTES))
+
+    def unbind(self):
+        if self.has_colors:
+            glDisableClientState(GL_COLOR_ARRAY)
+        if self.has_uvs:
+            glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+        glDisableClientState(GL_NORMAL_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def draw(self, first=0, count=None, mode=GL_QUADS):
+        """Draw a vertex range; the buffer must be bound."""
+        glDrawArrays(mode, first, self.count - first if count is None else count)
+
+    def delete(self):
+        if self.vbo is not None:
+            glDeleteBuffers(1, [self.vbo])
+            self.vbo = None
+
+
+def mesh_buffer(mesh):
+    """Upload a mesher mesh dict (vertices, normals, uvs)."""
+    return VertexBuffer(mesh["vertices"], mesh["normals"], uvs=mesh["uvs"])
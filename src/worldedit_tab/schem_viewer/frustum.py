@@ -0,0 +1,59 @@
+# frustum.py - View frustum tests for section culling
+#
+# Planes are built from the same camera the viewer hands to gluLookAt and
+# gluPerspective, and boxes are tested all at once: for every plane only the
+# box corner furthest along the plane normal needs checking.
+
+import numpy as np
+
+
+def look_at_basis(eye, target, up=(0.0, 1.0, 0.0)):
+    """Return the (forward, right, up) unit vectors gluLookAt builds."""
+    eye = np.asarray(eye, dtype=np.float64)
+    forward = np.asarray(target, dtype=np.float64) - eye
+    forward /= np.linalg.norm(forward)
+    right = np.cross(forward, np.asarray(up, dtype=np.float64))
+    right /= np.linalg.norm(right)
+    return forward, right, np.cross(right, forward)
+
+
+def frustum_planes(eye, target, fov_y, aspect, near, far, up=(0.0, 1.0, 0.0)):
+    """
+    Six planes (left, right, bottom, top, near, far) as a (6, 4) array.
+
+    Each row is (nx, ny, nz, d) with the normal pointing into the frustum, so a
+    point p is inside when n . p + d >= 0 for every plane.
+    """
+    eye = np.asarray(eye, dtype=np.float64)
+    forward, right, cam_up = look_at_basis(eye, target, up)
+    half_v = np.tan(np.radians(fov_y) / 2.0)
+    half_h = half_v * aspect
+
+    normals = np.array([
+        np.cross(forward - right * half_h, cam_up),     # left
+        np.cross(cam_up, forward + right * half_h),     # right
+        np.cross(right, forward - cam_up * half_v),     # bottom
+        np.cross(forward + cam_up * half_v, right),     # top
+        forward,                                        # near
+        -forward,                                       # far
+    ])
+    normals /= np.linalg.norm(normals, axis=1)[:, None]
+
+    d = -normals @ eye
+    d[4] -= near
+    d[5] += far
+    return np.column_stack([normals, d])
+
+
+def boxes_in_frustum(planes, mins, maxs):
+    """Boolean mask of the axis-aligned boxes (N, 3 min / max corners) that touch the frustum."""
+    mins = np.asarray(mins, dtype=np.float64).reshape(-1, 3)
+    maxs = np.asarray(maxs, dtype=np.float64).reshape(-1, 3)
+    visible = np.ones(len(mins), dtype=bool)
+    for nx, ny, nz, d in planes:
+        normal = np.array([nx, ny, nz])
+        # Corner furthest along the normal; if even that is outside, the box is
+        # entirely outside that plane
+        furthest = np.where(normal >= 0, maxs, mins)
+        visible &= furthest @ normal + d >= 0
+    return visible
@@ -0,0 +1,189 @@
+# lod.py - Octree level of detail over the voxel grid
+#
+# Level 0 is the schematic itself; every further level halves each axis by
+# giving each 2x2x2 cell its majority solid block. A level k voxel therefore
+# covers a (2^k)^3 cell of level 0, and a level k section (16^3 of its own
+# voxels) is an octree node whose eight children are the level k-1 sections
+# inside it. Each frame, nodes are refined coarsest first, largest on-screen
+# voxel first, until voxels are about a pixel wide or the next refinement
+# would exceed the triangle budget.
+
+import heapq
+import logging
+
+import numpy as np
+
+from .frustum import boxes_in_frustum
+from .mesher import SECTION_SIZE, build_section_meshes, iter_section_meshes, solid_mask
+
+# 2^3, 4^3 and 8^3 cells
+LOD_LEVELS = 3
+TRIANGLE_BUDGET = 1_000_000
+# Refine while a node's voxels are wider than this many pixels
+PIXEL_ERROR = 1.0
+
+
+def _majority(rows, air_id):
+    """Most common non-air value of every row, or air_id for all-air rows."""
+    rows = np.sort(rows, axis=1)
+    count, width = rows.shape
+    flat = rows.ravel()
+    starts = np.ones(flat.shape, dtype=bool)
+    starts[1:] = flat[1:] != flat[:-1]
+    starts[::width] = True
+
+    run_start = np.flatnonzero(starts)
+    run_length = np.diff(np.append(run_start, len(flat)))
+    run_row = run_start // width
+    run_value = flat[run_start]
+    run_length[run_value == air_id] = 0
+
+    # Longest run first within every row
+    order = np.lexsort((-run_length, run_row))
+    first = order[np.append(True, run_row[order][1:] != run_row[order][:-1])]
+    result = np.full(count, air_id, dtype=rows.dtype)
+    result[run_row[first]] = np.where(run_length[first] > 0, run_value[first], air_id)
+    return result
+
+
+def downsample(block_indices, palette_names):
+    """
+    Halve every axis of a (height, length, width) palette id grid.
+
+    A 2x2x2 cell stays solid when at least 4 of its 8 voxels are, so a
+    one-voxel wall through the cell survives, and takes its most common solid
+    block. Air cells get the id len(palette_names), which the mesher treats as air.
+    """
+    air_id = len(palette_names)
+    solid = solid_mask(block_indices, palette_names)
+    ids = np.where(solid, block_indices, air_id).astype(np.uint16)
+
+    pad = [(0, -n % 2) for n in ids.shape]
+    ids = np.pad(ids, pad, constant_values=air_id)
+    h, l, w = (n // 2 for n in ids.shape)
+    cells = ids.reshape(h, 2, l, 2, w, 2).transpose(0, 2, 4, 1, 3, 5).reshape(-1, 8)
+
+    coarse = _majority(cells, air_id)
+    coarse[(cells != air_id).sum(axis=1) < 4] = air_id
+    return coarse.reshape(h, l, w)
+
+
+def iter_lod_meshes(block_indices, palette_names, origin=(0, 0, 0), levels=LOD_LEVELS, greedy=False, uv_rects=None):
+    """
+    Yield (level, {(level, sy, sz, sx): mesh}) batches: level 0 one row of
+    sections at a time, then one batch per coarser level.
+
+    Coarse vertices are scaled back into level 0 world coordinates, so a
+    level k block is a 2^k wide cube.
+    """
+    origin = np.array(origin, dtype=np.float32)
+    for meshes in iter_section_meshes(block_indices, palette_names, origin, greedy, uv_rects):
+        yield 0, {(0,) + key: mesh for key, mesh in meshes.items()}
+
+    grid = block_indices
+    for level in range(1, levels + 1):
+        if min(grid.shape) <= 1:
+            break
+        grid = downsample(grid, palette_names)
+        scale = 2 ** level
+        meshes = build_section_meshes(grid, palette_names, (0, 0, 0), greedy, uv_rects)
+        for mesh in meshes.values():
+            # A level voxel i spans level 0 voxels i*scale .. i*scale + scale - 1
+            mesh["vertices"] = mesh["vertices"] * scale + (scale - 1) / 2.0 + origin
+        yield level, {(level,) + key: mesh for key, mesh in meshes.items()}
+
+
+def build_lod_meshes(block_indices, palette_names, origin=(0, 0, 0), levels=LOD_LEVELS, greedy=False, uv_rects=None):
+    """Section meshes for every level, keyed (level, sy, sz, sx). See iter_lod_meshes."""
+    meshes = {}
+    for _, batch in iter_lod_meshes(block_indices, palette_names, origin, levels, greedy, uv_rects):
+        meshes.update(batch)
+    logging.info(f"LOD meshes: {len(meshes)} nodes")
+    return meshes
+
+
+def node_bounds(key, origin=(0, 0, 0)):
+    """World space (min, max) corners of the octree node (level, sy, sz, sx)."""
+    level, sy, sz, sx = key
+    size = SECTION_SIZE * 2 ** level
+    low = np.array([sx, sy, sz], dtype=np.float64) * size + np.asarray(origin, dtype=np.float64) - 0.5
+    return low, low + size
+
+
+def octree_nodes(keys):
+    """All nodes of the tree holding the given mesh keys: the keys plus every ancestor up to their top level."""
+    nodes = set(keys)
+    top = max((key[0] for key in nodes), default=0)
+    pending = list(keys)
+    while pending:
+        level, sy, sz, sx = pending.pop()
+        parent = (level + 1, sy // 2, sz // 2, sx // 2)
+        if level < top and parent not in nodes:
+            nodes.add(parent)
+            pending.append(parent)
+    return nodes
+
+
+def select_nodes(
+    nodes,
+    triangles,
+    eye,
+    planes,
+    fov_y,
+    screen_height,
+    origin=(0, 0, 0),
+    budget=TRIANGLE_BUDGET,
+    pixel_error=PIXEL_ERROR
+):
+    """
+    Pick the octree nodes to draw this frame.
+
+    nodes is the set from octree_nodes, triangles maps node -> triangle count
+    (missing means empty). Nodes outside the frustum planes are dropped.
+    Returns (keys, triangle_count).
+    """
+    eye = np.asarray(eye, dtype=np.float64)
+    focal = screen_height / (2.0 * np.tan(np.radians(fov_y) / 2.0))
+    top = max(key[0] for key in nodes) if nodes else 0
+
+    def visible(keys):
+        if not keys:
+            return []
+        bounds = [node_bounds(key, origin) for key in keys]
+        mask = boxes_in_frustum(planes, [b[0] for b in bounds], [b[1] for b in bounds])
+        return [key for key, v in zip(keys, mask.tolist()) if v]
+
+    def error(key):
+        low, high = node_bounds(key, origin)
+        distance = np.linalg.norm(np.maximum(0, np.maximum(low - eye, eye - high)))
+        return 2 ** key[0] * focal / max(distance, 1e-3)
+
+    def children(key):
+        level, sy, sz, sx = key
+        return [
+            (level - 1, 2 * sy + dy, 2 * sz + dz, 2 * sx + dx)
+            for dy in (0, 1) for dz in (0, 1) for dx in (0, 1)
+            if (level - 1, 2 * sy + dy, 2 * sz + dz, 2 * sx + dx) in nodes
+        ]
+
+    selected = set(visible([key for key in nodes if key[0] == top]))
+    total = sum(triangles.get(key, 0) for key in selected)
+    heap = [(-error(key), key) for key in selected if key[0] > 0]
+    heapq.heapify(heap)
+
+    while heap:
+        neg_error, key = heapq.heappop(heap)
+        if -neg_error <= pixel_error:
+            break
+        kids = visible(children(key))
+        refined = total - triangles.get(key, 0) + sum(triangles.get(kid, 0) for kid in kids)
+        if refined > budget:
+            continue
+        selected.discard(key)
+        selected.update(kids)
+        total = refined
+        for kid in kids:
+            if kid[0] > 0:
+                heapq.heappush(heap, (-error(kid), kid))
+
+    return [key for key in selected if key in triangles], total
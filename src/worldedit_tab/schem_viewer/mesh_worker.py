@@ -0,0 +1,93 @@
+# mesh_worker.py - Parse and mesh a schematic off the GL thread
+#
+# The worker thread only touches NumPy data. It posts messages on a queue that
+# the viewer drains between frames:
+#   ("grid", info)                  grid decoded; the GL thread loads textures
+#                                   and answers with textures_ready(uv_rects)
+#   ("sections", meshes, progress)  a batch of {(level, sy, sz, sx): mesh}
+#   ("done", None) / ("error", message)
+# progress is (sections done, sections total), counting every section slot
+# of every level, empty or not.
+
+import logging
+import math
+import queue
+import threading
+
+import numpy as np
+
+from .lod import iter_lod_meshes
+from .mesher import SECTION_SIZE, solid_mask
+from .parser import AIR_BLOCK, parse_schematic_grid
+
+
+def section_slots(shape, level=0):
+    """Number of sections a level covers for a level 0 grid of this shape."""
+    scale = 2 ** level
+    return math.prod(math.ceil(math.ceil(n / scale) / SECTION_SIZE) for n in shape)
+
+
+class MeshWorker:
+    def __init__(self, schem_path, levels, greedy, grid=None):
+        """grid is an already decoded (block_indices, palette_names, origin); otherwise schem_path is parsed."""
+        self.schem_path = schem_path
+        self.grid = grid
+        self.levels = levels
+        self.greedy = greedy
+        self.results = queue.Queue()
+        self.uv_rects = None
+        self._textures_ready = threading.Event()
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def textures_ready(self, uv_rects):
+        """Called by the GL thread once textures are loaded; meshing starts after this."""
+        self.uv_rects = uv_rects
+        self._textures_ready.set()
+
+    def stop(self):
+        self._stop.set()
+        self._textures_ready.set()
+
+    def _run(self):
+        try:
+            grid, self.grid = self.grid, None
+            if grid is None:
+                grid = parse_schematic_grid(self.schem_path)
+            if grid is None or not solid_mask(grid[0], grid[1]).any():
+                grid = (np.zeros((1, 1, 1), dtype=np.uint16), ["minecraft:stone"], (0, 0, 0))
+            block_indices, palette_names, origin = grid
+
+            solid = solid_mask(block_indices, palette_names)
+            y, z, x = np.nonzero(solid)
+            coords = np.stack([x, y, z], axis=1).astype(np.float32) + np.array(origin, dtype=np.float32)
+            del solid, x, y, z
+
+            shape = block_indices.shape
+            # Coarse levels stop once the grid is a single voxel thick
+            levels = [k for k in range(self.levels + 1) if min(shape) > 2 ** (k - 1)]
+            total = sum(section_slots(shape, k) for k in levels)
+            self.results.put(("grid", {
+                "blocks": set(name for name in palette_names if name != AIR_BLOCK),
+                "origin": origin,
+                "center": coords.mean(axis=0),
+                "size": coords.max(axis=0) - coords.min(axis=0),
+                "sections": total,
+            }))
+
+            self._textures_ready.wait()
+            if self._stop.is_set():
+                return
+            row_slots = section_slots((1,) + shape[1:])
+            done = 0
+            batches = iter_lod_meshes(block_indices, palette_names, origin, self.levels, self.greedy, self.uv_rects)
+            for level, meshes in batches:
+                if self._stop.is_set():
+                    return
+                done += row_slots if level == 0 else section_slots(shape, level)
+                self.results.put(("sections", meshes, (done, total)))
+            self.results.put(("done", None))
+        except Exception as e:
+            logging.exception(f"Meshing {self.schem_path} failed")
+            self.results.put(("error", f"{type(e).__name__}: {str(e)}"))
@@ -0,0 +1,370 @@
+# mesher.py - Build a render mesh of exposed block faces
+#
+# A face is only emitted when the neighbouring voxel in its direction is air
+# (or outside the grid), so the interior of a solid build costs nothing. The
+# neighbour test is six shifted comparisons of a padded solid mask; no Python
+# loop runs per block. Pure NumPy, no OpenGL, so it can be used headlessly.
+#
+# With greedy=True, coplanar exposed faces of the same block are merged into
+# larger quads whose UVs repeat once per block. Merging never crosses a
+# SECTION_SIZE^3 section, so a single section can be rebuilt on its own with
+# build_section_mesh and gives exactly the quads build_mesh gives for it.
+
+import logging
+
+import numpy as np
+
+from .parser import AIR_BLOCK
+from ..boxes import merge_runs
+
+SECTION_SIZE = 16
+
+# direction: (grid axis (0=y, 1=z, 2=x), step, normal (x, y, z), quad corners (x, y, z))
+# Corners are counter-clockwise seen from outside the block, relative to its centre
+FACES = (
+    ("east", 2, 1, (1, 0, 0), ((0.5, -0.5, 0.5), (0.5, -0.5, -0.5), (0.5, 0.5, -0.5), (0.5, 0.5, 0.5))),
+    ("west", 2, -1, (-1, 0, 0), ((-0.5, -0.5, -0.5), (-0.5, -0.5, 0.5), (-0.5, 0.5, 0.5), (-0.5, 0.5, -0.5))),
+    ("up", 0, 1, (0, 1, 0), ((-0.5, 0.5, 0.5), (0.5, 0.5, 0.5), (0.5, 0.5, -0.5), (-0.5, 0.5, -0.5))),
+    ("down", 0, -1, (0, -1, 0), ((-0.5, -0.5, -0.5), (0.5, -0.5, -0.5), (0.5, -0.5, 0.5), (-0.5, -0.5, 0.5))),
+    ("south", 1, 1, (0, 0, 1), ((-0.5, -0.5, 0.5), (0.5, -0.5, 0.5), (0.5, 0.5, 0.5), (-0.5, 0.5, 0.5))),
+    ("north", 1, -1, (0, 0, -1), ((0.5, -0.5, -0.5), (-0.5, -0.5, -0.5), (-0.5, 0.5, -0.5), (0.5, 0.5, -0.5))),
+)
+FACE_UVS = np.array([(0, 0), (1, 0), (1, 1), (0, 1)], dtype=np.float32)
+
+# Grid axis (0=y, 1=z, 2=x) to vertex component (x, y, z)
+_COMPONENT = (1, 2, 0)
+
+# Face lighting of the viewers and thumbnails: towards the light, from above
+LIGHT_DIR = np.array([0.5, 1.0, -0.5], dtype=np.float32)
+LIGHT_DIR /= np.linalg.norm(LIGHT_DIR)
+AMBIENT = 0.4
+
+
+def _texture_axes(quad):
+    """Grid axes the texture's u (corner 0 -> 1) and v (corner 1 -> 2) run along."""
+    quad = np.array(quad)
+    u = _COMPONENT.index(int(np.flatnonzero(quad[1] != quad[0])[0]))
+    v = _COMPONENT.index(int(np.flatnonzero(quad[2] != quad[1])[0]))
+    return u, v
+
+
+def face_intensities(normals, light_dir=LIGHT_DIR, ambient=AMBIENT):
+    """Brightness of (N, 3) face normals: ambient plus Lambert light from light_dir."""
+    normals = np.asarray(normals, dtype=np.float32).reshape(-1, 3)
+    return ambient + (1.0 - ambient) * np.maximum(0.0, normals @ np.asarray(light_dir, dtype=np.float32))
+
+
+def face_shades(light_dir=LIGHT_DIR, ambient=AMBIENT):
+    """face_intensities of the six FACES normals, in FACES order; all a cube ever needs."""
+    return face_intensities([normal for _, _, _, normal, _ in FACES], light_dir, ambient)
+
+
+def solid_mask(block_indices, palette_names):
+    """Boolean grid of non-air voxels. Ids outside the palette count as air."""
+    solid = np.array([name != AIR_BLOCK for name in palette_names] + [False], dtype=bool)
+    return solid[np.minimum(block_indices, len(palette_names))]
+
+
+def _exposed(padded):
+    """Face masks for the interior of a grid padded by one voxel of neighbours."""
+    inner = (slice(1, -1),) * 3
+    solid = padded[inner]
+    masks = {}
+    for direction, axis, step, _, _ in FACES:
+        neighbour = list(inner)
+        neighbour[axis] = slice(1 + step, padded.shape[axis] - 1 + step)
+        masks[direction] = solid & ~padded[tuple(neighbour)]
+    return masks
+
+
+def exposed_faces(solid):
+    """
+    Return {direction: mask} for the six face directions.
+
+    Each mask has the grid's (height, length, width) shape and is True where a
+    solid voxel's neighbour in that direction is air or outside the grid.
+    """
+    return _exposed(np.pad(solid, 1, constant_values=False))
+
+
+def _greedy(coords, ids, axis):
+    """
+    Merge faces of one direction into rectangles within each section.
+
+    coords are the (y, z, x) voxel arrays of the faces, axis the face normal's
+    grid axis. Returns (start coords, end coords, ids) of the merged quads.
+    """
+    a, b = [i for i in range(3) if i != axis]
+    plane = coords[axis]
+    limits = np.full(len(ids), SECTION_SIZE)
+    sa, sb = coords[a] // SECTION_SIZE, coords[b] // SECTION_SIZE
+
+    # Runs along a, then runs of equal runs along b
+    (plane, sa, sb, cb, ids, ca), a_len = merge_runs([plane, sa, sb, coords[b], ids, coords[a]], 5, limits)
+    limits = np.full(len(ids), SECTION_SIZE)
+    (plane, sa, sb, ca, a_len, ids, cb), b_len = merge_runs([plane, sa, sb, ca, a_len, ids, cb], 6, limits)
+
+    start = [None] * 3
+    start[axis], start[a], start[b] = plane, ca, cb
+    end = list(start)
+    end[a] = ca + a_len - 1
+    end[b] = cb + b_len - 1
+    return start, end, ids
+
+
+def _face_quads(block_indices, masks, origin, greedy):
+    """Per-quad arrays for all six directions, before vertices are expanded."""
+    origin = np.array(origin, dtype=np.float32)
+    quads = {"low": [], "high": [], "normal": [], "corners": [], "size": [], "block": [], "section": []}
+    for direction, axis, _, normal, quad in FACES:
+        coords = np.nonzero(masks[direction])
+        ids = block_indices[coords].astype(np.int64)
+        if greedy and len(ids):
+            start, end, ids = _greedy([c.astype(np.int64) for c in coords], ids, axis)
+        else:
+            start = end = coords
+
+        # (y, z, x) grid coords to (x, y, z) world positions
+        quads["low"].append(np.stack([start[2], start[0], start[1]], axis=1).astype(np.float32) + origin)
+        quads["high"].append(np.stack([end[2], end[0], end[1]], axis=1).astype(np.float32) + origin)
+        u, v = _texture_axes(quad)
+        quads["size"].append(np.stack([end[u] - start[u], end[v] - start[v]], axis=1).astype(np.float32) + 1)
+        quads["normal"].append(np.broadcast_to(np.array(normal, dtype=np.float32), (len(ids), 3)))
+        quads["corners"].append(np.broadcast_to(np.array(quad, dtype=np.float32), (len(ids), 4, 3)))
+        quads["block"].append(ids.astype(np.uint16))
+        quads["section"].append(np.stack([c // SECTION_SIZE for c in start], axis=1).astype(np.int32).reshape(-1, 3))
+    return {key: np.concatenate(parts) for key, parts in quads.items()}
+
+
+def _atlas_uvs(face_block, palette_names, uv_rects):
+    """Map unit quad UVs into every quad's (u0, v0, u1, v1) atlas rect."""
+    rects = np.array([uv_rects.get(name, (0, 0, 1, 1)) for name in palette_names], dtype=np.float32)
+    rects = rects.reshape(-1, 4)[face_block]
+    return (rects[:, None, :2] + FACE_UVS[None, :, :] * (rects[:, None, 2:] - rects[:, None, :2])).reshape(-1, 2)
+
+
+def _assemble(quads, palette_names, uv_rects=None):
+    """Expand per-quad arrays into the vertex arrays of a mesh dict."""
+    # Group quads by palette id so every texture is bound once
+    order = np.argsort(quads["block"], kind="stable")
+    low, high, corners = quads["low"][order], quads["high"][order], quads["corners"][order]
+    normals, uv_scales, face_block = quads["normal"][order], quads["size"][order], quads["block"][order]
+
+    # Negative corner offsets hang off the first voxel, positive ones off the last
+    vertices = np.where(corners < 0, low[:, None, :] + corners, high[:, None, :] + corners).reshape(-1, 3)
+    if uv_rects is None:
+        uvs = (FACE_UVS[None, :, :] * uv_scales[:, None, :]).reshape(-1, 2)
+    else:
+        uvs = _atlas_uvs(face_block, palette_names, uv_rects)
+
+    groups = []
+    block_ids, first, counts = np.unique(face_block, return_index=True, return_counts=True)
+    for block_id, start, count in zip(block_ids.tolist(), first.tolist(), counts.tolist()):
+        groups.append((palette_names[block_id], start * 4, count * 4))
+
+    # Every merged quad covers size_u * size_v block faces
+    face_count = int(uv_scales.prod(axis=1).sum())
+    quad_count = len(face_block)
+    return {
+        "vertices": np.ascontiguousarray(vertices, dtype=np.float32),
+        "uvs": np.ascontiguousarray(uvs, dtype=np.float32),
+        "normals": np.ascontiguousarray(np.repeat(normals, 4, axis=0)),
+        "face_block": face_block,
+        "groups": groups,
+        "stats": {
+            "faces": face_count,
+            "quads": quad_count,
+            "reduction": face_count / quad_count if quad_count else 1.0,
+        },
+    }
+
+
+def _check_atlas(greedy, uv_rects):
+    # A merged quad would need its tile repeated, which an atlas rect cannot do
+    if greedy and uv_rects is not None:
+        raise ValueError("greedy meshing repeats textures and cannot use atlas UV rects")
+
+
+def build_mesh(block_indices, palette_names, origin=(0, 0, 0), greedy=False, uv_rects=None):
+    """
+    Build flat quad arrays for every exposed face of a (height, length, width) grid.
+
+    Returns a dict:
+      vertices    float32 (4Q, 3) world positions, block centres at integer coords
+      uvs         float32 (4Q, 2), repeating once per block on merged quads, or
+                  inside the block's atlas tile when uv_rects {name: (u0, v0, u1, v1)} is given
+      normals     float32 (4Q, 3)
+      face_block  uint16  (Q,) palette id of every quad
+      groups      [(block_name, first_vertex, vertex_count)], one per palette id,
+                  quads of a group are contiguous so each is one draw call
+      stats       {"faces": exposed faces, "quads": quads emitted, "reduction": faces / quads}
+    """
+    _check_atlas(greedy, uv_rects)
+    masks = exposed_faces(solid_mask(block_indices, palette_names))
+    mesh = _assemble(_face_quads(block_indices, masks, origin, greedy), palette_names, uv_rects)
+    stats = mesh["stats"]
+    logging.info(f"Mesh: {stats['faces']} exposed faces -> {stats['quads']} quads "
+                 f"({stats['reduction']:.1f}x{' greedy' if greedy else ''})")
+    return mesh
+
+
+def _split_sections(quads, palette_names, uv_rects, section_offset=(0, 0, 0)):
+    """Assemble one mesh dict per section from the quads of a grid region."""
+    sections = quads["section"]
+    order = np.lexsort((sections[:, 2], sections[:, 1], sections[:, 0]))
+    quads = {key: value[order] for key, value in quads.items()}
+    keys, first = np.unique(quads["section"], axis=0, return_index=True)
+    keys = keys + np.asarray(section_offset, dtype=keys.dtype)
+    bounds = np.append(first, len(order))
+
+    meshes = {}
+    for key, start, stop in zip(map(tuple, keys.tolist()), bounds[:-1].tolist(), bounds[1:].tolist()):
+        meshes[key] = _assemble({name: value[start:stop] for name, value in quads.items()}, palette_names, uv_rects)
+    return meshes
+
+
+def build_section_meshes(block_indices, palette_names, origin=(0, 0, 0), greedy=False, uv_rects=None):
+    """
+    Same quads as build_mesh, split into one mesh dict per section.
+
+    Returns {(sy, sz, sx): mesh}; sections without any exposed face are left out.
+    """
+    _check_atlas(greedy, uv_rects)
+    masks = exposed_faces(solid_mask(block_indices, palette_names))
+    meshes = _split_sections(_face_quads(block_indices, masks, origin, greedy), palette_names, uv_rects)
+    logging.info(f"Meshed {len(meshes)} sections: {sum(m['stats']['quads'] for m in meshes.values())} quads")
+    return meshes
+
+
+def _padded_region(block_indices, palette_names, lo, hi):
+    """Solid mask of grid[lo:hi] plus a one voxel rim of neighbours, air beyond the grid edge."""
+    src = tuple(slice(max(l - 1, 0), min(h + 1, n)) for l, h, n in zip(lo, hi, block_indices.shape))
+    padded = np.zeros([h - l + 2 for l, h in zip(lo, hi)], dtype=bool)
+    dst = tuple(slice(s.start - l + 1, s.stop - l + 1) for s, l in zip(src, lo))
+    padded[dst] = solid_mask(block_indices[src], palette_names)
+    return padded
+
+
+def iter_section_meshes(block_indices, palette_names, origin=(0, 0, 0), greedy=False, uv_rects=None):
+    """
+    Yield the build_section_meshes result one horizontal row of sections at a time.
+
+    Each item is {(sy, sz, sx): mesh} for one sy, bottom row first, so callers
+    can show a build while the rest is still being meshed.
+    """
+    _check_atlas(greedy, uv_rects)
+    height, length, width = block_indices.shape
+    for y0 in range(0, height, SECTION_SIZE):
+        y1 = min(y0 + SECTION_SIZE, height)
+        padded = _padded_region(block_indices, palette_names, (y0, 0, 0), (y1, length, width))
+        band_origin = np.array(origin) + np.array([0, y0, 0])
+        quads = _face_quads(block_indices[y0:y1], _exposed(padded), band_origin, greedy)
+        yield _split_sections(quads, palette_names, uv_rects, (y0 // SECTION_SIZE, 0, 0))
+
+
+def build_section_mesh(block_indices, palette_names, section, origin=(0, 0, 0), greedy=False, uv_rects=None):
+    """
+    Mesh the single section whose (y, z, x) section index is `section`.
+
+    Neighbouring voxels outside the section are still used for culling, so
+    rebuilding a section after an edit matches the full build_mesh output.
+    """
+    _check_atlas(greedy, uv_rects)
+    lo = [s * SECTION_SIZE for s in section]
+    hi = [min(l + SECTION_SIZE, n) for l, n in zip(lo, block_indices.shape)]
+    padded = _padded_region(block_indices, palette_names, lo, hi)
+
+    inner = tuple(slice(l, h) for l, h in zip(lo, hi))
+    section_origin = np.array(origin) + np.array([lo[2], lo[0], lo[1]])
+    quads = _face_quads(block_indices[inner], _exposed(padded), section_origin, greedy)
+    return _assemble(quads, palette_names, uv_rects)
+
+
+def block_cubes(positions, sizes=None):
+    """
+    All six faces of a cube around every (x, y, z) position, unculled.
+
+    For free-floating blocks that are not on a grid. sizes gives (N, 3) edge
+    lengths for boxes; cubes are unit sized by default. Returns (vertices
+    (24N, 3), normals (24N, 3)) in the same face order and winding as FACES.
+    """
+    positions = np.asarray(positions, dtype=np.float32).reshape(-1, 3)
+    corners = np.array([quad for _, _, _, _, quad in FACES], dtype=np.float32).reshape(-1, 3)
+    normals = np.repeat(np.array([normal for _, _, _, normal, _ in FACES], dtype=np.float32), 4, axis=0)
+    if sizes is None:
+        vertices = (positions[:, None, :] + corners[None, :, :]).reshape(-1, 3)
+    else:
+        sizes = np.asarray(sizes, dtype=np.float32).reshape(-1, 3)
+        vertices = (positions[:, None, :] + corners[None, :, :] * sizes[:, None, :]).reshape(-1, 3)
+    return vertices, np.tile(normals, (len(positions), 1))
+
+
+# Corner brightness by how many of the three cells around it are open (0 to 3)
+AO_LEVELS = np.array([0.5, 0.65, 0.8, 1.0], dtype=np.float32)
+
+
+def _corner_neighbours():
+    # Per block_cubes vertex, the cells in front of its face that touch the
+    # corner: (side, other side, diagonal) as offsets from the block
+    offsets = []
+    for _, _, _, normal, quad in FACES:
+        normal = np.array(normal, dtype=np.int64)
+        for corner in quad:
+            diagonal = np.rint(np.array(corner) * 2).astype(np.int64)
+            tangent = diagonal - normal
+            sides = []
+            for axis in np.flatnonzero(tangent):
+                side = normal.copy()
+                side[axis] = tangent[axis]
+                sides.append(side)
+            offsets.append(sides + [diagonal])
+    return np.array(offsets, dtype=np.int64)
+
+
+_CORNER_NEIGHBOURS = _corner_neighbours()
+
+
+def cube_occlusion(positions, occupancy):
+    """
+    Ambient occlusion factor (AO_LEVELS) of every block_cubes vertex of unit
+    cubes at integer positions, in the same order.
+
+    occupancy(low, high) returns the boolean (x, y, z) grid of solid cells
+    between two corners; it is asked once, for the bounding box of the
+    positions grown by one, so keep the positions close together (e.g. one
+    section). A corner between two solid side neighbours is fully occluded.
+    """
+    positions = np.asarray(positions, dtype=np.int64).reshape(-1, 3)
+    if not len(positions):
+        return np.zeros(0, dtype=np.float32)
+    low = positions.min(axis=0) - 1
+    solid = occupancy(low, positions.max(axis=0) + 1)
+
+    # Neighbours as flat offsets into the grid
+    strides = np.array([solid.shape[1] * solid.shape[2], solid.shape[2], 1], dtype=np.int64)
+    cells = ((positions - low) @ strides)[:, None, None] + (_CORNER_NEIGHBOURS @ strides)[None]
+    hits = solid.ravel()[cells]
+    side_a, side_b, diagonal = hits[..., 0], hits[..., 1], hits[..., 2]
+    open_cells = 3 - (side_a.astype(np.int8) + side_b + diagonal)
+    open_cells[side_a & side_b] = 0
+    return AO_LEVELS[open_cells].reshape(-1)
+
+
+def ground_mesh(extent, y, light, dark, tile=1.0):
+    """
+    Checkerboard quads covering [-extent, extent] tiles around the origin.
+
+    Returns (vertices, normals, colors) with RGBA colors alternating light/dark.
+    """
+    i, j = np.meshgrid(np.arange(-extent, extent + 1), np.arange(-extent, extent + 1), indexing="ij")
+    i, j = i.ravel(), j.ravel()
+    x, z = i * tile, j * tile
+    corners = np.array([(0, 0), (1, 0), (1, 1), (0, 1)], dtype=np.float32) * tile
+    vertices = np.empty((len(i), 4, 3), dtype=np.float32)
+    vertices[:, :, 0] = x[:, None] + corners[:, 0]
+    vertices[:, :, 1] = y
+    vertices[:, :, 2] = z[:, None] + corners[:, 1]
+
+    colors = np.where(((i + j) % 2 == 0)[:, None], np.array(light, dtype=np.float32), np.array(dark, dtype=np.float32))
+    normals = np.broadcast_to(np.array([0, 1, 0], dtype=np.float32), (len(i) * 4, 3))
+    return vertices.reshape(-1, 3), np.ascontiguousarray(normals), np.repeat(colors, 4, axis=0).astype(np.float32)
@@ -1,43 +1,104 @@
 # parser.py - Schematic parsing logic
 
-import nbtlib
+import numpy as np
 import os
 
-def parse_schematic(path):
-    blocks = []
+from ..schem_cache import CACHE_DIR, load_schematic_cached
+from ..varint import decode_block_data
+
+AIR_BLOCK = "minecraft:air"
+
+
+def decode_schematic(data):
+    """
+    Decode a loaded schematic compound into columnar NumPy arrays.
+
+    Returns (x, y, z, palette_index, palette_names). x/y/z are int32 world
+    positions with the Offset already applied, palette_index is uint16 and
+    indexes into palette_names, which holds the block name (state without
+    properties) for every palette id. Air is filtered out.
+    """
+    # BlockData is stored y-major, then z, then x
+    block_indices, palette_names, (ox, oy, oz) = decode_schematic_grid(data)
+    palette_size = len(palette_names)
+
+    # Unknown ids and air both map to "not solid"
+    solid = np.array([name != AIR_BLOCK for name in palette_names] + [False], dtype=bool)
+    grid = solid[np.minimum(block_indices, palette_size)]
+
+    y, z, x = np.nonzero(grid)
+    x = x.astype(np.int32) + ox
+    y = y.astype(np.int32) + oy
+    z = z.astype(np.int32) + oz
+    palette_index = block_indices[grid].astype(np.uint16)
+
+    return x, y, z, palette_index, palette_names
+
+
+def decode_schematic_grid(data):
+    """
+    Return (block_indices, palette_names, origin) without flattening to voxels.
+
+    block_indices is the (height, length, width) palette id grid, origin the
+    world position of its first voxel.
+    """
+    palette = data['Palette']
+    palette_size = max((int(v) for v in palette.values()), default=-1) + 1
+    palette_names = [AIR_BLOCK] * palette_size
+    for state, idx in palette.items():
+        palette_names[int(idx)] = str(state).split('[')[0]
+
+    origin = tuple(int(v) for v in data.get('Offset', [0, 0, 0]))
+    return decode_block_data(data), palette_names, origin
+
+
+def load_schematic_data(path, cache_dir=CACHE_DIR):
+    """Load a schematic file through the cache in cache_dir, or return None on failure."""
     if not os.path.exists(path):
         print(f"File not found: {path}")
-        return blocks
+        return None
+
+    # Decoded voxels come from the on-disk cache when the file was opened before
+    schematic, debug = load_schematic_cached(path, cache_dir)
+    if not debug["success"]:
+        print(f"Failed to load schematic: {debug['error']}")
+        return None
+    return schematic
+
+
+def parse_schematic_grid(path, cache_dir=CACHE_DIR):
+    """Load a schematic file and decode it with decode_schematic_grid, or return None on failure."""
+    schematic = load_schematic_data(path, cache_dir)
+    if schematic is None:
+        return None
 
     try:
-        schematic = nbtlib.load(path)  # Auto-detects gzip
+        return decode_schematic_grid(schematic)
     except Exception as e:
-        print(f"Failed to load schematic: {e}")
-        return blocks
+        print(f"Error parsing NBT: {e}")
+        return None
+
+
+def parse_schematic_arrays(path):
+    """Load a schematic file and decode it with decode_schematic, or return None on failure."""
+    schematic = load_schematic_data(path)
+    if schematic is None:
+        return None
 
     try:
-        data = schematic  # nbtlib.load returns root compound
-        width = int(data['Width'])
-        height = int(data['Height'])
-        length = int(data['Length'])
-        palette = data['Palette']
-        block_data = data['BlockData']
-        offset = data.get('Offset', [0, 0, 0])
-        ox, oy, oz = [int(v) for v in offset]
-
-        inverse_palette = {int(v): str(k) for k, v in palette.items()}
-        block_indices = [int(b) for b in block_data]
-
-        for y in range(height):
-            for z in range(length):
-                for x in range(width):
-                    index = y * (length * width) + z * width + x
-                    idx = block_indices[index]
-                    state = inverse_palette.get(idx, "minecraft:air")
-                    block_name = state.split('[')[0]
-                    if block_name != "minecraft:air":
-                        blocks.append((x + ox, y + oy, z + oz, block_name))
+        return decode_schematic(schematic)
     except Exception as e:
         print(f"Error parsing NBT: {e}")
+        return None
+
+
+def parse_schematic(path):
+    blocks = []
+    decoded = parse_schematic_arrays(path)
+    if decoded is None:
+        return blocks
 
-    return blocks
\ No newline at end of file
+    x, y, z, palette_index, palette_names = decoded
+    names = np.array(palette_names, dtype=object)[palette_index]
+    blocks.extend(zip(x.tolist(), y.tolist(), z.tolist(), names.tolist()))
+    return blocks
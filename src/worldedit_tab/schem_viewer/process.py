@@ -0,0 +1,180 @@
+# process.py - Run the 3D viewer in its own process
+#
+# The GUI decodes the schematic (through the on-disk cache) and copies the
+# index grid into a multiprocessing.shared_memory block; the viewer process
+# attaches to it by name instead of parsing the file again. A pipe carries
+# control messages:
+#   GUI -> viewer   ("reload", shared) show another decoded grid
+#                   ("close", None)
+#   viewer -> GUI   ("loaded", name)   copied out of the block, free it
+# The GUI owns every block and unlinks it once the viewer has it, or when the
+# viewer exits. The viewer is spawned, not forked: the GUI runs Tk and
+# decode threads, and a forked child would inherit their locks mid-use.
+
+import logging
+import multiprocessing
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .parser import parse_schematic_grid
+from .viewer import SchematicViewer
+
+# How long close() waits for the window to shut before terminating it
+CLOSE_TIMEOUT = 5.0
+
+
+def share_grid(path, grid):
+    """Copy a decoded (block_indices, palette_names, origin) grid into shared memory."""
+    block_indices, palette_names, origin = grid
+    shm = shared_memory.SharedMemory(create=True, size=max(1, block_indices.nbytes))
+    shared = np.ndarray(block_indices.shape, dtype=block_indices.dtype, buffer=shm.buf)
+    shared[...] = block_indices
+    del shared
+    return shm, {
+        "path": path,
+        "name": shm.name,
+        "shape": block_indices.shape,
+        "dtype": block_indices.dtype.str,
+        "palette": list(palette_names),
+        "origin": tuple(origin),
+    }
+
+
+def attach_grid(shared):
+    """Copy the grid described by share_grid out of shared memory."""
+    # The viewer is started from the GUI and shares its resource tracker, so
+    # attaching here does not leave a second registration behind
+    shm = shared_memory.SharedMemory(name=shared["name"])
+    try:
+        block_indices = np.ndarray(shared["shape"], dtype=shared["dtype"], buffer=shm.buf).copy()
+    finally:
+        shm.close()
+    return block_indices, shared["palette"], shared["origin"]
+
+
+def run_viewer_process(conn, shared, options):
+    """Entry point of the viewer process."""
+    grid = attach_grid(shared)
+    conn.send(("loaded", shared["name"]))
+    viewer = SchematicViewer(shared["path"], grid=grid, **options)
+
+    def control():
+        # Called by the viewer loop between frames; False closes the window
+        try:
+            while conn.poll():
+                kind, payload = conn.recv()
+                if kind == "close":
+                    return False
+                if kind == "reload":
+                    try:
+                        grid = attach_grid(payload)
+                    except FileNotFoundError:
+                        # Already replaced by a newer reload and freed
+                        continue
+                    conn.send(("loaded", payload["name"]))
+                    viewer.load(payload["path"], grid)
+        except (EOFError, OSError):
+            # The GUI is gone
+            return False
+        return True
+
+    try:
+        viewer.run(control)
+    finally:
+        conn.close()
+
+
+class ViewerProcess:
+    """The GUI's handle on a viewer window running in a child process."""
+
+    def __init__(self, **options):
+        """options are passed on to SchematicViewer."""
+        self.options = options
+        self.path = None
+        self.process = None
+        self.conn = None
+        self.segments = {}
+        self.lock = threading.Lock()
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def show(self, path):
+        """Show a schematic, starting the viewer or reloading the running one."""
+        self.path = path
+        # Decoding a large file takes a while; keep the Tk thread free
+        threading.Thread(target=self._share, args=(path,), daemon=True).start()
+
+    def reload(self):
+        """Decode the current file again and send it to the viewer."""
+        if self.path:
+            self.show(self.path)
+
+    def close(self):
+        with self.lock:
+            if self.process is None:
+                return
+            if self.process.is_alive():
+                try:
+                    self.conn.send(("close", None))
+                except OSError:
+                    pass
+                self.process.join(CLOSE_TIMEOUT)
+                if self.process.is_alive():
+                    self.process.terminate()
+            self._free(self.segments)
+            self.process = None
+            self.conn = None
+
+    def _share(self, path):
+        grid = parse_schematic_grid(path)
+        if grid is None:
+            return
+
+        shm, shared = share_grid(path, grid)
+        del grid
+        with self.lock:
+            if self.alive:
+                self.segments[shm.name] = shm
+                try:
+                    self.conn.send(("reload", shared))
+                    return
+                except OSError:
+                    # Exited just now; start a new one instead
+                    self.segments.pop(shm.name)
+
+            segments = {shm.name: shm}
+            ctx = multiprocessing.get_context("spawn")
+            conn, child_conn = ctx.Pipe()
+            process = ctx.Process(target=run_viewer_process, args=(child_conn, shared, self.options), daemon=True)
+            process.start()
+            # Only the child holds this end now, so recv() sees EOF when it exits
+            child_conn.close()
+            self.process, self.conn, self.segments = process, conn, segments
+            threading.Thread(target=self._listen, args=(conn, segments), daemon=True).start()
+        logging.info(f"Viewer process {process.pid} started for {path}")
+
+    def _listen(self, conn, segments):
+        while True:
+            try:
+                kind, name = conn.recv()
+            except (EOFError, OSError):
+                break
+            if kind == "loaded":
+                with self.lock:
+                    self._free({name: segments.pop(name)} if name in segments else {})
+        # The viewer exited; nothing will attach to what is left
+        with self.lock:
+            self._free(segments)
+
+    def _free(self, segments):
+        for shm in segments.values():
+            shm.close()
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        segments.clear()
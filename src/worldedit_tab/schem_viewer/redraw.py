@@ -0,0 +1,67 @@
+# redraw.py - Event-driven redraw scheduling for the pygame windows
+#
+# Instead of clearing and redrawing at a fixed frame rate forever, a window
+# asks the scheduler for its events each iteration. While something is
+# changing (an input event arrived, invalidate() was called or a movement key
+# is held) frames are paced at fps; otherwise the loop blocks in
+# pygame.event.wait until the next event or the idle timeout, using no CPU.
+
+import pygame
+
+# Wake up at least this often while idle, e.g. to notice background work
+IDLE_TIMEOUT_MS = 500
+
+
+class RedrawScheduler:
+    def __init__(self, fps=60, held_keys=(), idle_timeout_ms=IDLE_TIMEOUT_MS, blocking=True):
+        """
+        held_keys are pygame key codes that keep frames coming while pressed
+        (WASD movement). With blocking=False the loop is never put to sleep,
+        for platforms like Emscripten where event.wait cannot block.
+        """
+        self.fps = fps
+        self.held_keys = tuple(held_keys)
+        self.idle_timeout_ms = idle_timeout_ms
+        self.blocking = blocking
+        self.clock = pygame.time.Clock()
+        self.dirty = True
+        self.dt = 1.0 / fps
+
+    def invalidate(self):
+        """Request a redraw, e.g. after an edit that did not come from an event."""
+        self.dirty = True
+
+    def keys_held(self):
+        if not self.held_keys:
+            return False
+        pressed = pygame.key.get_pressed()
+        return any(pressed[key] for key in self.held_keys)
+
+    def _changes_view(self, event):
+        # Hovering the mouse changes nothing; dragging and everything else might
+        if event.type == pygame.MOUSEMOTION:
+            return any(event.buttons)
+        return event.type != pygame.NOEVENT
+
+    def events(self):
+        """Return this iteration's events, sleeping until one arrives when nothing is changing."""
+        if self.dirty or self.keys_held() or not self.blocking:
+            self.dt = self.clock.tick(self.fps) / 1000.0
+            events = pygame.event.get()
+        else:
+            first = pygame.event.wait(self.idle_timeout_ms)
+            events = [first] + pygame.event.get()
+            # The time spent asleep is not movement time
+            self.clock.tick()
+            self.dt = 1.0 / self.fps
+
+        if any(self._changes_view(event) for event in events):
+            self.dirty = True
+        return events
+
+    def needs_redraw(self):
+        return self.dirty or self.keys_held()
+
+    def drawn(self):
+        """Call after flipping a frame."""
+        self.dirty = False
@@ -2,8 +2,14 @@
 
 import pygame
 from OpenGL.GL import *
+import numpy as np
 import os
 
+from .atlas import (
+    ATLAS_CACHE_DIR, MISSING_COLOR, MISSING_TILE, atlas_key, block_rects, load_cached_atlas, pack_atlas,
+    save_cached_atlas, texture_file, texture_files, tile_name,
+)
+
 def load_textures(texture_path, unique_blocks):
     textures = {}
     glEnable(GL_TEXTURE_2D)
@@ -20,6 +26,9 @@ def load_textures(texture_path, unique_blocks):
                 glBindTexture(GL_TEXTURE_2D, texture_id)
                 glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
                 glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+                # Greedy quads repeat the texture once per block
+                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
+                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
                 glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, image_data)
                 textures[block_name] = texture_id
                 print(f"Loaded texture: {full_path}")
@@ -27,4 +36,68 @@ def load_textures(texture_path, unique_blocks):
                 print(f"Texture load error for {block_name}: {e}")
         else:
             print(f"Texture missing (using grey): {full_path}")
-    return textures
\ No newline at end of file
+    return textures
+
+
+def _first_frame(image, tile):
+    """A (tile, tile, 4) RGBA array of the image's first square frame."""
+    width = image.get_width()
+    # Animated textures are vertical strips of square frames
+    frame = image.subsurface((0, 0, width, min(width, image.get_height()))).convert_alpha()
+    if width != tile:
+        frame = pygame.transform.scale(frame, (tile, tile))
+    rgb = pygame.surfarray.array3d(frame).swapaxes(0, 1)
+    alpha = pygame.surfarray.array_alpha(frame).swapaxes(0, 1)
+    return np.dstack([rgb, alpha]).astype(np.uint8)
+
+
+def load_atlas(texture_path, key=None, cache_dir=ATLAS_CACHE_DIR):
+    """
+    Upload every texture of texture_path as one atlas texture.
+
+    key is atlas_key(texture_path) when the caller already has it. Returns
+    (texture_id, tile_rects) where tile_rects maps every texture file stem
+    and MISSING_TILE to its (u0, v0, u1, v1) tile; see atlas_rects.
+    """
+    if key is None:
+        key = atlas_key(texture_path)
+    cached = load_cached_atlas(key, cache_dir)
+    if cached is not None:
+        image, rects = cached
+        print(f"Loaded texture atlas from cache: {len(rects)} tiles")
+    else:
+        images = {}
+        for file_name in texture_files(texture_path):
+            try:
+                images[file_name[:-4]] = pygame.image.load(os.path.join(texture_path, file_name))
+            except Exception as e:
+                print(f"Texture load error for {file_name}: {e}")
+        # Mixed resolution packs are scaled to the largest texture
+        tile = max((image.get_width() for image in images.values()), default=16)
+
+        tiles = {name: _first_frame(image, tile) for name, image in images.items()}
+        tiles[MISSING_TILE] = np.empty((tile, tile, 4), dtype=np.uint8)
+        tiles[MISSING_TILE][:] = MISSING_COLOR
+        image, rects = pack_atlas(tiles)
+        save_cached_atlas(key, image, rects, cache_dir)
+        print(f"Packed {len(rects)} textures into a {image.shape[1]}x{image.shape[0]} atlas")
+
+    glEnable(GL_TEXTURE_2D)
+    texture_id = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, texture_id)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+    # OpenGL's first row is the bottom of the image
+    data = np.ascontiguousarray(image[::-1])
+    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, image.shape[1], image.shape[0], 0, GL_RGBA, GL_UNSIGNED_BYTE, data)
+    return texture_id, rects
+
+
+def atlas_rects(texture_path, tile_rects, unique_blocks):
+    """Per block UV rects for the mesher; blocks without a PNG get the flat grey tile."""
+    for name in sorted(unique_blocks):
+        if tile_name(name) not in tile_rects:
+            print(f"Texture missing (using grey): {texture_file(texture_path, name)}")
+    return block_rects(tile_rects, unique_blocks)
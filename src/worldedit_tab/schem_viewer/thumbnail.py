@@ -0,0 +1,206 @@
+# thumbnail.py - Headless schematic thumbnails
+#
+# A NumPy software renderer for machines without a display or GPU. Exposed
+# faces come from the mesher and are seen through an orthographic camera
+# placed like the viewer's default orbit (yaw 45, pitch 30). Every face is
+# splatted as an n x n grid of sample points, dense enough that neighbouring
+# samples land less than a pixel apart, and a z-buffer keeps the nearest
+# sample of each pixel. Faces take the average colour of their block's
+# texture, shaded with the viewer's LIGHT_DIR and AMBIENT.
+#
+#   python -m worldedit_tab.schem_viewer.thumbnail schematics/ thumbnails/ --size 256
+
+import argparse
+import logging
+import os
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+import pygame
+
+from .atlas import MISSING_COLOR, texture_file
+from .frustum import look_at_basis
+from .mesher import FACES, exposed_faces, face_intensities, solid_mask
+from .parser import parse_schematic_grid
+from ..schem_cache import CACHE_DIR
+
+TEXTURE_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "resource_pack", "textures", "block")
+THUMBNAIL_SIZE = 256
+# Sample points splatted at once; bounds memory on large schematics
+SPLAT_CHUNK = 4_000_000
+
+# (texture_path, block name) -> average colour, per process
+_colors = {}
+
+
+def block_color(texture_path, block_name):
+    """Average RGB (0-1) of a block texture's visible pixels; grey when it has none."""
+    key = (texture_path, block_name)
+    if key not in _colors:
+        color = np.array(MISSING_COLOR[:3], dtype=np.float32) / 255.0
+        path = texture_file(texture_path, block_name)
+        if os.path.exists(path):
+            try:
+                image = pygame.image.load(path)
+                # Animated textures are vertical strips of square frames
+                width = image.get_width()
+                frame = image.subsurface((0, 0, width, min(width, image.get_height())))
+                rgb = pygame.surfarray.array3d(frame).reshape(-1, 3).astype(np.float32)
+                alpha = pygame.surfarray.array_alpha(frame).reshape(-1).astype(np.float32)
+                if alpha.sum() > 0:
+                    color = (rgb * alpha[:, None]).sum(axis=0) / alpha.sum() / 255.0
+            except Exception as e:
+                print(f"Texture load error for {block_name}: {e}")
+        _colors[key] = color
+    return _colors[key]
+
+
+def camera_basis(yaw=45.0, pitch=30.0):
+    """(forward, right, up) of the viewer's orbit camera at this yaw and pitch."""
+    yaw, pitch = np.radians(yaw), np.radians(pitch)
+    eye = np.array([np.cos(pitch) * np.sin(yaw), np.sin(pitch), -np.cos(pitch) * np.cos(yaw)])
+    return look_at_basis(eye, (0.0, 0.0, 0.0))
+
+
+def render_thumbnail(block_indices, palette_names, colors, size=THUMBNAIL_SIZE, yaw=45.0, pitch=30.0):
+    """
+    Render a (height, length, width) palette id grid as a (size, size, 4) RGBA uint8 image.
+
+    colors holds an RGB (0-1) row per palette entry. Air stays transparent.
+    """
+    image = np.zeros((size, size, 4), dtype=np.uint8)
+    solid = solid_mask(block_indices, palette_names)
+    if not solid.any():
+        return image
+
+    forward, right, up = camera_basis(yaw, pitch)
+    # World (x, y, z) -> (screen x, screen y, depth)
+    view = np.stack([right, up, forward]).astype(np.float32)
+
+    # Fit the projected bounding box of the solid blocks
+    bounds = [
+        np.flatnonzero(solid.any(axis=other))[[0, -1]] + np.array([-0.5, 0.5])
+        for other in ((0, 1), (1, 2), (0, 2))
+    ]
+    corners = np.array([(x, y, z) for x in bounds[0] for y in bounds[1] for z in bounds[2]], dtype=np.float32)
+    corners = corners @ view.T
+    middle = (corners.min(axis=0) + corners.max(axis=0)) / 2
+    scale = (size - 2) / max(np.ptp(corners[:, 0]), np.ptp(corners[:, 1]))
+
+    # Samples per face edge: at most 2/3 of a pixel apart on screen
+    n = max(2, int(np.ceil(scale * 1.5)))
+    steps = (np.arange(n, dtype=np.float32) + 0.5) / n
+    s, t = [a.ravel()[:, None] for a in np.meshgrid(steps, steps)]
+
+    masks = exposed_faces(solid)
+    zbuffer = np.full(size * size, np.inf, dtype=np.float32)
+    color = np.zeros((size * size, 3), dtype=np.float32)
+    for direction, _, _, normal, quad in FACES:
+        # Back faces are hidden behind their own block
+        if np.dot(normal, forward) >= 0:
+            continue
+        y, z, x = np.nonzero(masks[direction])
+        if not len(x):
+            continue
+        centres = np.stack([x, y, z], axis=1).astype(np.float32) @ view.T
+        shade = colors[block_indices[y, z, x]] * face_intensities(normal)[0]
+
+        quad = np.array(quad, dtype=np.float32)
+        samples = (quad[0] + s * (quad[1] - quad[0]) + t * (quad[3] - quad[0])) @ view.T
+        chunk = max(1, SPLAT_CHUNK // len(samples))
+        for i in range(0, len(centres), chunk):
+            points = centres[i:i + chunk, None, :] + samples[None]
+            px = np.floor((points[..., 0] - middle[0]) * scale + size / 2).astype(np.int64)
+            py = np.floor(size / 2 - (points[..., 1] - middle[1]) * scale).astype(np.int64)
+            face = np.broadcast_to(np.arange(i, i + len(points))[:, None], px.shape)
+            inside = (px >= 0) & (px < size) & (py >= 0) & (py < size)
+            pixel, depth, face = (py * size + px)[inside], points[..., 2][inside], face[inside]
+
+            # Nearest sample of each pixel, then against what is already drawn
+            order = np.lexsort((depth, pixel))
+            pixel, depth, face = pixel[order], depth[order], face[order]
+            first = np.append(True, pixel[1:] != pixel[:-1])
+            pixel, depth, face = pixel[first], depth[first], face[first]
+            closer = depth < zbuffer[pixel]
+            zbuffer[pixel[closer]] = depth[closer]
+            color[pixel[closer]] = shade[face[closer]]
+
+    drawn = np.isfinite(zbuffer)
+    image.reshape(-1, 4)[drawn, :3] = np.clip(color[drawn] * 255.0 + 0.5, 0, 255).astype(np.uint8)
+    image.reshape(-1, 4)[drawn, 3] = 255
+    return image
+
+
+def write_png(path, image):
+    """Write an (height, width, 4) uint8 RGBA array as a PNG."""
+    height, width = image.shape[:2]
+    # Every scanline starts with filter type 0 (none)
+    raw = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    raw[:, 1:] = image.reshape(height, -1)
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)))
+        f.write(chunk(b"IEND", b""))
+
+
+def render_file(schem_path, out_path, texture_path=TEXTURE_PATH, size=THUMBNAIL_SIZE, cache_dir=CACHE_DIR):
+    """Render one schematic to a PNG thumbnail. Returns True on success."""
+    try:
+        grid = parse_schematic_grid(schem_path, cache_dir)
+        if grid is None:
+            return False
+        block_indices, palette_names, _ = grid
+        colors = np.array([block_color(texture_path, name) for name in palette_names], dtype=np.float32)
+        write_png(out_path, render_thumbnail(block_indices, palette_names, colors.reshape(-1, 3), size))
+        return True
+    except Exception as e:
+        logging.exception(f"Thumbnail of {schem_path} failed")
+        print(f"Failed to render {schem_path}: {e}")
+        return False
+
+
+def render_directory(schem_dir, out_dir, texture_path=TEXTURE_PATH, size=THUMBNAIL_SIZE, workers=None,
+                     cache_dir=CACHE_DIR):
+    """
+    Render every .schem in schem_dir to out_dir/<name>.png on a process pool.
+    The workers share the schematic cache in cache_dir. Returns (rendered, failed).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    names = sorted(name for name in os.listdir(schem_dir) if name.lower().endswith(".schem"))
+    schem_paths = [os.path.join(schem_dir, name) for name in names]
+    out_paths = [os.path.join(out_dir, os.path.splitext(name)[0] + ".png") for name in names]
+
+    rendered = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(render_file, schem_paths, out_paths, repeat(texture_path), repeat(size), repeat(cache_dir))
+        for schem_path, out_path, ok in zip(schem_paths, out_paths, results):
+            if ok:
+                rendered += 1
+                print(f"{schem_path} -> {out_path}")
+    return rendered, len(names) - rendered
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render PNG thumbnails of every .schem in a directory.")
+    parser.add_argument("schem_dir")
+    parser.add_argument("out_dir")
+    parser.add_argument("--textures", default=TEXTURE_PATH, help="block texture directory")
+    parser.add_argument("--size", type=int, default=THUMBNAIL_SIZE)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    rendered, failed = render_directory(args.schem_dir, args.out_dir, args.textures, args.size, args.workers)
+    print(f"Rendered {rendered} thumbnails, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,30 +1,54 @@
 # viewer.py - Main viewer class
 
+import queue
+import time
+
 import pygame
 from pygame.locals import *
 from OpenGL.GL import *
 from OpenGL.GLU import *
 import numpy as np
 
-from .parser import parse_schematic
-from .textures import load_textures
+from .atlas import atlas_key
+from .buffers import VertexBuffer, mesh_buffer
+from .frustum import frustum_planes
+from .lod import LOD_LEVELS, TRIANGLE_BUDGET, octree_nodes, select_nodes
+from .mesh_worker import MeshWorker
+from .mesher import AMBIENT, LIGHT_DIR, ground_mesh
+from .redraw import RedrawScheduler
+from .textures import atlas_rects, load_atlas, load_textures
+
+
+# GL time per frame spent uploading sections while the build streams in
+UPLOAD_BUDGET_MS = 10
 
 
 class SchematicViewer:
     def __init__(
         self,
         schem_path,
-        texture_path="C:/Users/ryant/Documents/Coding Projects/mc-command-block-modifier-master/src/resource_pack/textures/block"
+        texture_path="C:/Users/ryant/Documents/Coding Projects/mc-command-block-modifier-master/src/resource_pack/textures/block",
+        greedy=False,
+        atlas=True,
+        lod=True,
+        triangle_budget=TRIANGLE_BUDGET,
+        grid=None
     ):
-        self.schem_path = schem_path
+        """grid is an already decoded (block_indices, palette_names, origin) of schem_path."""
         self.texture_path = texture_path
+        self.greedy = greedy
+        # Greedy quads repeat their texture, which only works with one texture per block
+        self.use_atlas = atlas and not greedy
+        self.lod_levels = LOD_LEVELS if lod else 0
+        self.triangle_budget = triangle_budget
 
         self.WIDTH, self.HEIGHT = 800, 600
         pygame.init()
         self.screen = pygame.display.set_mode((self.WIDTH, self.HEIGHT), DOUBLEBUF | OPENGL)
         pygame.display.set_caption("Schematic 3D Viewer")
-        self.clock = pygame.time.Clock()
         self.FPS = 60
+        # Frames are only drawn after input or while WASD is held
+        self.redraw = RedrawScheduler(self.FPS, held_keys=(K_w, K_s, K_a, K_d))
 
         # Render area
         self.RENDER_WIDTH = 600
@@ -33,6 +57,9 @@ class SchematicViewer:
         self.RENDER_Y = (self.HEIGHT - self.RENDER_HEIGHT) // 2
 
         # Camera
+        self.fov = 60
+        self.near = 0.1
+        self.far = 1000.0
         self.camera_distance = 10.0
         self.camera_yaw = 45.0
         self.camera_pitch = 30.0
@@ -47,25 +74,51 @@ class SchematicViewer:
         self.move_speed = 0.05
 
         # Lighting
-        self.light_dir = np.array([0.5, 1.0, -0.5], dtype=np.float32)
-        self.light_dir /= np.linalg.norm(self.light_dir)
-        self.ambient = 0.4
+        self.light_dir = LIGHT_DIR.copy()
+        self.ambient = AMBIENT
 
         self.init_opengl()
 
-        # Load schematic
-        self.blocks = parse_schematic(self.schem_path)
-        if not self.blocks:
-            self.blocks = [(0, 0, 0, "minecraft:stone")]
-
-        unique_blocks = set(b[3] for b in self.blocks)
-        self.textures = load_textures(self.texture_path, unique_blocks)
-
-        coords = np.array([[b[0], b[1], b[2]] for b in self.blocks], dtype=np.float32)
-        self.center = coords.mean(axis=0)
+        vertices, normals, colors = ground_mesh(30, -0.01, (0.7, 0.7, 0.7, 0.4), (0.4, 0.4, 0.4, 0.4))
+        self.ground = VertexBuffer(vertices, normals, colors=colors)
+        # One atlas of the whole texture directory, kept across loads
+        self.atlas = None
+        self.atlas_key = None
+        self.tile_rects = {}
+        self.textures = {}
+        self.sections = {}
+        self.loader = None
+        self.load(schem_path, grid)
+
+    def load(self, schem_path, grid=None):
+        """Drop the current schematic and start building schem_path (or its decoded grid)."""
+        if self.loader is not None:
+            self.loader.stop()
+        self.free_meshes()
+        self.schem_path = schem_path
 
-        size = coords.max(axis=0) - coords.min(axis=0)
-        self.camera_distance = max(8.0, np.max(size) * 2.0)
+        # GPU buffers: one per octree node, uploaded as the worker finishes them
+        self.origin = (0, 0, 0)
+        self.triangles = {}
+        self.octree = set()
+        self.selection = None
+        self.last_view = None
+
+        # Parsing and meshing run in the background; the window stays responsive
+        self.progress = (0, 0)
+        self.mesh_stats = {"faces": 0, "quads": 0}
+        self.loader = MeshWorker(self.schem_path, self.lod_levels, self.greedy, grid)
+        pygame.display.set_caption("Schematic 3D Viewer - loading...")
+        self.redraw.invalidate()
+
+    def free_meshes(self):
+        """Delete the section buffers and per-block textures; the atlas serves the next schematic too."""
+        for buffer, _ in self.sections.values():
+            buffer.delete()
+        self.sections = {}
+        for t in self.textures.values():
+            glDeleteTextures([t])
+        self.textures = {}
 
     def init_opengl(self):
         glEnable(GL_DEPTH_TEST)
@@ -77,7 +130,7 @@ class SchematicViewer:
 
         glMatrixMode(GL_PROJECTION)
         glLoadIdentity()
-        gluPerspective(60, self.RENDER_WIDTH / self.RENDER_HEIGHT, 0.1, 1000.0)
+        gluPerspective(self.fov, self.RENDER_WIDTH / self.RENDER_HEIGHT, self.near, self.far)
         glMatrixMode(GL_MODELVIEW)
 
     def get_camera_vectors(self):
@@ -107,61 +160,148 @@ class SchematicViewer:
             self.center[0], self.center[1], self.center[2],
             0, 1, 0
         )
-
-    def draw_block(self, x, y, z, block_name):
-        vertices = [
-            (x-0.5, y-0.5, z-0.5), (x+0.5, y-0.5, z-0.5),
-            (x+0.5, y+0.5, z-0.5), (x-0.5, y+0.5, z-0.5),
-            (x-0.5, y-0.5, z+0.5), (x+0.5, y-0.5, z+0.5),
-            (x+0.5, y+0.5, z+0.5), (x-0.5, y+0.5, z+0.5)
-        ]
-
-        faces = [
-            (0,1,2,3),(4,5,6,7),(0,1,5,4),
-            (3,2,6,7),(0,3,7,4),(1,2,6,5)
-        ]
-
-        texture = self.textures.get(block_name)
-        if texture:
-            glEnable(GL_TEXTURE_2D)
-            glBindTexture(GL_TEXTURE_2D, texture)
+        return eye
+
+    def on_grid_loaded(self, info):
+        """Worker decoded the grid: load textures here on the GL thread and frame the camera."""
+        self.origin = info["origin"]
+        self.progress = (0, info["sections"])
+        uv_rects = None
+        if self.use_atlas:
+            # Only rebuilt when a texture file was added, removed or edited
+            key = atlas_key(self.texture_path)
+            if key != self.atlas_key:
+                if self.atlas:
+                    glDeleteTextures([self.atlas])
+                self.atlas, self.tile_rects = load_atlas(self.texture_path, key)
+                self.atlas_key = key
+            uv_rects = atlas_rects(self.texture_path, self.tile_rects, info["blocks"])
         else:
+            self.textures = load_textures(self.texture_path, info["blocks"])
+        self.loader.textures_ready(uv_rects)
+
+        self.center = info["center"]
+        self.camera_distance = max(8.0, np.max(info["size"]) * 2.0)
+
+    def poll_loader(self):
+        """Upload whatever the mesh worker has finished, within UPLOAD_BUDGET_MS."""
+        deadline = time.perf_counter() + UPLOAD_BUDGET_MS / 1000.0
+        while time.perf_counter() < deadline:
+            try:
+                kind, payload, *rest = self.loader.results.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "grid":
+                self.on_grid_loaded(payload)
+            elif kind == "sections":
+                self.upload_sections(payload)
+                self.progress = rest[0]
+                for key, mesh in payload.items():
+                    if key[0] == 0:
+                        self.mesh_stats["faces"] += mesh["stats"]["faces"]
+                        self.mesh_stats["quads"] += mesh["stats"]["quads"]
+            else:
+                if kind == "error":
+                    print(f"Failed to build mesh: {payload}")
+                else:
+                    print(f"Mesh: {self.mesh_stats['faces']} exposed faces -> {self.mesh_stats['quads']} quads, "
+                          f"{len(self.sections)} LOD nodes")
+                self.loader = None
+                self.last_view = None
+                break
+            self.redraw.invalidate()
+
+        if self.loader is not None:
+            done, total = self.progress
+            pygame.display.set_caption(f"Schematic 3D Viewer - loading: {done}/{total} sections")
+            # Keep frames coming until the build has streamed in
+            self.redraw.invalidate()
+
+    def upload_sections(self, meshes):
+        """Replace the GPU buffers of the given (level, sy, sz, sx) nodes; empty meshes drop the node."""
+        for key, mesh in meshes.items():
+            old = self.sections.pop(key, None)
+            if old is not None:
+                old[0].delete()
+            self.triangles.pop(key, None)
+            if mesh["stats"]["quads"]:
+                self.sections[key] = (mesh_buffer(mesh), mesh["groups"])
+                self.triangles[key] = mesh["stats"]["quads"] * 2
+
+        self.octree = octree_nodes(self.triangles)
+        self.last_view = None
+
+    def select_sections(self, eye):
+        """Octree nodes to draw from this camera: in the frustum, within the triangle budget."""
+        view = (tuple(eye), tuple(self.center))
+        if view == self.last_view:
+            return self.selection
+        self.last_view = view
+
+        planes = frustum_planes(
+            eye, self.center, self.fov, self.RENDER_WIDTH / self.RENDER_HEIGHT, self.near, self.far
+        )
+        keys, triangles = select_nodes(
+            self.octree, self.triangles, eye, planes, self.fov, self.RENDER_HEIGHT,
+            self.origin, self.triangle_budget
+        )
+        self.selection = keys
+        if self.loader is None:
+            pygame.display.set_caption(
+                f"Schematic 3D Viewer - {len(keys)} nodes visible, {triangles:,} triangles"
+            )
+        return self.selection
+
+    def draw_mesh(self, keys):
+        glColor4f(1, 1, 1, 1)
+        for key in keys:
+            buffer, groups = self.sections[key]
+            buffer.bind()
+            if self.atlas:
+                # Every block is a tile of the one atlas texture: one draw per section
+                glEnable(GL_TEXTURE_2D)
+                glBindTexture(GL_TEXTURE_2D, self.atlas)
+                buffer.draw()
+            else:
+                for name, first, count in groups:
+                    texture = self.textures.get(name)
+                    if texture:
+                        glEnable(GL_TEXTURE_2D)
+                        glBindTexture(GL_TEXTURE_2D, texture)
+                    else:
+                        glDisable(GL_TEXTURE_2D)
+                    buffer.draw(first, count)
+
+            # Quad outlines: the same quads again as lines
             glDisable(GL_TEXTURE_2D)
-
-        glBegin(GL_QUADS)
-        for face in faces:
-            for v in face:
-                glVertex3fv(vertices[v])
-        glEnd()
-
-        glDisable(GL_TEXTURE_2D)
-        glColor3f(0, 0, 0)
-        glBegin(GL_LINES)
-        edges = [(0,1),(1,2),(2,3),(3,0),(4,5),(5,6),(6,7),(7,4),(0,4),(1,5),(2,6),(3,7)]
-        for a, b in edges:
-            glVertex3fv(vertices[a])
-            glVertex3fv(vertices[b])
-        glEnd()
+            glColor3f(0, 0, 0)
+            glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
+            buffer.draw()
+            glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+            glColor4f(1, 1, 1, 1)
+            buffer.unbind()
 
     def draw_ground(self):
         glDisable(GL_TEXTURE_2D)
-        glBegin(GL_QUADS)
-        for x in range(-30, 31):
-            for z in range(-30, 31):
-                c = 0.7 if (x + z) % 2 == 0 else 0.4
-                glColor4f(c, c, c, 0.4)
-                glVertex3f(x, -0.01, z)
-                glVertex3f(x+1, -0.01, z)
-                glVertex3f(x+1, -0.01, z+1)
-                glVertex3f(x, -0.01, z+1)
-        glEnd()
-
-    def run(self):
+        self.ground.bind()
+        self.ground.draw()
+        self.ground.unbind()
+
+    def run(self, control=None):
+        """
+        Main loop. control, if given, is called once per iteration and closes
+        the window by returning False (see process.py).
+        """
         running = True
 
         while running:
-            dt = self.clock.tick(self.FPS) / 1000.0
-            speed = self.move_speed * self.camera_distance * dt * 60
+            if control is not None and not control():
+                break
+            if self.loader is not None:
+                self.poll_loader()
+            events = self.redraw.events()
+            speed = self.move_speed * self.camera_distance * self.redraw.dt * 60
 
             keys = pygame.key.get_pressed()
             forward, right, _ = self.get_camera_vectors()
@@ -173,9 +313,9 @@ class SchematicViewer:
             if keys[K_a]:
                 self.center += right * speed
             if keys[K_d]:
-                self.center -= right * speed   
+                self.center -= right * speed
 
-            for event in pygame.event.get():
+            for event in events:
                 if event.type == QUIT:
                     running = False
 
@@ -215,15 +355,20 @@ class SchematicViewer:
 
                     self.last_mouse_pos = event.pos
 
-            self.update_camera()
+            if not running or not self.redraw.needs_redraw():
+                continue
+
+            eye = self.update_camera()
             glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
             self.draw_ground()
-            for x, y, z, name in self.blocks:
-                self.draw_block(x, y, z, name)
+            self.draw_mesh(self.select_sections(eye))
 
             pygame.display.flip()
+            self.redraw.drawn()
 
-        for t in self.textures.values():
-            glDeleteTextures([t])
+        if self.loader is not None:
+            self.loader.stop()
+        self.free_meshes()
+        self.ground.delete()
         pygame.quit()
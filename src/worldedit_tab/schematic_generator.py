@@ -2,10 +2,11 @@
 # Updated February 28, 2026
 
 import logging
-import nbtlib
-from nbtlib.tag import Compound, List, Byte, Int, Long, Short, ByteArray, String, IntArray
+import numpy as np
 from tkinter import filedialog
-import gzip
+
+from .nbt_writer import save_schematic
+from .varint import encode_varints
 
 
 def generate_schematic(gui):
@@ -31,58 +32,38 @@ def generate_schematic(gui):
         # Ensure facing default exists
         palette_key = block_type if '[' in block_type else f"{block_type}[conditional=false,facing=up]"
 
-        palette = Compound({
-            palette_key: Int(0)
-        })
-
         # Structure is EXACTLY width × height × length
-        block_data = ByteArray([0] * (width * height * length))
-
-        block_entities = List[Compound]()
-
+        block_entities = []
         if "command_block" in block_type:
-            for py in range(height):
-                for pz in range(length):
-                    for px in range(width):
-                        block_entities.append(
-                            Compound({
-                                "id": String("minecraft:command_block"),
-                                "Pos": IntArray([px, py, pz]),
-                                "Command": String(command),
-                                "CustomName": String("{\"text\":\"@\"}"),
-                                "auto": Byte(0),
-                                "conditionMet": Byte(0),
-                                "powered": Byte(0),
-                                "TrackOutput": Byte(1),
-                                "SuccessCount": Int(0),
-                                "UpdateLastExecution": Byte(1),
-                                "LastExecution": Long(0),
-                                "LastOutput": String("")
-                            })
-                        )
-
-        schematic_data = Compound({
-            "Version": Int(2),
-            "DataVersion": Int(4550),
-            "Width": Short(width),
-            "Height": Short(height),
-            "Length": Short(length),
-            "PaletteMax": Int(1),
-            "Palette": palette,
-            "BlockData": block_data,
+            block_entities = (
+                (px, py, pz, command)
+                for py in range(height)
+                for pz in range(length)
+                for px in range(width)
+            )
+
+        schematic = {
+            "Version": 2,
+            "DataVersion": 4550,
+            "Width": width,
+            "Height": height,
+            "Length": length,
+            "PaletteMax": 1,
+            "Palette": {palette_key: 0},
+            "BlockData": encode_varints(np.zeros(width * height * length)),
             "BlockEntities": block_entities,
+            "BlockEntityCount": width * height * length if "command_block" in block_type else 0,
+            "CustomName": "{\"text\":\"@\"}",
 
             # 🔥 CRITICAL FIX — ORIGIN IS ALWAYS ZERO
-            "Offset": IntArray([0, 0, 0]),
-
-            "Metadata": Compound({
-                "WEOffsetX": Int(0),
-                "WEOffsetY": Int(0),
-                "WEOffsetZ": Int(0)
-            })
-        })
+            "Offset": (0, 0, 0),
 
-        schematic = nbtlib.File(schematic_data)
+            "Metadata": {
+                "WEOffsetX": 0,
+                "WEOffsetY": 0,
+                "WEOffsetZ": 0
+            }
+        }
 
         file_path = filedialog.asksaveasfilename(
             defaultextension=".schem",
@@ -90,9 +71,7 @@ def generate_schematic(gui):
         )
 
         if file_path:
-            with open(file_path, 'wb') as f:
-                with gzip.GzipFile(fileobj=f, mode='wb') as gz:
-                    schematic.write(gz)
+            save_schematic(file_path, schematic)
 
             gui.print_to_text(f"Schematic saved to {file_path}", "normal")
             logging.debug(f"Schematic saved to {file_path}")
@@ -0,0 +1,116 @@
+# varint.py - Sponge schematic BlockData varint codec
+#
+# Sponge schematics store BlockData as unsigned LEB128 varints: seven bits per
+# byte, high bit set on every byte except the last one of a value. Palettes with
+# up to 128 entries therefore encode one byte per voxel, anything larger spills
+# into multi-byte values.
+
+import numpy as np
+
+# Slow-path batch size in bytes, keeps temporaries bounded on huge schematics
+BATCH_BYTES = 1 << 24
+
+
+def _decode_batch(raw):
+    terminators = np.flatnonzero(raw < 0x80)
+    starts = np.empty_like(terminators)
+    starts[0] = 0
+    starts[1:] = terminators[:-1] + 1
+    lengths = terminators - starts + 1
+    if lengths.max() > 5:
+        raise ValueError("Varint longer than 5 bytes in BlockData")
+
+    shifts = (np.arange(len(raw)) - np.repeat(starts, lengths)).astype(np.uint32) * 7
+    parts = (raw & 0x7F).astype(np.uint32) << shifts
+    # The 7-bit groups never overlap, so summing them is the same as or-ing them
+    return np.add.reduceat(parts, starts)
+
+
+def _as_bytes(data):
+    return np.frombuffer(data, dtype=np.uint8) if isinstance(data, (bytes, bytearray, memoryview)) \
+        else np.asarray(data).view(np.uint8).ravel()
+
+
+def decode_varints(data, count=None):
+    """
+    Decode a varint byte stream into a NumPy array.
+
+    data may be bytes or any byte-sized array (nbtlib ByteArray included).
+    Returns uint16 when every value fits, uint32 otherwise. When count is
+    given, exactly that many values are expected.
+    """
+    raw = _as_bytes(data)
+    if len(raw) == 0:
+        values = np.zeros(0, dtype=np.uint16)
+    elif raw.max() < 0x80:
+        # Fast path: every byte is a complete value
+        values = raw.astype(np.uint16)
+    else:
+        if raw[-1] >= 0x80:
+            raise ValueError("BlockData ends in the middle of a varint")
+        chunks = []
+        pos = 0
+        while pos < len(raw):
+            end = min(pos + BATCH_BYTES, len(raw))
+            if end < len(raw):
+                # Cut the batch after the last complete varint
+                end = pos + int(np.flatnonzero(raw[pos:end] < 0x80)[-1]) + 1
+            chunks.append(_decode_batch(raw[pos:end]))
+            pos = end
+        values = np.concatenate(chunks)
+        if values.max() <= 0xFFFF:
+            values = values.astype(np.uint16)
+
+    if count is not None and len(values) != count:
+        raise ValueError(f"Expected {count} BlockData entries, decoded {len(values)}")
+    return values
+
+
+def encode_varints(values):
+    """Encode non-negative integers as a varint byte string."""
+    values = np.asarray(values, dtype=np.uint32).ravel()
+    if len(values) == 0:
+        return b""
+    if values.max() < 0x80:
+        return values.astype(np.uint8).tobytes()
+
+    lengths = np.ones(len(values), dtype=np.int64)
+    for bits in (7, 14, 21, 28):
+        lengths += values >= (1 << bits)
+
+    starts = np.cumsum(lengths) - lengths
+    positions = np.arange(int(lengths.sum())) - np.repeat(starts, lengths)
+    expanded = np.repeat(values, lengths)
+    out = ((expanded >> (positions.astype(np.uint32) * 7)) & 0x7F).astype(np.uint8)
+    # Continuation bit on every byte except the last of each value
+    out[positions < np.repeat(lengths - 1, lengths)] |= 0x80
+    return out.tobytes()
+
+
+def decode_block_data(data):
+    """Decode a schematic's BlockData into a (height, length, width) index grid."""
+    if 'BlockIndices' in data:
+        # Already decoded, e.g. a schem_cache entry
+        return data['BlockIndices']
+    width = int(data['Width'])
+    height = int(data['Height'])
+    length = int(data['Length'])
+    values = decode_varints(data['BlockData'], width * height * length)
+    return values.reshape(height, length, width)
+
+
+def check_block_data(data):
+    """
+    Check that BlockData holds exactly width * height * length varints without
+    decoding it: only the bytes ending a value are counted. Raises ValueError
+    like decode_block_data; overlong varints are only caught by decoding.
+    """
+    if 'BlockIndices' in data:
+        return
+    count = int(data['Width']) * int(data['Height']) * int(data['Length'])
+    raw = _as_bytes(data['BlockData'])
+    if len(raw) and raw[-1] >= 0x80:
+        raise ValueError("BlockData ends in the middle of a varint")
+    found = np.count_nonzero(raw < 0x80)
+    if found != count:
+        raise ValueError(f"Expected {count} BlockData entries, found {found}")
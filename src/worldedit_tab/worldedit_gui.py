@@ -3,11 +3,10 @@ from .command_block_generator.gui import open_converter_window
 import tkinter as tk
 from tkinter import ttk
 from tkinter import filedialog
-import threading
 
 # Existing imports
 from .schematic_generator import generate_schematic
-from .schem_viewer.viewer import SchematicViewer
+from .schem_viewer.process import ViewerProcess
 
 # New import for the converter window
 from .command_block_generator.gui import open_converter_window
@@ -103,15 +102,29 @@ def create_worldedit_schematic_gui(frame, gui):
     ).grid(row=12, column=0, columnspan=5, pady=20, sticky="w")
 
     # View Schematic Button
+    # The viewer runs in its own process; opening another file reloads it
+    viewer = ViewerProcess()
+
     def open_viewer_window():
         file_path = filedialog.askopenfilename(
             defaultextension=".schem",
             filetypes=[("Schematic files", "*.schem"), ("All files", "*.*")]
         )
         if file_path:
-            threading.Thread(target=lambda: SchematicViewer(file_path).run(), daemon=True).start()
+            viewer.show(file_path)
             gui.print_to_text(f"Viewing schematic: {file_path}", "normal")
 
+    def reload_viewer():
+        if viewer.path is None:
+            gui.print_to_text("No schematic opened in the viewer", "normal")
+            return
+        viewer.reload()
+        gui.print_to_text(f"Reloading schematic: {viewer.path}", "normal")
+
+    def close_viewer():
+        viewer.close()
+        gui.print_to_text("Closed the 3D viewer", "normal")
+
     tk.Button(
         scrollable_frame,
         text="View Schematic in 3D",
@@ -122,5 +135,25 @@ def create_worldedit_schematic_gui(frame, gui):
         activebackground='#1E88E5'
     ).grid(row=13, column=0, columnspan=5, pady=5, sticky="w")
 
+    tk.Button(
+        scrollable_frame,
+        text="Reload Viewer",
+        command=reload_viewer,
+        font=("Arial", 11),
+        bg='#2196F3',
+        fg='#ffffff',
+        activebackground='#1E88E5'
+    ).grid(row=14, column=0, columnspan=5, pady=5, sticky="w")
+
+    tk.Button(
+        scrollable_frame,
+        text="Close Viewer",
+        command=close_viewer,
+        font=("Arial", 11),
+        bg='#2196F3',
+        fg='#ffffff',
+        activebackground='#1E88E5'
+    ).grid(row=15, column=0, columnspan=5, pady=5, sticky="w")
+
     # Extra spacing at bottom
-    tk.Label(scrollable_frame, text="", bg='#f0f0f0').grid(row=14, column=0, pady=20)
\ No newline at end of file
+    tk.Label(scrollable_frame, text="", bg='#f0f0f0').grid(row=16, column=0, pady=20)
\ No newline at end of file
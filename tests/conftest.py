@@ -0,0 +1,5 @@
+# Tests import the modules the way the app does, from src/
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
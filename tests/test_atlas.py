@@ -0,0 +1,76 @@
+import os
+
+import numpy as np
+
+from worldedit_tab.schem_viewer.atlas import (
+    MISSING_TILE, atlas_key, block_rects, load_cached_atlas, pack_atlas, save_cached_atlas,
+)
+
+
+def _tiles(names):
+    return {name: np.full((4, 4, 4), i, dtype=np.uint8) for i, name in enumerate(names)}
+
+
+def test_pack_atlas_rects():
+    image, rects = pack_atlas(_tiles(["minecraft:stone", "minecraft:dirt"]), padding=2)
+    assert image.shape == (16, 16, 4)
+    # dirt sorts first, top left, so its tile spans v from the top of the image down
+    assert rects["minecraft:dirt"] == (2 / 16, 10 / 16, 6 / 16, 14 / 16)
+    assert (image[2:6, 2:6] == 1).all()
+    assert (image[2:6, 10:14] == 0).all()
+
+
+def test_block_rects_look_up_texture_files():
+    _, rects = pack_atlas(_tiles(["stone", "dirt", MISSING_TILE]))
+    by_block = block_rects(rects, ["minecraft:stone", "dirt", "minecraft:no_such_block"])
+    assert by_block == {"minecraft:stone": rects["stone"], "dirt": rects["dirt"],
+                        "minecraft:no_such_block": rects[MISSING_TILE]}
+
+
+def test_atlas_key_follows_the_texture_directory(tmp_path):
+    textures = tmp_path / "textures"
+    textures.mkdir()
+    (textures / "stone.png").write_bytes(b"a")
+    (textures / "notes.txt").write_bytes(b"a")
+    key = atlas_key(str(textures))
+    assert atlas_key(str(textures)) == key
+
+    # Other files do not matter, a new PNG or an edited one does
+    (textures / "notes.txt").write_bytes(b"ab")
+    assert atlas_key(str(textures)) == key
+    (textures / "dirt.png").write_bytes(b"a")
+    added = atlas_key(str(textures))
+    assert added != key
+    (textures / "dirt.png").write_bytes(b"ab")
+    assert atlas_key(str(textures)) not in (key, added)
+
+
+def test_cache_round_trip(tmp_path):
+    cache = str(tmp_path / "cache")
+    key = atlas_key(str(tmp_path / "textures"))
+    assert load_cached_atlas(key, cache) is None
+    image, rects = pack_atlas(_tiles(["stone", "dirt", MISSING_TILE]))
+    save_cached_atlas(key, image, rects, cache)
+
+    cached_image, cached_rects = load_cached_atlas(key, cache)
+    assert np.array_equal(cached_image, image)
+    assert cached_rects == rects
+    assert sorted(os.listdir(cache)) == [key + ".json", key + ".npy"]
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = str(tmp_path / "cache")
+    keys = [f"key{i}" for i in range(3)]
+    image, rects = pack_atlas(_tiles(["stone"]))
+    entry_bytes = image.nbytes + 256
+
+    for key in keys[:2]:
+        save_cached_atlas(key, image, rects, cache, max_bytes=2 * entry_bytes)
+    # Touch the first so the second is the least recently used
+    assert load_cached_atlas(keys[0], cache) is not None
+    save_cached_atlas(keys[2], image, rects, cache, max_bytes=2 * entry_bytes)
+
+    assert load_cached_atlas(keys[0], cache) is not None
+    assert load_cached_atlas(keys[1], cache) is None
+    assert load_cached_atlas(keys[2], cache) is not None
+    assert len(os.listdir(cache)) == 4
@@ -0,0 +1,120 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Exit code of the GL script when no context can be created
+NO_CONTEXT = 77
+
+
+def test_vertex_buffer():
+    # PyOpenGL picks its platform on first import, so the checks run in a fresh
+    # interpreter on an offscreen EGL context (Mesa's surfaceless platform)
+    env = dict(os.environ, PYOPENGL_PLATFORM="egl", EGL_PLATFORM="surfaceless", LIBGL_ALWAYS_SOFTWARE="1")
+    result = subprocess.run([sys.executable, __file__], env=env, capture_output=True, text=True, timeout=120)
+    if result.returncode == NO_CONTEXT:
+        pytest.skip(f"no OpenGL context: {result.stdout.strip()}")
+    assert result.returncode == 0, result.stdout + result.stderr
+
+
+def _make_context(size):
+    import ctypes
+    from OpenGL import EGL
+
+    display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+    if not EGL.eglInitialize(display, None, None):
+        raise RuntimeError("eglInitialize failed")
+    attributes = (EGL.EGLint * 13)(
+        EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT, EGL.EGL_RED_SIZE, 8, EGL.EGL_GREEN_SIZE, 8,
+        EGL.EGL_BLUE_SIZE, 8, EGL.EGL_DEPTH_SIZE, 24, EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT, EGL.EGL_NONE
+    )
+    config, count = EGL.EGLConfig(), EGL.EGLint()
+    if not EGL.eglChooseConfig(display, attributes, ctypes.pointer(config), 1, ctypes.pointer(count)) or not count.value:
+        raise RuntimeError("no EGL config with OpenGL and a pbuffer")
+    surface = EGL.eglCreatePbufferSurface(display, config, (EGL.EGLint * 5)(EGL.EGL_WIDTH, size, EGL.EGL_HEIGHT, size, EGL.EGL_NONE))
+    EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+    context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, None)
+    if not context or not EGL.eglMakeCurrent(display, surface, surface, context):
+        raise RuntimeError("could not make an EGL context current")
+
+
+def _quad(x0, x1, color):
+    vertices = [(x0, -1, 0), (x1, -1, 0), (x1, 1, 0), (x0, 1, 0)]
+    return vertices, [(0, 0, 1)] * 4, [color] * 4
+
+
+def _check_buffers():
+    import numpy as np
+    from OpenGL.GL import (
+        GL_ARRAY_BUFFER_BINDING, GL_COLOR_ARRAY, GL_COLOR_BUFFER_BIT, GL_RGB, GL_TEXTURE_COORD_ARRAY,
+        GL_UNSIGNED_BYTE, GL_VERTEX_ARRAY, glClear, glClearColor, glGetIntegerv, glIsBuffer, glIsEnabled,
+        glReadPixels, glViewport,
+    )
+    from worldedit_tab.schem_viewer.buffers import FLOAT_BYTES, VertexBuffer
+
+    size = 32
+    glViewport(0, 0, size, size)
+    glClearColor(0, 0, 0, 1)
+
+    def pixels():
+        data = glReadPixels(0, 0, size, size, GL_RGB, GL_UNSIGNED_BYTE)
+        return np.frombuffer(data, dtype=np.uint8).reshape(size, size, 3)
+
+    # Left half red, right half green, as two quads of one buffer
+    left, right = _quad(-1, 0, (1, 0, 0, 1)), _quad(0, 1, (0, 1, 0, 1))
+    buffer = VertexBuffer(left[0] + right[0], left[1] + right[1], colors=left[2] + right[2])
+    assert (buffer.count, buffer.stride) == (8, 10 * FLOAT_BYTES)
+
+    glClear(GL_COLOR_BUFFER_BIT)
+    buffer.bind()
+    assert glIsEnabled(GL_VERTEX_ARRAY) and glIsEnabled(GL_COLOR_ARRAY)
+    assert not glIsEnabled(GL_TEXTURE_COORD_ARRAY)
+    buffer.draw()
+    buffer.unbind()
+    image = pixels()
+    assert image[size // 2, size // 4].tolist() == [255, 0, 0]
+    assert image[size // 2, 3 * size // 4].tolist() == [0, 255, 0]
+    # Client state and the binding are left as they were found
+    assert not glIsEnabled(GL_VERTEX_ARRAY) and not glIsEnabled(GL_COLOR_ARRAY)
+    assert glGetIntegerv(GL_ARRAY_BUFFER_BINDING) == 0
+
+    # A vertex range draws only its quads
+    glClear(GL_COLOR_BUFFER_BIT)
+    buffer.bind()
+    buffer.draw(4, 4)
+    buffer.unbind()
+    image = pixels()
+    assert image[size // 2, size // 4].tolist() == [0, 0, 0]
+    assert image[size // 2, 3 * size // 4].tolist() == [0, 255, 0]
+
+    vbo = buffer.vbo
+    buffer.delete()
+    assert buffer.vbo is None and not glIsBuffer(vbo)
+    buffer.delete()
+
+    # UVs come between normals and colours
+    textured = VertexBuffer(*left[:2], uvs=[(0, 0)] * 4, colors=left[2])
+    assert textured.stride == 12 * FLOAT_BYTES
+    textured.bind()
+    assert glIsEnabled(GL_TEXTURE_COORD_ARRAY)
+    textured.unbind()
+    assert not glIsEnabled(GL_TEXTURE_COORD_ARRAY)
+    textured.delete()
+
+    empty = VertexBuffer(np.zeros((0, 3)), np.zeros((0, 3)))
+    assert (empty.count, empty.stride) == (0, 0)
+    empty.bind()
+    empty.draw()
+    empty.unbind()
+    empty.delete()
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+    try:
+        _make_context(32)
+    except Exception as e:
+        print(f"{type(e).__name__}: {e}")
+        sys.exit(NO_CONTEXT)
+    _check_buffers()
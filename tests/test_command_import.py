@@ -0,0 +1,59 @@
+import io
+
+import numpy as np
+
+from command_import import import_commands
+
+SCRIPT = """# setblock 1 2 3 stone
+tellraw @a "fill 0 0 0 9 9 9 tnt"
+setblock 1 2 3 stone
+  /setblock -4 5 -6 minecraft:red_wool[facing=north]
+execute as @a at @s run setblock 7 8 9 glass
+execute if block 0 0 0 stone run execute as @a run fill 3 1 1 2 2 2 stone
+execute positioned ~ ~ ~ run fill 0 0 0 1 1 1 "tnt"
+fill 0 0 0 1 1 1 tnt hollow
+setblock ~ ~ ~ stone
+summon minecraft:block_display 1.5 2 -3.25 {block_state:{Name:"minecraft:lime_concrete"},Tags:["a"]}
+say setblock 5 5 5 stone
+
+"""
+
+
+def test_commands():
+    result = import_commands(SCRIPT)
+    names = result["names"]
+    assert result["blocks"].tolist() == [[1, 2, 3], [-4, 5, -6], [7, 8, 9]]
+    assert [names[i] for i in result["block_ids"]] == ["minecraft:stone", "minecraft:red_wool", "minecraft:glass"]
+    # Corners come out sorted
+    assert result["boxes"].tolist() == [[2, 1, 1, 3, 2, 2], [0, 0, 0, 1, 1, 1]]
+    assert [names[i] for i in result["box_ids"]] == ["minecraft:stone", "minecraft:tnt"]
+    assert result["displays"].tolist() == [[1.5, 2.0, -3.25]]
+    assert names[result["display_ids"][0]] == "minecraft:lime_concrete"
+
+
+def test_comments_and_quoted_text_are_skipped():
+    stats = import_commands(SCRIPT)["stats"]
+    assert stats == {"lines": 12, "setblock": 3, "fill": 2, "block_display": 1, "skipped": 4}
+
+
+def test_chunk_size_does_not_change_the_result():
+    expected = import_commands(SCRIPT)
+    for chunk_size, source in [(size, source) for size in (1, 7, 64) for source in (SCRIPT, io.StringIO(SCRIPT))]:
+        result = import_commands(source, chunk_size)
+        for key in ("blocks", "boxes", "displays"):
+            assert np.array_equal(result[key], expected[key])
+        # Names are interned in the order chunks meet them
+        for key in ("block_ids", "box_ids", "display_ids"):
+            assert [result["names"][i] for i in result[key]] == [expected["names"][i] for i in expected[key]]
+        assert result["stats"] == expected["stats"]
+
+
+def test_last_line_without_newline():
+    result = import_commands("setblock 1 2 3 a\nsetblock 4 5 6 b")
+    assert result["blocks"].tolist() == [[1, 2, 3], [4, 5, 6]]
+    assert result["stats"]["lines"] == 2
+
+
+def test_blank_and_prefix_only_lines():
+    stats = import_commands("\t\n   # note\nexecute as @a run \n\n/setblock 0 0 0 stone\n")["stats"]
+    assert stats == {"lines": 5, "setblock": 1, "fill": 0, "block_display": 0, "skipped": 1}
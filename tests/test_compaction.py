@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from worldedit_tab.boxes import merge_runs, split_groups
+from worldedit_tab.command_block_generator.compaction import compact_blocks
+
+
+def test_split_groups():
+    breaks = np.array([1, 0, 0, 0, 0, 1, 0], dtype=bool)
+    assert split_groups(breaks, np.full(7, 2)).tolist() == [1, 0, 1, 0, 1, 1, 0]
+
+
+def test_merge_runs():
+    # Two runs along column 1 in row 0 (x 0..2, then 4), one in row 1
+    rows = np.array([0, 0, 0, 0, 1])
+    xs = np.array([2, 0, 1, 4, 0])
+    (rows, xs), counts = merge_runs([rows, xs], 1, np.full(5, 10))
+    assert list(zip(rows.tolist(), xs.tolist(), counts.tolist())) == [(0, 0, 3), (0, 4, 1), (1, 0, 1)]
+
+
+@pytest.mark.parametrize("max_volume", [32768, 5])
+def test_boxes_repaint_grid(max_volume):
+    rng = np.random.default_rng(3)
+    # Few states in large patches, so boxes span all three axes
+    grid = rng.integers(0, 3, (4, 5, 6)).repeat(2, axis=0).repeat(2, axis=1).repeat(2, axis=2)
+    boxes = compact_blocks(grid, air_id=0, max_volume=max_volume)
+
+    painted = np.zeros_like(grid)
+    for x0, y0, z0, x1, y1, z1, state in boxes.tolist():
+        region = painted[y0:y1 + 1, z0:z1 + 1, x0:x1 + 1]
+        assert region.size <= max_volume
+        assert not region.any()
+        region[...] = state
+    assert np.array_equal(painted, grid)
+    assert len(boxes) < np.count_nonzero(grid)
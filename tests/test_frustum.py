@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from worldedit_tab.schem_viewer.frustum import boxes_in_frustum, frustum_planes
+
+# Looking down -z from the origin with a 90 degree square view, so at depth t
+# the frustum spans -t..t in both x and y
+PLANES = frustum_planes(eye=(0, 0, 0), target=(0, 0, -10), fov_y=90.0, aspect=1.0, near=1.0, far=100.0)
+
+
+def _visible(low, high):
+    return bool(boxes_in_frustum(PLANES, [low], [high])[0])
+
+
+def test_plane_layout():
+    assert PLANES.shape == (6, 4)
+    assert np.allclose(np.linalg.norm(PLANES[:, :3], axis=1), 1.0)
+    # The point straight ahead is inside every plane
+    assert (PLANES[:, :3] @ np.array([0, 0, -10]) + PLANES[:, 3] > 0).all()
+
+
+def test_in_front():
+    assert _visible((-1, -1, -11), (1, 1, -9))
+
+
+def test_behind():
+    assert not _visible((-1, -1, 9), (1, 1, 11))
+
+
+def test_far_plane():
+    assert _visible((-1, -1, -100.1), (1, 1, -99.9))
+    assert not _visible((-1, -1, -101), (1, 1, -100.1))
+
+
+def test_near_plane():
+    assert _visible((-0.1, -0.1, -1.1), (0.1, 0.1, -0.9))
+    assert not _visible((-0.1, -0.1, -0.9), (0.1, 0.1, -0.5))
+
+
+@pytest.mark.parametrize("axis, sign", [(0, 1), (0, -1), (1, 1), (1, -1)])
+def test_side_planes(axis, sign):
+    # A 0.2 wide box at depth 10..10.1, centred just inside or just outside the edge
+    def box(edge):
+        centre = np.zeros(3)
+        centre[axis] = sign * edge
+        low, high = centre - 0.1, centre + 0.1
+        low[2], high[2] = -10.1, -10.0
+        return low, high
+
+    assert _visible(*box(9.95))
+    assert _visible(*box(10.1))
+    assert not _visible(*box(10.25))
+
+
+def test_many_boxes():
+    mins = np.array([(-1, -1, -11), (-1, -1, 9), (50, -1, -11), (-1, -1, -200)])
+    maxs = mins + 2
+    assert boxes_in_frustum(PLANES, mins, maxs).tolist() == [True, False, False, False]
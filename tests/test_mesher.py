@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from worldedit_tab.schem_viewer.mesher import FACES, build_mesh, exposed_faces, solid_mask
+
+PALETTE = ["minecraft:air", "minecraft:stone", "minecraft:dirt"]
+
+
+def _counts(solid):
+    return {direction: int(mask.sum()) for direction, mask in exposed_faces(solid).items()}
+
+
+def test_solid_block():
+    # (height, length, width) = (2, 3, 4)
+    counts = _counts(np.ones((2, 3, 4), dtype=bool))
+    assert counts == {"up": 12, "down": 12, "north": 8, "south": 8, "east": 6, "west": 6}
+    assert sum(counts.values()) == 52
+
+
+def test_single_voxel():
+    solid = np.zeros((3, 3, 3), dtype=bool)
+    solid[1, 1, 1] = True
+    assert _counts(solid) == {direction: 1 for direction, _, _, _, _ in FACES}
+
+
+def test_hollow_shell():
+    solid = np.ones((5, 5, 5), dtype=bool)
+    solid[1:4, 1:4, 1:4] = False
+    counts = _counts(solid)
+    # 25 outside faces per side, plus the 9 facing into the cavity
+    assert counts == {direction: 25 + 9 for direction, _, _, _, _ in FACES}
+
+
+def test_air_ids_are_not_solid():
+    grid = np.array([[[1, 0, 2], [0, 0, 0]]], dtype=np.uint16)
+    solid = solid_mask(grid, PALETTE)
+    assert solid.tolist() == [[[True, False, True], [False, False, False]]]
+    # Two separate blocks, each with all six faces exposed
+    assert sum(_counts(solid).values()) == 12
+
+    # Ids past the palette count as air too
+    grid[0, 1, 1] = 7
+    assert sum(_counts(solid_mask(grid, PALETTE)).values()) == 12
+
+
+def test_air_palette_entry_anywhere():
+    grid = np.ones((2, 2, 2), dtype=np.uint16)
+    names = ["minecraft:stone", "minecraft:air"]
+    assert not solid_mask(grid, names).any()
+    assert build_mesh(grid, names)["stats"]["faces"] == 0
+
+
+@pytest.mark.parametrize("greedy", [False, True])
+def test_build_mesh_faces(greedy):
+    grid = np.ones((2, 3, 4), dtype=np.uint16)
+    grid[0, 0, 0] = 2
+    mesh = build_mesh(grid, PALETTE, origin=(10, 20, 30), greedy=greedy)
+    assert mesh["stats"]["faces"] == 52
+    quads = mesh["stats"]["quads"]
+    assert len(mesh["face_block"]) == quads
+    assert len(mesh["vertices"]) == 4 * quads
+    assert {name for name, _, _ in mesh["groups"]} == {"minecraft:stone", "minecraft:dirt"}
+    # Block centres sit at integer coords, so faces reach half a block past the corners
+    assert mesh["vertices"].min(axis=0).tolist() == [9.5, 19.5, 29.5]
+    assert mesh["vertices"].max(axis=0).tolist() == [13.5, 21.5, 32.5]
+    assert quads < 52 if greedy else quads == 52
@@ -0,0 +1,40 @@
+import gc
+
+import nbtlib
+import pytest
+
+from worldedit_tab.nbt_reader import open_nbt, read_root
+
+
+def _write(path, gzipped):
+    root = nbtlib.Compound({
+        "Width": nbtlib.Short(2),
+        "BlockData": nbtlib.ByteArray([1, 2, 3, 4]),
+        "Metadata": nbtlib.Compound({"Name": nbtlib.String("test")}),
+    })
+    nbtlib.File(root, gzipped=gzipped).save(str(path))
+
+
+@pytest.mark.parametrize("gzipped", [True, False])
+def test_read_root_selects_tags(tmp_path, gzipped):
+    path = tmp_path / "test.schem"
+    _write(path, gzipped)
+    root = read_root(str(path), include={"Width", "Metadata"})
+    assert root.gzipped == gzipped
+    assert set(root) == {"Width", "Metadata"}
+    assert int(root["Width"]) == 2
+    assert str(root["Metadata"]["Name"]) == "test"
+    assert set(read_root(str(path), exclude={"BlockData"})) == {"Width", "Metadata"}
+
+
+# A file left open is only noticed when it is collected, as an unraisable ResourceWarning
+@pytest.mark.filterwarnings("error::ResourceWarning", "error::pytest.PytestUnraisableExceptionWarning")
+@pytest.mark.parametrize("gzipped", [True, False])
+def test_files_are_closed(tmp_path, gzipped):
+    path = tmp_path / "test.schem"
+    _write(path, gzipped)
+    read_root(str(path))
+    fileobj, was_gzipped = open_nbt(str(path))
+    with fileobj:
+        assert was_gzipped == gzipped
+    gc.collect()
@@ -0,0 +1,83 @@
+import gzip
+import io
+
+import nbtlib
+import numpy as np
+import pytest
+
+from worldedit_tab.nbt_writer import save_schematic, to_compound, write_schematic
+from worldedit_tab.varint import decode_varints, encode_varints
+
+
+def _schematic(custom_name=None, entities=True):
+    # 300 palette entries, so ids from 128 up take two varint bytes
+    width, height, length = 5, 4, 3
+    palette = {"minecraft:air": 0}
+    palette.update({f"minecraft:block_{i}": i for i in range(1, 300)})
+    ids = np.random.default_rng(0).integers(0, 300, width * height * length)
+    schematic = {
+        "Version": 2,
+        "DataVersion": 4550,
+        "Width": width,
+        "Height": height,
+        "Length": length,
+        "Palette": palette,
+        "BlockData": encode_varints(ids),
+        "BlockEntities": [(x, 0, z, f"say {x} {z} ünïcode") for x in range(width) for z in range(length)]
+        if entities else [],
+        "Offset": (-3, 64, 7),
+        "Metadata": {"WEOffsetX": 1, "WEOffsetY": 2, "WEOffsetZ": 3},
+    }
+    if custom_name is not None:
+        schematic["CustomName"] = custom_name
+    return schematic
+
+
+def _nbtlib_bytes(schematic):
+    out = io.BytesIO()
+    nbtlib.File(to_compound(schematic)).write(out)
+    return out.getvalue()
+
+
+def _writer_bytes(schematic):
+    out = io.BytesIO()
+    write_schematic(out, schematic)
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("custom_name", [None, '{"text":"@"}'])
+@pytest.mark.parametrize("entities", [True, False])
+def test_matches_nbtlib(custom_name, entities):
+    schematic = _schematic(custom_name, entities)
+    assert max(schematic["BlockData"]) >= 0x80
+    assert _writer_bytes(schematic) == _nbtlib_bytes(schematic)
+
+
+def test_generator_entities_need_count():
+    schematic = _schematic()
+    entities = schematic["BlockEntities"]
+    expected = _writer_bytes(schematic)
+    schematic["BlockEntities"] = iter(entities)
+    schematic["BlockEntityCount"] = len(entities)
+    assert _writer_bytes(schematic) == expected
+
+    schematic["BlockEntities"] = iter(entities)
+    schematic["BlockEntityCount"] = len(entities) + 1
+    with pytest.raises(ValueError):
+        _writer_bytes(schematic)
+
+
+def test_saved_file_reads_back(tmp_path):
+    schematic = _schematic('{"text":"@"}')
+    path = str(tmp_path / "out.schem")
+    save_schematic(path, schematic)
+    with gzip.open(path, "rb") as f:
+        assert f.read() == _nbtlib_bytes(schematic)
+
+    root = nbtlib.load(path)
+    root = root.get("Schematic", root)
+    assert int(root["Width"]) == 5
+    assert len(root["BlockEntities"]) == 15
+    values = decode_varints(np.asarray(root["BlockData"]), 5 * 4 * 3)
+    assert np.array_equal(values, decode_varints(schematic["BlockData"]))
+    assert [p.name for p in tmp_path.iterdir()] == ["out.schem"]
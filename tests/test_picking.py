@@ -0,0 +1,155 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from picking import SpatialHash, cell_of, unproject_ray
+
+
+def _slab(origin, direction, cell):
+    """Distance at which the ray enters the unit cube around cell (0 from inside), or None."""
+    t0, t1 = 0.0, math.inf
+    for o, d, c in zip(origin, direction, cell):
+        low, high = c - 0.5, c + 0.5
+        if d == 0:
+            if not low <= o <= high:
+                return None
+            continue
+        a, b = sorted(((low - o) / d, (high - o) / d))
+        t0, t1 = max(t0, a), min(t1, b)
+    return t0 if t0 <= t1 else None
+
+
+def _brute_force(positions, origin, direction, max_distance=math.inf):
+    best = None
+    for cell in {cell_of(p) for p in positions}:
+        t = _slab(origin, direction, cell)
+        if t is not None and t <= max_distance and (best is None or t < best[0]):
+            best = (t, cell)
+    return best
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float64)
+    return vector / np.linalg.norm(vector)
+
+
+def test_random_scenes_match_brute_force():
+    rng = random.Random(1)
+    hits = 0
+    for _ in range(300):
+        positions = [(rng.randint(-4, 4), rng.randint(-4, 4), rng.randint(-4, 4)) for _ in range(rng.randint(1, 150))]
+        origin = [rng.uniform(-12, 12) for _ in range(3)]
+        # Aimed roughly at the blocks so many rays hit something
+        target = [rng.uniform(-5, 5) for _ in range(3)]
+        direction = _unit(np.subtract(target, origin))
+        max_distance = rng.choice([math.inf, rng.uniform(0, 20)])
+
+        hit = SpatialHash(positions).raycast(origin, direction, max_distance)
+        expected = _brute_force(positions, origin, direction, max_distance)
+        if expected is None:
+            assert hit is None
+        else:
+            assert hit is not None
+            assert hit[3] == pytest.approx(expected[0], abs=1e-9)
+            # Rays through an edge can touch two cubes at the same distance, so
+            # the cell only has to be one entered at that distance
+            assert _slab(origin, direction, hit[1]) == pytest.approx(expected[0], abs=1e-9)
+            # The last block placed in a cell owns it
+            assert hit[0] == max(i for i, p in enumerate(positions) if cell_of(p) == hit[1])
+            hits += 1
+    # Enough of the rays hit something for the comparison to mean anything
+    assert hits > 100
+
+
+def test_later_block_replaces_earlier():
+    hit = SpatialHash([(0, 0, 0), (0.2, -0.1, 0.3)]).raycast((0, 0, 5), (0, 0, -1))
+    assert hit[:2] == (1, (0, 0, 0))
+
+
+def test_entry_face_and_distance():
+    index, cell, normal, distance = SpatialHash([(0, 0, 0), (3, 0, 0)]).raycast((10, 0, 0), (-1, 0, 0))
+    assert (index, cell, normal) == (1, (3, 0, 0), (1, 0, 0))
+    assert distance == pytest.approx(6.5)
+
+
+def test_start_inside_bounds():
+    # Inside the bounding box but in an empty cell, walking to the next block
+    index, cell, normal, distance = SpatialHash([(0, 0, 0), (4, 0, 0)]).raycast((2, 0, 0), (1, 0, 0))
+    assert (index, cell, normal) == (1, (4, 0, 0), (-1, 0, 0))
+    assert distance == pytest.approx(1.5)
+
+
+def test_start_inside_block():
+    index, cell, normal, distance = SpatialHash([(0, 0, 0)]).raycast((0.2, 0.1, 0), (0, 1, 0))
+    assert (index, cell, normal, distance) == (0, (0, 0, 0), None, 0.0)
+
+
+@pytest.mark.parametrize("axis", [0, 1, 2])
+def test_axis_aligned(axis):
+    positions = [(0, 0, 0), (0, 0, 0)]
+    positions[1] = tuple(5 if i == axis else 0 for i in range(3))
+    origin = [0.3, -0.2, 0.1]
+    origin[axis] = 10
+    direction = [0, 0, 0]
+    direction[axis] = -1
+    index, cell, normal, distance = SpatialHash(positions).raycast(origin, direction)
+    assert index == 1
+    assert normal == tuple(1 if i == axis else 0 for i in range(3))
+    assert distance == pytest.approx(4.5)
+
+
+def test_axis_aligned_outside_slab():
+    # d == 0 on x and the ray runs beside the blocks
+    assert SpatialHash([(0, 0, 0), (0, 0, 3)]).raycast((0.6, 0, 10), (0, 0, -1)) is None
+
+
+def test_miss():
+    space = SpatialHash([(0, 0, 0), (1, 1, 1)])
+    assert space.raycast((5, 5, 5), (1, 0, 0)) is None
+    assert space.raycast((5, 0, 0), (1, 0, 0)) is None
+    assert SpatialHash().raycast((0, 0, 0), (1, 0, 0)) is None
+
+
+def test_max_distance():
+    space = SpatialHash([(0, 0, 0)])
+    assert space.raycast((0, 0, 5), (0, 0, -1), max_distance=4.4) is None
+    assert space.raycast((0, 0, 5), (0, 0, -1), max_distance=4.5)[3] == pytest.approx(4.5)
+    # The bounds are reached but the block behind an empty cell is not
+    space = SpatialHash([(0, 0, 0), (0, 0, 3)])
+    assert space.raycast((0, 0, 5), (0, 0, -1), max_distance=1.0) is None
+
+
+def _perspective(fov_y, aspect, near, far):
+    # gluPerspective
+    f = 1.0 / math.tan(math.radians(fov_y) / 2.0)
+    return np.array([
+        [f / aspect, 0, 0, 0],
+        [0, f, 0, 0],
+        [0, 0, (far + near) / (near - far), 2 * far * near / (near - far)],
+        [0, 0, -1, 0],
+    ])
+
+
+def test_unproject_ray():
+    projection = _perspective(90.0, 2.0, 0.5, 100.0)
+    # Camera at (1, 2, 5) looking down -z
+    modelview = np.eye(4)
+    modelview[:3, 3] = (-1, -2, -5)
+    viewport = (0, 0, 800, 400)
+    # glGetDoublev returns column-major matrices
+    args = modelview.T, projection.T, viewport
+
+    origin, direction = unproject_ray(400, 200, *args)
+    assert origin == pytest.approx([1, 2, 4.5])
+    assert direction == pytest.approx([0, 0, -1])
+
+    # The top right corner is tan(45) * aspect across and tan(45) up per unit of depth
+    origin, direction = unproject_ray(800, 400, *args)
+    assert origin == pytest.approx([2, 2.5, 4.5])
+    assert direction == pytest.approx(_unit([2, 1, -1]))
+
+    # The viewport offset is removed before mapping to the view
+    origin, direction = unproject_ray(450, 250, modelview.T, projection.T, (50, 50, 800, 400))
+    assert direction == pytest.approx([0, 0, -1])
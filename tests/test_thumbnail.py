@@ -0,0 +1,38 @@
+import os
+import shutil
+
+import numpy as np
+
+from worldedit_tab.nbt_writer import save_schematic
+from worldedit_tab.schem_viewer.thumbnail import render_directory
+from worldedit_tab.varint import encode_varints
+
+
+def _write_schematic(path, seed):
+    rng = np.random.default_rng(seed)
+    block_indices = rng.integers(0, 3, (6, 5, 4))
+    save_schematic(path, {
+        "Version": 2, "DataVersion": 4550, "Width": 4, "Height": 6, "Length": 5,
+        "Palette": {"minecraft:air": 0, "minecraft:stone": 1, "minecraft:dirt": 2},
+        "BlockData": encode_varints(block_indices),
+        "BlockEntities": [],
+        "Offset": (0, 0, 0),
+    })
+
+
+def test_render_directory_shares_cache(tmp_path):
+    schem_dir, out_dir, cache_dir = tmp_path / "schematics", tmp_path / "thumbnails", tmp_path / "cache"
+    schem_dir.mkdir()
+    # Copies of the same content share one cache entry, the rest all update index.json
+    for i in range(8):
+        _write_schematic(str(schem_dir / f"build_{i}.schem"), seed=i)
+    for i in range(8, 12):
+        shutil.copy(schem_dir / f"build_{i - 8}.schem", schem_dir / f"build_{i}.schem")
+
+    for _ in range(2):
+        rendered, failed = render_directory(str(schem_dir), str(out_dir), str(tmp_path / "textures"),
+                                            size=32, workers=4, cache_dir=str(cache_dir))
+        assert (rendered, failed) == (12, 0)
+    assert len(os.listdir(out_dir)) == 12
+    # 8 entries (.npy and .json) plus the index, no temporary files left behind
+    assert len(os.listdir(cache_dir)) == 17
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from worldedit_tab.varint import check_block_data, decode_block_data, encode_varints
+
+
+def _schem(values, shape=(2, 3, 4)):
+    height, length, width = shape
+    return {"Width": width, "Height": height, "Length": length, "BlockData": encode_varints(values)}
+
+
+@pytest.mark.parametrize("palette_size", [100, 4000])
+def test_check_accepts_what_decodes(palette_size):
+    values = np.random.default_rng(0).integers(0, palette_size, 24)
+    schem = _schem(values)
+    check_block_data(schem)
+    assert decode_block_data(schem).ravel().tolist() == values.tolist()
+
+
+@pytest.mark.parametrize("values, data", [
+    (range(23), None),
+    (range(25), None),
+    (range(24), encode_varints([300] * 24)[:-1]),
+])
+def test_check_rejects_what_does_not_decode(values, data):
+    schem = _schem(list(values))
+    if data is not None:
+        schem["BlockData"] = data
+    with pytest.raises(ValueError):
+        decode_block_data(schem)
+    with pytest.raises(ValueError):
+        check_block_data(schem)